@@ -0,0 +1,417 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+from langchain.schema import AIMessage, BaseMessage
+from langchain_core.messages import AIMessageChunk
+from pydantic import BaseModel
+from src.core.session_manager import DEFAULT_SESSION_ID
+from src.core.workflow import SecureChatbotWorkflow
+
+# 카세트 파일: gzip JSON Lines. 첫 줄은 헤더, 이후 줄마다 LLM 호출 하나 또는 워크플로우 요청 하나
+#   {"type": "call", "agent", "kind", "fingerprint", "loose", "latency_ms", "message" | "structured" | "chunks"}
+#   {"type": "request", "offset_s", "session_id", "user_input", "method"}
+CASSETTE_VERSION = 1
+
+class CassetteMiss(LookupError):
+    """재생 모드에서 녹화되지 않은 요청"""
+
+def _message_key(messages: Sequence[BaseMessage]) -> List[Tuple[str, str]]:
+    return [(getattr(m, "type", ""), str(m.content)) for m in messages]
+
+def fingerprint(agent: str, kind: str, messages: Sequence[BaseMessage]) -> str:
+    """에이전트, 호출 종류, 전체 메시지(시스템 프롬프트와 대화 기록 포함) 기준 해시"""
+    payload = json.dumps([agent, kind, _message_key(messages)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def loose_fingerprint(agent: str, kind: str, messages: Sequence[BaseMessage]) -> str:
+    """마지막 사용자 메시지만 보는 해시 (동시 실행으로 대화 기록 순서가 달라져도 찾을 수 있도록)"""
+    human = [str(m.content) for m in messages if getattr(m, "type", "") == "human"]
+    payload = json.dumps([agent, kind, human[-1] if human else ""], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def _dump_message(message: Any) -> Dict[str, Any]:
+    metadata = getattr(message, "response_metadata", None) or {}
+    data: Dict[str, Any] = {"content": message.content}
+    if metadata.get("token_usage") or metadata.get("model_name"):
+        data["response_metadata"] = {
+            key: metadata[key] for key in ("token_usage", "model_name") if metadata.get(key)
+        }
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        data["tool_calls"] = tool_calls
+    return data
+
+def _load_message(data: Dict[str, Any]) -> AIMessage:
+    return AIMessage(
+        content=data["content"],
+        response_metadata=data.get("response_metadata", {}),
+        tool_calls=data.get("tool_calls", [])
+    )
+
+@dataclass
+class CassetteStats:
+    recorded: int = 0
+    exact_hits: int = 0
+    loose_hits: int = 0
+    misses: int = 0
+    by_agent: Dict[str, int] = field(default_factory=dict)
+
+class Cassette:
+    """LLM 호출 녹화/재생 저장소. 같은 지문이 여러 번 녹화되면 재생 시 녹화 순서대로 돌려가며 사용"""
+    
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        # 재생 시 녹화된 지연에 곱하는 배율 (0이면 지연 없이 즉시 응답, 1이면 원래 속도)
+        self.latency_scale = latency_scale
+        self.stats = CassetteStats()
+        
+        self._calls: List[Dict[str, Any]] = []
+        self._requests: List[Dict[str, Any]] = []
+        self._exact: Dict[str, List[Dict[str, Any]]] = {}
+        self._loose: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        
+        if mode == "replay":
+            self.load()
+    
+    @property
+    def requests(self) -> List[Dict[str, Any]]:
+        """녹화된 워크플로우 요청 (시작 시각 기준 offset_s 순)"""
+        return list(self._requests)
+    
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as source:
+            header = json.loads(source.readline())
+            if header.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"unsupported cassette version: {header.get('version')}")
+            for line in source:
+                entry = json.loads(line)
+                if entry["type"] == "request":
+                    self._requests.append(entry)
+                else:
+                    self._index(entry)
+    
+    def _index(self, entry: Dict[str, Any]):
+        self._calls.append(entry)
+        self._exact.setdefault(entry["fingerprint"], []).append(entry)
+        self._loose.setdefault(entry["loose"], []).append(entry)
+    
+    def save(self):
+        with self._lock:
+            calls, requests = list(self._calls), list(self._requests)
+        with gzip.open(self.path, "wt", encoding="utf-8") as target:
+            header = {"version": CASSETTE_VERSION, "created_at": time.time(), "calls": len(calls), "requests": len(requests)}
+            target.write(json.dumps(header) + "\n")
+            for entry in sorted(requests, key=lambda item: item["offset_s"]):
+                target.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            for entry in calls:
+                target.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+    
+    def record_call(self, agent: str, kind: str, messages: Sequence[BaseMessage], latency_ms: float, **response: Any):
+        entry = {
+            "type": "call",
+            "agent": agent,
+            "kind": kind,
+            "fingerprint": fingerprint(agent, kind, messages),
+            "loose": loose_fingerprint(agent, kind, messages),
+            "latency_ms": round(latency_ms, 1),
+            **response
+        }
+        with self._lock:
+            self._index(entry)
+            self.stats.recorded += 1
+            self.stats.by_agent[agent] = self.stats.by_agent.get(agent, 0) + 1
+    
+    def record_request(self, method: str, user_input: str, session_id: str):
+        with self._lock:
+            self._requests.append({
+                "type": "request",
+                "offset_s": round(time.monotonic() - self._started, 3),
+                "method": method,
+                "session_id": session_id,
+                "user_input": user_input
+            })
+    
+    def _next(self, index: str, key: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        cursor = self._cursors.get((index, key), 0)
+        self._cursors[(index, key)] = cursor + 1
+        return entries[cursor % len(entries)]
+    
+    def lookup(self, agent: str, kind: str, messages: Sequence[BaseMessage]) -> Dict[str, Any]:
+        exact = fingerprint(agent, kind, messages)
+        loose = loose_fingerprint(agent, kind, messages)
+        with self._lock:
+            entries = self._exact.get(exact)
+            if entries:
+                self.stats.exact_hits += 1
+                return self._next("exact", exact, entries)
+            entries = self._loose.get(loose)
+            if entries:
+                self.stats.loose_hits += 1
+                return self._next("loose", loose, entries)
+            self.stats.misses += 1
+        raise CassetteMiss(f"{agent}/{kind}: no recording for fingerprint {exact}")
+    
+    def has_kind(self, agent: str, kind: str) -> bool:
+        with self._lock:
+            return any(entry["agent"] == agent and entry["kind"] == kind for entry in self._calls)
+    
+    def delay(self, latency_ms: float) -> float:
+        return max(latency_ms, 0.0) * self.latency_scale / 1000
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "calls": len(self._calls),
+                "requests": len(self._requests),
+                "recorded": self.stats.recorded,
+                "exact_hits": self.stats.exact_hits,
+                "loose_hits": self.stats.loose_hits,
+                "misses": self.stats.misses,
+                "by_agent": dict(self.stats.by_agent)
+            }
+
+class CassetteChatModel:
+    """에이전트 LLM 래퍼: record 모드는 실제 모델을 호출하며 녹화, replay 모드는 녹화본만 사용"""
+    
+    def __init__(self, cassette: Cassette, agent: str, inner: Any = None):
+        if cassette.mode == "record" and inner is None:
+            raise ValueError("record mode needs the real model to wrap")
+        self.cassette = cassette
+        self.agent = agent
+        self.inner = inner
+        self.model_name = getattr(inner, "model_name", None) or "cassette"
+    
+    def with_structured_output(self, schema: Type[BaseModel], **kwargs) -> "StructuredCassetteRunnable":
+        # 녹화 때와 같은 경로(native/텍스트)를 타도록, 지원하지 않는 경우엔 bind_structured_output이 None으로 처리
+        if self.inner is not None:
+            if not hasattr(self.inner, "with_structured_output"):
+                raise NotImplementedError(f"{self.model_name} has no native structured output")
+            return StructuredCassetteRunnable(self, schema, self.inner.with_structured_output(schema, **kwargs))
+        if not self.cassette.has_kind(self.agent, f"structured:{schema.__name__}"):
+            raise NotImplementedError(f"cassette has no structured recordings for {self.agent}")
+        return StructuredCassetteRunnable(self, schema)
+    
+    def invoke(self, messages: Sequence[BaseMessage], *args, **kwargs) -> AIMessage:
+        if self.cassette.mode == "record":
+            started = time.perf_counter()
+            response = self.inner.invoke(messages, *args, **kwargs)
+            self.cassette.record_call(
+                self.agent, "text", messages, (time.perf_counter() - started) * 1000,
+                message=_dump_message(response)
+            )
+            return response
+        
+        entry = self.cassette.lookup(self.agent, "text", messages)
+        delay = self.cassette.delay(entry["latency_ms"])
+        if delay:
+            time.sleep(delay)
+        return _load_message(entry["message"])
+    
+    async def ainvoke(self, messages: Sequence[BaseMessage], *args, **kwargs) -> AIMessage:
+        if self.cassette.mode == "record":
+            started = time.perf_counter()
+            response = await self.inner.ainvoke(messages, *args, **kwargs)
+            self.cassette.record_call(
+                self.agent, "text", messages, (time.perf_counter() - started) * 1000,
+                message=_dump_message(response)
+            )
+            return response
+        
+        entry = self.cassette.lookup(self.agent, "text", messages)
+        delay = self.cassette.delay(entry["latency_ms"])
+        if delay:
+            await asyncio.sleep(delay)
+        return _load_message(entry["message"])
+    
+    def stream(self, messages: Sequence[BaseMessage], *args, **kwargs) -> Iterator[AIMessageChunk]:
+        if self.cassette.mode == "record":
+            # 첫 청크까지의 지연과 청크 간 간격을 함께 기록
+            started = last = time.perf_counter()
+            chunks: List[Tuple[float, str]] = []
+            first_ms = 0.0
+            for chunk in self.inner.stream(messages, *args, **kwargs):
+                now = time.perf_counter()
+                if not chunks:
+                    first_ms = (now - started) * 1000
+                chunks.append((round((now - last) * 1000, 1) if chunks else 0.0, str(chunk.content)))
+                last = now
+                yield chunk
+            self.cassette.record_call(self.agent, "stream", messages, first_ms, chunks=chunks)
+            return
+        
+        entry = self.cassette.lookup(self.agent, "stream", messages)
+        delay = self.cassette.delay(entry["latency_ms"])
+        if delay:
+            time.sleep(delay)
+        for gap_ms, content in entry["chunks"]:
+            gap = self.cassette.delay(gap_ms)
+            if gap:
+                time.sleep(gap)
+            yield AIMessageChunk(content=content)
+    
+    async def astream(self, messages: Sequence[BaseMessage], *args, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        if self.cassette.mode == "record":
+            started = last = time.perf_counter()
+            chunks: List[Tuple[float, str]] = []
+            first_ms = 0.0
+            async for chunk in self.inner.astream(messages, *args, **kwargs):
+                now = time.perf_counter()
+                if not chunks:
+                    first_ms = (now - started) * 1000
+                chunks.append((round((now - last) * 1000, 1) if chunks else 0.0, str(chunk.content)))
+                last = now
+                yield chunk
+            self.cassette.record_call(self.agent, "stream", messages, first_ms, chunks=chunks)
+            return
+        
+        entry = self.cassette.lookup(self.agent, "stream", messages)
+        delay = self.cassette.delay(entry["latency_ms"])
+        if delay:
+            await asyncio.sleep(delay)
+        for gap_ms, content in entry["chunks"]:
+            gap = self.cassette.delay(gap_ms)
+            if gap:
+                await asyncio.sleep(gap)
+            yield AIMessageChunk(content=content)
+    
+    def __call__(self, messages: Sequence[BaseMessage], *args, **kwargs) -> AIMessage:
+        return self.invoke(messages, *args, **kwargs)
+
+class StructuredCassetteRunnable:
+    """with_structured_output(include_raw=True) 결과({'raw', 'parsed', 'parsing_error'})를 녹화/재생"""
+    
+    def __init__(self, model: CassetteChatModel, schema: Type[BaseModel], inner: Any = None):
+        self.model = model
+        self.schema = schema
+        self.inner = inner
+        self.kind = f"structured:{schema.__name__}"
+    
+    def _dump(self, output: Dict[str, Any]) -> Dict[str, Any]:
+        parsed = output.get("parsed")
+        error = output.get("parsing_error")
+        return {
+            "raw": _dump_message(output["raw"]),
+            "parsed": parsed.model_dump() if parsed is not None else None,
+            "parsing_error": str(error) if error is not None else None
+        }
+    
+    def _load(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "raw": _load_message(data["raw"]),
+            "parsed": self.schema.model_validate(data["parsed"]) if data["parsed"] is not None else None,
+            "parsing_error": ValueError(data["parsing_error"]) if data["parsing_error"] else None
+        }
+    
+    def invoke(self, messages: Sequence[BaseMessage], *args, **kwargs) -> Dict[str, Any]:
+        cassette = self.model.cassette
+        if cassette.mode == "record":
+            started = time.perf_counter()
+            output = self.inner.invoke(messages, *args, **kwargs)
+            cassette.record_call(
+                self.model.agent, self.kind, messages, (time.perf_counter() - started) * 1000,
+                structured=self._dump(output)
+            )
+            return output
+        
+        entry = cassette.lookup(self.model.agent, self.kind, messages)
+        delay = cassette.delay(entry["latency_ms"])
+        if delay:
+            time.sleep(delay)
+        return self._load(entry["structured"])
+    
+    async def ainvoke(self, messages: Sequence[BaseMessage], *args, **kwargs) -> Dict[str, Any]:
+        cassette = self.model.cassette
+        if cassette.mode == "record":
+            started = time.perf_counter()
+            output = await self.inner.ainvoke(messages, *args, **kwargs)
+            cassette.record_call(
+                self.model.agent, self.kind, messages, (time.perf_counter() - started) * 1000,
+                structured=self._dump(output)
+            )
+            return output
+        
+        entry = cassette.lookup(self.model.agent, self.kind, messages)
+        delay = cassette.delay(entry["latency_ms"])
+        if delay:
+            await asyncio.sleep(delay)
+        return self._load(entry["structured"])
+
+# 카세트 지문의 에이전트 이름 -> 워크플로우 속성
+AGENT_ATTRIBUTES = {
+    "security": "security_agent",
+    "question_classifier": "question_classifier",
+    "output_safety": "output_safety_agent",
+    "combined_guard": "combined_guard_agent",
+    "chatbot": "chatbot",
+}
+
+def _record_requests(workflow, cassette: Cassette):
+    # 워크플로우 진입점을 감싸 실제 트래픽(입력, 세션, 도착 시각)을 함께 녹화
+    for method in ("process_message", "aprocess_message", "stream_message", "astream_message"):
+        original = getattr(workflow, method)
+        
+        def recording(user_input, *args, _original=original, _method=method, **kwargs):
+            session_id = kwargs.get("session_id", args[0] if args else DEFAULT_SESSION_ID)
+            cassette.record_request(_method, user_input, session_id)
+            return _original(user_input, *args, **kwargs)
+        setattr(workflow, method, recording)
+
+def install_cassette(workflow, cassette: Cassette) -> Cassette:
+    """워크플로우 안의 모든 에이전트 LLM을 카세트 래퍼로 교체 (record 모드면 요청도 함께 녹화)"""
+    for agent, attribute in AGENT_ATTRIBUTES.items():
+        target = getattr(workflow, attribute, None)
+        if target is None:
+            continue
+        # 재생 모드에서는 실제 모델을 만들지 않음 (API 키/네트워크 불필요)
+        inner = target.llm if cassette.mode == "record" else None
+        target.llm = CassetteChatModel(cassette, agent, inner)
+    if cassette.mode == "record":
+        _record_requests(workflow, cassette)
+    return cassette
+
+def record(workflow, cassette: Cassette, lines: Sequence[str]):
+    """입력 파일의 각 줄("세션ID<TAB>메시지" 또는 메시지만)을 실제 모델로 처리하며 녹화"""
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        session_id, _, user_input = line.rpartition("\t")
+        workflow.process_message(user_input, session_id=session_id or DEFAULT_SESSION_ID)
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="실제 LLM 호출을 카세트로 녹화 (재생은 python -m benchmarks.run --cassette)")
+    parser.add_argument("command", choices=["record", "stats"])
+    parser.add_argument("--cassette", required=True, help="카세트 파일 경로 (gzip JSON Lines)")
+    parser.add_argument("--input", help="record: 한 줄에 하나씩 처리할 메시지 파일")
+    args = parser.parse_args(argv)
+    
+    if args.command == "stats":
+        print(json.dumps(Cassette(args.cassette, "replay").get_stats(), indent=2, ensure_ascii=False))
+        return
+    
+    cassette = Cassette(args.cassette, "record")
+    workflow = SecureChatbotWorkflow("You are a helpful AI assistant.")
+    install_cassette(workflow, cassette)
+    try:
+        with open(args.input, encoding="utf-8") as source:
+            record(workflow, cassette, source.readlines())
+    finally:
+        cassette.save()
+    stats = cassette.get_stats()
+    print(f"recorded {stats['recorded']} LLM calls for {stats['requests']} requests -> {args.cassette}")
+
+if __name__ == "__main__":
+    main()
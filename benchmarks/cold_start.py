@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+from .run import git_revision, summarize
+
+# 새 인터프리터에서 임포트 → 첫 생성 → 두 번째 생성 → 첫 메시지 처리 시간을 측정하는 스크립트
+PROBE = r"""
+import json, os, time
+started = time.perf_counter()
+from src.core.workflow import SecureChatbotWorkflow
+imported = time.perf_counter()
+workflow = SecureChatbotWorkflow("You are a helpful AI assistant.")
+constructed = time.perf_counter()
+SecureChatbotWorkflow("You are a helpful AI assistant.")
+reconstructed = time.perf_counter()
+from benchmarks.fake_llm import FakeChatModel, install_fake_llms
+install_fake_llms(workflow, FakeChatModel())
+prepared = time.perf_counter()
+workflow.process_message("What's 2+2?")
+answered = time.perf_counter()
+print("COLD_START " + json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_construct_ms": (constructed - imported) * 1000,
+    "second_construct_ms": (reconstructed - constructed) * 1000,
+    "first_message_ms": (answered - prepared) * 1000,
+    "total_ms": (answered - started) * 1000 - (prepared - reconstructed) * 1000,
+}))
+"""
+
+# PROBE는 저장소 루트를 기준으로 src, benchmarks를 임포트
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure_once(python: str) -> Dict[str, float]:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark-fake")
+    completed = subprocess.run(
+        [python, "-c", PROBE],
+        capture_output=True, text=True, check=True, env=env, cwd=REPO_ROOT
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("COLD_START "):
+            return json.loads(line[len("COLD_START "):])
+    raise RuntimeError(f"측정 결과를 찾을 수 없습니다: {completed.stdout}\n{completed.stderr}")
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="SecureChatbotWorkflow 콜드 스타트(임포트/생성/첫 메시지) 시간 측정")
+    parser.add_argument("--runs", type=int, default=5, help="새 프로세스로 반복 측정할 횟수")
+    parser.add_argument("--python", default=sys.executable)
+    parser.add_argument("--output", default="cold_start.json", help="결과 JSON 경로")
+    args = parser.parse_args(argv)
+    
+    samples: List[Dict[str, float]] = [measure_once(args.python) for _ in range(args.runs)]
+    phases = list(samples[0]) if samples else []
+    report: Dict[str, Any] = {
+        "revision": git_revision(),
+        "runs": args.runs,
+        "phases": {phase: summarize([sample[phase] for sample in samples]) for phase in phases},
+    }
+    
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2, ensure_ascii=False)
+    
+    for phase, summary in report["phases"].items():
+        print(f"{phase:<20} p50={summary['p50_ms']:.1f}ms max={summary['max_ms']:.1f}ms")
+    print(f"-> {args.output}")
+
+if __name__ == "__main__":
+    main()
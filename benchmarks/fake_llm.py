@@ -0,0 +1,211 @@
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+from langchain.schema import AIMessage, BaseMessage
+from langchain_core.messages import AIMessageChunk
+
+@dataclass
+class LatencyProfile:
+    """가짜 LLM 응답 지연 분포 (단위: ms)"""
+    distribution: str = "constant"  # constant | uniform | lognormal
+    mean_ms: float = 0.0
+    spread: float = 0.0  # uniform: ±spread ms, lognormal: sigma
+    per_token_ms: float = 0.0  # 스트리밍 시 토큰 간 지연
+    
+    def sample(self, rng: random.Random) -> float:
+        if self.mean_ms <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            return max(0.0, rng.uniform(self.mean_ms - self.spread, self.mean_ms + self.spread)) / 1000
+        if self.distribution == "lognormal":
+            sigma = self.spread or 0.5
+            # 평균이 mean_ms가 되도록 mu를 보정
+            mu = math.log(self.mean_ms) - sigma ** 2 / 2
+            return rng.lognormvariate(mu, sigma) / 1000
+        return self.mean_ms / 1000
+
+INJECTION_MARKERS = re.compile(
+    r"ignore\s+previous|forget\s+everything|system\s*:|jailbreak|pretend\s+you\s+are|act\s+as\s+if|disregard",
+    re.IGNORECASE
+)
+SAP_MARKERS = re.compile(r"sap|락해제|자동화|비밀번호\s*초기화|tcode|gui", re.IGNORECASE)
+DATA_MARKERS = re.compile(r"데이터|조회|리포트|report|통계|검색|보여", re.IGNORECASE)
+HIGH_RISK_MARKERS = re.compile(r"주민번호|카드번호|계좌번호|password|api[_ ]?key", re.IGNORECASE)
+
+# 시스템 프롬프트에 포함된 문구로 어떤 에이전트의 호출인지 구분
+ROLE_MARKERS = [
+    ("combined_guard", "세 가지 판단"),
+    ("security", "detects prompt injection"),
+    ("classifier", "카테고리로 분류"),
+    ("safety", "안전성을 평가"),
+]
+
+def detect_role(messages: Sequence[BaseMessage]) -> str:
+    system_text = " ".join(str(m.content) for m in messages if getattr(m, "type", "") == "system")
+    for role, marker in ROLE_MARKERS:
+        if marker in system_text:
+            return role
+    return "chat"
+
+def _user_text(messages: Sequence[BaseMessage]) -> str:
+    human = [str(m.content) for m in messages if getattr(m, "type", "") == "human"]
+    return human[-1] if human else ""
+
+def canned_output(role: str, text: str, chat_tokens: int = 40) -> Dict[str, Any]:
+    """에이전트별로 실제 파서가 받아들이는 형식의 고정 응답 생성"""
+    is_injection = bool(INJECTION_MARKERS.search(text))
+    if SAP_MARKERS.search(text):
+        question_type = "sap_automation"
+    elif DATA_MARKERS.search(text):
+        question_type = "data_request"
+    else:
+        question_type = "faq"
+    safety_level = "blocked" if HIGH_RISK_MARKERS.search(text) else "safe"
+    
+    classification = {
+        "question_type": question_type,
+        "confidence": 0.9,
+        "reasoning": "benchmark fake classification"
+    }
+    assessment = {
+        "safety_level": safety_level,
+        "confidence": 0.9,
+        "risk_categories": ["personal_info"] if safety_level == "blocked" else [],
+        "reasoning": "benchmark fake assessment",
+        "recommended_action": "요청 차단" if safety_level == "blocked" else "정상 처리"
+    }
+    
+    if role == "security":
+        return {"text": "INJECTION: benchmark marker" if is_injection else "SAFE: benign request"}
+    if role == "classifier":
+        return {"text": json.dumps(classification, ensure_ascii=False), "data": classification}
+    if role == "safety":
+        return {"text": json.dumps(assessment, ensure_ascii=False), "data": assessment}
+    if role == "combined_guard":
+        combined = {
+            "is_injection": is_injection,
+            "injection_reason": "benchmark fake verdict",
+            "question_type": question_type,
+            "classification_confidence": classification["confidence"],
+            "classification_reasoning": classification["reasoning"],
+            "safety_level": safety_level,
+            "safety_confidence": assessment["confidence"],
+            "risk_categories": assessment["risk_categories"],
+            "safety_reasoning": assessment["reasoning"],
+            "recommended_action": assessment["recommended_action"]
+        }
+        return {"text": json.dumps(combined, ensure_ascii=False), "data": combined}
+    return {"text": " ".join(f"token{i}" for i in range(chat_tokens))}
+
+@dataclass
+class FakeCallStats:
+    calls: Dict[str, int] = field(default_factory=dict)
+    prompt_chars: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    
+    def record(self, role: str, prompt_chars: int):
+        with self.lock:
+            self.calls[role] = self.calls.get(role, 0) + 1
+            self.prompt_chars += prompt_chars
+    
+    def total_calls(self) -> int:
+        with self.lock:
+            return sum(self.calls.values())
+
+class FakeChatModel:
+    """ChatOpenAI 대신 쓰는 결정적 가짜 모델 (invoke/ainvoke/stream/astream 지원)"""
+    
+    def __init__(
+        self,
+        latency: Optional[Dict[str, LatencyProfile]] = None,
+        chat_tokens: int = 40,
+        seed: int = 0,
+        stats: Optional[FakeCallStats] = None,
+        model_name: str = "fake-benchmark-model"
+    ):
+        self.latency = latency or {}
+        self.chat_tokens = chat_tokens
+        self.stats = stats or FakeCallStats()
+        self.model_name = model_name
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+    
+    def _profile(self, role: str) -> LatencyProfile:
+        return self.latency.get(role) or self.latency.get("default") or LatencyProfile()
+    
+    def _prepare(self, messages: Sequence[BaseMessage]):
+        role = detect_role(messages)
+        output = canned_output(role, _user_text(messages), self.chat_tokens)
+        profile = self._profile(role)
+        with self._rng_lock:
+            delay = profile.sample(self._rng)
+        self.stats.record(role, sum(len(str(m.content)) for m in messages))
+        return role, output, profile, delay
+    
+    def _message(self, messages: Sequence[BaseMessage], text: str) -> AIMessage:
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        completion_tokens = max(1, len(text) // 4)
+        return AIMessage(
+            content=text,
+            response_metadata={
+                "model_name": self.model_name,
+                "token_usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            }
+        )
+    
+    def invoke(self, messages: Sequence[BaseMessage], *args, **kwargs) -> AIMessage:
+        _, output, _, delay = self._prepare(messages)
+        if delay:
+            time.sleep(delay)
+        return self._message(messages, output["text"])
+    
+    async def ainvoke(self, messages: Sequence[BaseMessage], *args, **kwargs) -> AIMessage:
+        _, output, _, delay = self._prepare(messages)
+        if delay:
+            await asyncio.sleep(delay)
+        return self._message(messages, output["text"])
+    
+    def __call__(self, messages: Sequence[BaseMessage], *args, **kwargs) -> AIMessage:
+        return self.invoke(messages, *args, **kwargs)
+    
+    def _tokens(self, text: str) -> List[str]:
+        words = text.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+    
+    def stream(self, messages: Sequence[BaseMessage], *args, **kwargs) -> Iterator[AIMessageChunk]:
+        _, output, profile, delay = self._prepare(messages)
+        if delay:
+            time.sleep(delay)
+        for token in self._tokens(output["text"]):
+            if profile.per_token_ms:
+                time.sleep(profile.per_token_ms / 1000)
+            yield AIMessageChunk(content=token)
+    
+    async def astream(self, messages: Sequence[BaseMessage], *args, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        _, output, profile, delay = self._prepare(messages)
+        if delay:
+            await asyncio.sleep(delay)
+        for token in self._tokens(output["text"]):
+            if profile.per_token_ms:
+                await asyncio.sleep(profile.per_token_ms / 1000)
+            yield AIMessageChunk(content=token)
+
+def install_fake_llms(workflow, fake: FakeChatModel) -> FakeChatModel:
+    """워크플로우 안의 모든 에이전트 LLM을 가짜 모델로 교체"""
+    workflow.security_agent.llm = fake
+    workflow.question_classifier.llm = fake
+    workflow.output_safety_agent.llm = fake
+    workflow.chatbot.llm = fake
+    if getattr(workflow, "combined_guard_agent", None) is not None:
+        workflow.combined_guard_agent.llm = fake
+    return fake
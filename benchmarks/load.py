@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 실제 API 키 없이도 ChatOpenAI 생성이 가능하도록 더미 키 지정 (호출은 모두 가짜 모델/카세트로 대체됨)
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-fake")
+
+from src.core.workflow import SecureChatbotWorkflow
+from .cassette import Cassette
+from .corpus import DEFAULT_CORPUS, load_corpus
+from .fake_llm import FakeCallStats
+from .run import build_workflow, git_revision, peak_rss_mb, summarize
+
+ROUTES = ["blocked", "faq", "sap_automation", "data_request"]
+
+def route_of(result: Dict[str, Any]) -> str:
+    if result.get("blocked"):
+        return "blocked"
+    return result.get("classification", {}).get("question_type") or "unknown"
+
+class LoadRecorder:
+    """요청별 결과(경로, 지연, 오류, degraded 여부)를 모아 수준별 리포트로 요약"""
+    
+    def __init__(self):
+        self.samples: List[Tuple[str, float, Optional[str], bool]] = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+    
+    async def send(
+        self,
+        workflow: SecureChatbotWorkflow,
+        prompt: str,
+        session_id: str,
+        started: float,
+        deadline_seconds: Optional[float]
+    ):
+        # started는 요청이 "도착했어야 할" 시각: 오픈 루프에서 발송이 밀린 시간도 지연에 포함 (coordinated omission 방지)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            result = await workflow.aprocess_message(prompt, session_id=session_id, deadline_seconds=deadline_seconds)
+            route, error, degraded = route_of(result), None, bool(result.get("degraded"))
+        except Exception as exc:
+            route, error, degraded = "error", type(exc).__name__, False
+        finally:
+            self.in_flight -= 1
+        self.samples.append((route, (time.perf_counter() - started) * 1000, error, degraded))
+    
+    def report(self, elapsed: float, llm_calls: int) -> Dict[str, Any]:
+        latencies = [latency for _, latency, error, _ in self.samples if error is None]
+        by_route: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        for route, latency, error, _ in self.samples:
+            if error is None:
+                by_route[route].append(latency)
+            else:
+                errors[error] += 1
+        
+        requests = len(self.samples)
+        degraded = sum(1 for sample in self.samples if sample[3])
+        return {
+            "requests": requests,
+            "elapsed_s": elapsed,
+            "throughput_msg_per_s": requests / elapsed if elapsed else 0.0,
+            "latency": summarize(latencies),
+            "routes": {
+                route: summarize(by_route[route])
+                for route in ROUTES + sorted(set(by_route) - set(ROUTES))
+            },
+            "error_rate": sum(errors.values()) / requests if requests else 0.0,
+            "errors": dict(errors),
+            "degraded_rate": degraded / requests if requests else 0.0,
+            "llm_calls_per_message": llm_calls / requests if requests else 0.0,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+def prompt_stream(corpus: Sequence[Tuple[str, str]], rng: random.Random):
+    """코퍼스를 섞어 무한히 반복"""
+    while True:
+        order = list(corpus)
+        rng.shuffle(order)
+        for _, prompt in order:
+            yield prompt
+
+async def run_open_loop(
+    workflow: SecureChatbotWorkflow,
+    corpus: Sequence[Tuple[str, str]],
+    rps: float,
+    duration_s: float,
+    sessions: int,
+    arrival: str,
+    rng: random.Random,
+    deadline_seconds: Optional[float] = None
+) -> Tuple[LoadRecorder, float]:
+    """응답을 기다리지 않고 목표 RPS로 요청을 발송 (포화 지점에서는 대기열과 지연이 계속 늘어남)"""
+    recorder = LoadRecorder()
+    prompts = prompt_stream(corpus, rng)
+    tasks = []
+    started = time.perf_counter()
+    next_arrival = started
+    index = 0
+    while next_arrival - started < duration_s:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(recorder.send(
+            workflow, next(prompts), f"load-{index % sessions}", next_arrival, deadline_seconds
+        )))
+        index += 1
+        next_arrival += rng.expovariate(rps) if arrival == "poisson" else 1 / rps
+    await asyncio.gather(*tasks)
+    return recorder, time.perf_counter() - started
+
+async def run_closed_loop(
+    workflow: SecureChatbotWorkflow,
+    corpus: Sequence[Tuple[str, str]],
+    concurrency: int,
+    duration_s: float,
+    sessions: int,
+    rng: random.Random,
+    deadline_seconds: Optional[float] = None,
+    max_messages: Optional[int] = None
+) -> Tuple[LoadRecorder, float]:
+    """concurrency개의 가상 사용자가 각자 응답을 받은 뒤 다음 요청을 보냄"""
+    recorder = LoadRecorder()
+    prompts = prompt_stream(corpus, rng)
+    started = time.perf_counter()
+    sent = 0
+    
+    async def user(user_index: int):
+        nonlocal sent
+        session_id = f"load-{user_index % sessions}"
+        while time.perf_counter() - started < duration_s:
+            if max_messages is not None and sent >= max_messages:
+                return
+            sent += 1
+            await recorder.send(workflow, next(prompts), session_id, time.perf_counter(), deadline_seconds)
+    
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return recorder, time.perf_counter() - started
+
+def _levels(value: str) -> List[float]:
+    return [float(level) for level in value.split(",") if level.strip()]
+
+def _print_level(label: str, level: Dict[str, Any]):
+    latency = level["latency"]
+    print(
+        f"{label:<18} throughput={level['throughput_msg_per_s']:.1f} msg/s "
+        f"p50={latency['p50_ms']:.1f}ms p95={latency['p95_ms']:.1f}ms p99={latency['p99_ms']:.1f}ms "
+        f"errors={level['error_rate']:.1%} degraded={level['degraded_rate']:.1%} "
+        f"llm/msg={level['llm_calls_per_message']:.2f}"
+    )
+    for route, summary in level["routes"].items():
+        if summary["count"]:
+            print(f"  {route:<16} n={summary['count']:<5} p50={summary['p50_ms']:.1f}ms p99={summary['p99_ms']:.1f}ms")
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="SecureChatbotWorkflow 부하 생성기 (가짜 LLM 또는 카세트 재생)")
+    parser.add_argument("--mode", choices=["open", "closed"], default="closed", help="open: 목표 RPS, closed: 고정 동시성")
+    parser.add_argument("--rps", default="10,50,100", help="오픈 루프 목표 RPS 목록 (쉼표 구분)")
+    parser.add_argument("--arrival", choices=["poisson", "constant"], default="poisson", help="오픈 루프 도착 간격 분포")
+    parser.add_argument("--concurrency", default="1,8,32", help="클로즈드 루프 동시 사용자 수 목록 (쉼표 구분)")
+    parser.add_argument("--duration", type=float, default=10.0, help="수준별 실행 시간(초)")
+    parser.add_argument("--messages", type=int, default=None, help="클로즈드 루프 수준별 최대 메시지 수")
+    parser.add_argument("--sessions", type=int, default=100, help="요청을 나눠 보낼 세션 수")
+    parser.add_argument("--corpus", help="프롬프트 코퍼스 파일 (JSON Lines 또는 줄 단위 텍스트)")
+    parser.add_argument("--deadline-seconds", type=float, default=None, help="요청당 시간 예산 (가드 + 응답 생성)")
+    parser.add_argument("--guard-latency-ms", type=float, default=50.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--per-token-ms", type=float, default=0.0)
+    parser.add_argument("--latency-dist", choices=["constant", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--chat-tokens", type=int, default=40)
+    parser.add_argument("--cassette", help="가짜 모델 대신 재생할 카세트 파일")
+    parser.add_argument("--cassette-latency-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load_output.json", help="결과 JSON 경로")
+    args = parser.parse_args(argv)
+    
+    stats = FakeCallStats()
+    timings: Dict[str, List[float]] = defaultdict(list)
+    cassette = Cassette(args.cassette, "replay", args.cassette_latency_scale) if args.cassette else None
+    workflow = build_workflow(args, stats, timings, cassette)
+    
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    elif cassette is not None and cassette.requests:
+        corpus = [("recorded", request["user_input"]) for request in cassette.requests]
+    else:
+        corpus = DEFAULT_CORPUS
+    rng = random.Random(args.seed)
+    
+    def llm_calls() -> int:
+        if cassette is not None:
+            cassette_stats = cassette.get_stats()
+            return cassette_stats["exact_hits"] + cassette_stats["loose_hits"]
+        return stats.total_calls()
+    
+    levels = []
+    for level in _levels(args.rps if args.mode == "open" else args.concurrency):
+        calls_before = llm_calls()
+        if args.mode == "open":
+            recorder, elapsed = asyncio.run(run_open_loop(
+                workflow, corpus, level, args.duration, args.sessions, args.arrival, rng, args.deadline_seconds
+            ))
+            label = f"rps={level:g}"
+        else:
+            recorder, elapsed = asyncio.run(run_closed_loop(
+                workflow, corpus, int(level), args.duration, args.sessions, rng, args.deadline_seconds, args.messages
+            ))
+            label = f"concurrency={int(level)}"
+        summary = {"level": level, **recorder.report(elapsed, llm_calls() - calls_before)}
+        levels.append(summary)
+        _print_level(label, summary)
+    
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "corpus_size": len(corpus),
+        "levels": levels,
+        "nodes": {node: summarize(values) for node, values in timings.items()},
+        "cassette": cassette.get_stats() if cassette is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2, ensure_ascii=False)
+    print(f"peak RSS: {report['peak_rss_mb']:.1f} MB -> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import json
+import re
+import timeit
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from src.agents.output_safety_agent import RISK_KEYWORDS
+from src.agents.question_classifier import FALLBACK_KEYWORDS
+from src.agents.security_agent import INJECTION_PATTERNS
+from src.utils.matcher import KeywordMatcher, compiled_pattern_matcher
+from .corpus import DEFAULT_CORPUS
+from .run import git_revision
+
+# 기존 코드와 같은 방식: 입력을 소문자로 바꾼 뒤 패턴마다 re.search, 키워드마다 in 검사
+def baseline_patterns(text: str) -> List[str]:
+    text_lower = text.lower()
+    return [pattern for pattern in INJECTION_PATTERNS if re.search(pattern, text_lower, re.IGNORECASE)]
+
+def baseline_keywords(text: str, keyword_groups: Dict[str, List[str]]) -> List[str]:
+    text_lower = text.lower()
+    return [label for label, keywords in keyword_groups.items() if any(keyword in text_lower for keyword in keywords)]
+
+def per_call_us(func: Callable[[str], Any], texts: Sequence[str], repeat: int) -> float:
+    timer = timeit.Timer(lambda: [func(text) for text in texts])
+    best = min(timer.repeat(repeat=repeat, number=1))
+    return best / len(texts) * 1_000_000
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="인젝션 패턴/폴백 키워드 스캔 속도를 기존 방식(re.search, in)과 비교")
+    parser.add_argument("--repeat", type=int, default=200, help="측정 반복 횟수 (최솟값 사용)")
+    parser.add_argument("--long-chars", type=int, default=8000, help="긴 입력 길이")
+    parser.add_argument("--output", default="matcher.json", help="결과 JSON 경로")
+    args = parser.parse_args(argv)
+    
+    short_texts = [text for _, text in DEFAULT_CORPUS]
+    filler = "회의록을 정리해서 공유해 주세요. please summarize the meeting notes. "
+    long_texts = [(filler * (args.long_chars // len(filler) + 1))[:args.long_chars] + text for text in short_texts[:5]]
+    
+    pattern_matcher = compiled_pattern_matcher(tuple(INJECTION_PATTERNS))
+    keyword_matchers = {name: KeywordMatcher(groups) for name, groups in (("fallback", FALLBACK_KEYWORDS), ("risk", RISK_KEYWORDS))}
+    groups = {"fallback": FALLBACK_KEYWORDS, "risk": RISK_KEYWORDS}
+    
+    cases = {
+        "patterns.baseline": lambda text: baseline_patterns(text),
+        "patterns.matcher": lambda text: pattern_matcher.matched_patterns(text),
+    }
+    for name, keyword_matcher in keyword_matchers.items():
+        cases[f"keywords.{name}.baseline"] = lambda text, name=name: baseline_keywords(text, groups[name])
+        cases[f"keywords.{name}.matcher"] = lambda text, keyword_matcher=keyword_matcher: keyword_matcher.matched_labels(text)
+    
+    report: Dict[str, Any] = {"revision": git_revision(), "results": {}}
+    for size, texts in (("short", short_texts), ("long", long_texts)):
+        for case, func in cases.items():
+            report["results"][f"{size}.{case}"] = per_call_us(func, texts, args.repeat)
+    
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2, ensure_ascii=False)
+    
+    for case, value in report["results"].items():
+        print(f"{case:<36} {value:9.2f}us/call")
+    print(f"-> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -34,13 +34,18 @@ def main():
             if not user_input:
                 continue
             
-            result = chatbot.process_message(user_input)
-            
-            if result["blocked"]:
-                print(f"🚫 Security Alert: {result['response']}")
-                print(f"   Risk Level: {result['security_check']['risk_level']}")
-            else:
-                print(f"\n🤖 Assistant: {result['response']}")
+            for event in chatbot.stream_message(user_input):
+                if event["type"] == "guard":
+                    result = event["result"]
+                    if result["blocked"]:
+                        print(f"🚫 Security Alert: {result['response']}")
+                        print(f"   Risk Level: {result['security_check']['risk_level']}")
+                    else:
+                        print("\n🤖 Assistant: ", end="", flush=True)
+                elif event["type"] == "token":
+                    print(event["content"], end="", flush=True)
+                elif event["type"] == "done" and not event["result"]["blocked"]:
+                    print()
         
         except KeyboardInterrupt:
             print("\n\nGoodbye! 👋")
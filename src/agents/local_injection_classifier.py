@@ -0,0 +1,162 @@
+import argparse
+import json
+import zlib
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+DEFAULT_N_FEATURES = 2 ** 18
+CHAR_NGRAM_RANGE = (2, 4)
+WORD_NGRAM_RANGE = (1, 2)
+MAX_INPUT_CHARS = 4000
+
+class HashingVectorizer:
+    """문자/단어 n-gram을 crc32 해시로 고정 크기 희소 벡터에 매핑 (프로세스 간 해시 값이 안정적)"""
+    
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES):
+        self.n_features = n_features
+    
+    def _ngrams(self, text: str) -> List[str]:
+        text = text[:MAX_INPUT_CHARS].lower()
+        features = []
+        
+        padded = f" {' '.join(text.split())} "
+        for n in range(CHAR_NGRAM_RANGE[0], CHAR_NGRAM_RANGE[1] + 1):
+            features.extend("c" + padded[i:i + n] for i in range(len(padded) - n + 1))
+        
+        words = text.split()
+        for n in range(WORD_NGRAM_RANGE[0], WORD_NGRAM_RANGE[1] + 1):
+            features.extend("w" + " ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+        
+        return features
+    
+    def transform(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        features = self._ngrams(text)
+        if not features:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode("utf-8")) for feature in features),
+            dtype=np.int64,
+            count=len(features)
+        )
+        # 최상위 비트로 부호를 정해 해시 충돌의 편향을 줄임
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        indices, inverse = np.unique(hashes % self.n_features, return_inverse=True)
+        values = np.bincount(inverse, weights=signs)
+        
+        norm = np.linalg.norm(values)
+        if norm > 0:
+            values = values / norm
+        return indices.astype(np.int64), values
+
+class LocalInjectionClassifier:
+    """해싱 벡터 + 로지스틱 회귀로 인젝션 확률을 CPU에서 바로 계산하는 로컬 분류기"""
+    
+    # 점수는 입력 앞부분 이 길이만 보고 계산됨
+    max_input_chars = MAX_INPUT_CHARS
+    
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES):
+        self.vectorizer = HashingVectorizer(n_features)
+        self.weights = np.zeros(n_features, dtype=np.float64)
+        self.bias = 0.0
+    
+    def score(self, text: str) -> float:
+        """인젝션 확률 (max_input_chars보다 긴 입력은 앞부분만 반영)"""
+        indices, values = self.vectorizer.transform(text)
+        logit = float(self.weights[indices] @ values) + self.bias
+        return float(1.0 / (1.0 + np.exp(-logit)))
+    
+    def train(
+        self,
+        texts: Sequence[str],
+        labels: Sequence[int],
+        epochs: int = 10,
+        learning_rate: float = 0.5,
+        l2: float = 1e-6,
+        seed: int = 0
+    ) -> float:
+        rows = [self.vectorizer.transform(text) for text in texts]
+        targets = np.asarray(labels, dtype=np.float64)
+        
+        # 클래스 불균형 보정: 각 클래스의 총 가중치를 같게 맞춤
+        positives = max(targets.sum(), 1.0)
+        negatives = max(len(targets) - targets.sum(), 1.0)
+        sample_weights = np.where(targets > 0.5, len(targets) / (2 * positives), len(targets) / (2 * negatives))
+        
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            for i in rng.permutation(len(rows)):
+                indices, values = rows[i]
+                logit = float(self.weights[indices] @ values) + self.bias
+                prediction = 1.0 / (1.0 + np.exp(-logit))
+                gradient = (prediction - targets[i]) * sample_weights[i]
+                
+                self.weights[indices] -= learning_rate * (gradient * values + l2 * self.weights[indices])
+                self.bias -= learning_rate * gradient
+        
+        predictions = np.array([self.score(text) >= 0.5 for text in texts])
+        return float((predictions == (targets > 0.5)).mean()) if len(targets) else 0.0
+    
+    def save(self, path: str):
+        # 대부분 0인 가중치는 희소 형태로 저장
+        nonzero = np.flatnonzero(self.weights)
+        np.savez_compressed(
+            path,
+            n_features=self.vectorizer.n_features,
+            indices=nonzero,
+            weights=self.weights[nonzero],
+            bias=self.bias
+        )
+    
+    @classmethod
+    def load(cls, path: str) -> "LocalInjectionClassifier":
+        data = np.load(path)
+        classifier = cls(int(data["n_features"]))
+        classifier.weights[data["indices"]] = data["weights"]
+        classifier.bias = float(data["bias"])
+        return classifier
+
+def load_corpus(path: str) -> Tuple[List[str], List[int]]:
+    """{"text": ..., "label": 1 | 0 | "injection" | "safe"} 형식의 JSONL 코퍼스 읽기"""
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            label = record["label"]
+            if isinstance(label, str):
+                label = 1 if label.lower() in ("injection", "malicious", "1", "true") else 0
+            texts.append(record["text"])
+            labels.append(int(label))
+    return texts, labels
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="로컬 프롬프트 인젝션 분류기 학습")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    train_parser = subparsers.add_parser("train", help="라벨링된 JSONL 코퍼스로 가중치 학습")
+    train_parser.add_argument("corpus", help="JSONL 코퍼스 경로")
+    train_parser.add_argument("--output", required=True, help="저장할 가중치 파일 경로 (.npz)")
+    train_parser.add_argument("--epochs", type=int, default=10)
+    train_parser.add_argument("--learning-rate", type=float, default=0.5)
+    train_parser.add_argument("--n-features", type=int, default=DEFAULT_N_FEATURES)
+    
+    score_parser = subparsers.add_parser("score", help="저장된 가중치로 입력 점수 계산")
+    score_parser.add_argument("weights", help="가중치 파일 경로 (.npz)")
+    score_parser.add_argument("text", help="검사할 입력")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "train":
+        texts, labels = load_corpus(args.corpus)
+        classifier = LocalInjectionClassifier(args.n_features)
+        accuracy = classifier.train(texts, labels, epochs=args.epochs, learning_rate=args.learning_rate)
+        classifier.save(args.output)
+        print(f"학습 완료: {len(texts)}건, 학습 정확도 {accuracy:.3f}, 저장 위치 {args.output}")
+    elif args.command == "score":
+        classifier = LocalInjectionClassifier.load(args.weights)
+        print(f"{classifier.score(args.text):.4f}")
+
+if __name__ == "__main__":
+    main()
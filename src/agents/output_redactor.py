@@ -0,0 +1,172 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from ..utils.cpu_offload import register_warmup
+from ..utils.matcher import Hit, PatternMatcher
+from ..utils.metrics import metrics
+
+REDACTIONS = metrics.counter(
+    "chatbot_output_redactions_total", "Sensitive values redacted from model output", ["category"]
+)
+
+# (카테고리, 정규식) 순서가 우선순위: 같은 위치에서 시작하면 앞 패턴이 먼저 매칭됨
+REDACTION_PATTERNS: List[Tuple[str, str]] = [
+    ("private_key", r"-----BEGIN [A-Z ]*PRIVATE KEY-----"),
+    ("api_key", r"\bsk-(?:proj-)?[A-Za-z0-9_-]{20,}"),
+    ("api_key", r"\bAKIA[0-9A-Z]{16}\b"),
+    ("api_key", r"\bgh[oprsu]_[A-Za-z0-9]{36,}"),
+    ("api_key", r"\bxox[abprs]-[A-Za-z0-9-]{10,}"),
+    ("api_key", r"\bAIza[0-9A-Za-z_-]{35}"),
+    ("token", r"\beyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}"),
+    ("token", r"(?i:\bbearer\s+)[A-Za-z0-9._~+/-]{20,}=*"),
+    ("rrn", r"(?<!\d)\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])\s?-\s?[1-8]\d{6}(?!\d)"),
+    ("phone", r"(?<!\d)01[016789][- .]?\d{3,4}[- .]?\d{4}(?!\d)"),
+    ("phone", r"(?<!\d)0(?:2|[3-6][1-5])-\d{3,4}-\d{4}(?!\d)"),
+    ("card", r"(?<!\d)\d(?:[ -]?\d){12,18}(?!\d)"),
+    ("account", r"(?<!\d)\d{3,6}-\d{2,6}-\d{3,8}(?:-\d{1,3})?(?!\d)"),
+]
+
+# 스트리밍 시 청크 경계에 걸친 매칭을 위해 붙잡아 두는 꼬리 길이
+# (각 패턴이 매칭 가능해지는 최소 길이보다 길어야 함)
+STREAM_LOOKBACK = 64
+# 한 매칭이 끝나지 않고 계속 길어질 때(긴 토큰 등) 붙잡아 둘 수 있는 최대 길이
+STREAM_MAX_HOLD = 4096
+
+def luhn_valid(digits: str) -> bool:
+    total = 0
+    for index, char in enumerate(reversed(digits)):
+        value = ord(char) - 48
+        if index % 2 == 1:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return total % 10 == 0
+
+def _digits(text: str) -> str:
+    return "".join(char for char in text if char.isdigit())
+
+# 정규식만으로 거르기 어려운 카테고리의 추가 검증
+VALIDATORS: Dict[str, Callable[[str], bool]] = {
+    "card": lambda value: 13 <= len(_digits(value)) <= 19 and luhn_valid(_digits(value)),
+}
+
+# 검증에 실패한 후보를 다른 카테고리로 다시 판정 (Luhn이 맞지 않는 긴 하이픈 숫자열은 계좌번호일 수 있음)
+REVALIDATE_AS: Dict[str, Tuple[str, "re.Pattern[str]"]] = {
+    "card": ("account", re.compile(r"\d{3,6}-\d{2,6}-\d{3,8}(?:-\d{1,3})?")),
+}
+
+def record_redactions(counts: Dict[str, int]):
+    for category, count in counts.items():
+        REDACTIONS.inc(count, category=category)
+
+class OutputRedactor:
+    """모델 출력에서 주민번호, 카드번호(Luhn), 계좌/전화번호, API 키/토큰을 찾아 치환"""
+    
+    def __init__(self, patterns: List[Tuple[str, str]] = REDACTION_PATTERNS):
+        self.categories = {pattern: category for category, pattern in patterns}
+        self.matcher = PatternMatcher([pattern for _, pattern in patterns], flags=0)
+    
+    def find(self, text: str) -> List[Tuple[str, Hit]]:
+        found = []
+        for hit in self.matcher.scan_leftmost(text):
+            category = self.categories[hit.label]
+            validator = VALIDATORS.get(category)
+            if validator is None or validator(hit.value):
+                found.append((category, hit))
+                continue
+            fallback = REVALIDATE_AS.get(category)
+            if fallback is not None and fallback[1].fullmatch(hit.value):
+                found.append((fallback[0], hit))
+        return found
+    
+    @staticmethod
+    def mask(category: str) -> str:
+        return f"[REDACTED:{category}]"
+    
+    def _apply(self, text: str, found: List[Tuple[str, Hit]], counts: Dict[str, int]) -> str:
+        # 매칭 구간 사이를 이어 붙여 한 번에 새 문자열을 만듦 (입력 길이에 선형)
+        parts = []
+        position = 0
+        for category, hit in found:
+            parts.append(text[position:hit.start])
+            parts.append(self.mask(category))
+            position = hit.end
+            counts[category] = counts.get(category, 0) + 1
+        parts.append(text[position:])
+        return "".join(parts)
+    
+    def scan(self, text: str) -> Tuple[str, Dict[str, int]]:
+        """메트릭 기록 없이 치환만 수행 (오프로딩 워커에서 실행)"""
+        counts: Dict[str, int] = {}
+        return self._apply(text, self.find(text), counts), counts
+    
+    def redact(self, text: str) -> Tuple[str, Dict[str, int]]:
+        redacted, counts = self.scan(text)
+        record_redactions(counts)
+        return redacted, counts
+    
+    def stream(self) -> "StreamingRedactor":
+        return StreamingRedactor(self)
+
+class StreamingRedactor:
+    """청크 단위로 들어오는 출력을 치환하며 내보냄. 경계에 걸칠 수 있는 꼬리만 잠시 보류"""
+    
+    def __init__(self, redactor: OutputRedactor, lookback: int = STREAM_LOOKBACK, max_hold: int = STREAM_MAX_HOLD):
+        self.redactor = redactor
+        self.lookback = lookback
+        self.max_hold = max_hold
+        self.counts: Dict[str, int] = {}
+        self._pending = ""
+    
+    def feed(self, chunk: str) -> str:
+        """지금 내보내도 안전한 (치환된) 텍스트 반환"""
+        buffer = self._pending + chunk
+        cut = len(buffer) - self.lookback
+        if cut <= 0:
+            self._pending = buffer
+            return ""
+        
+        found = self.redactor.find(buffer)
+        emitted = []
+        for category, hit in found:
+            if hit.end <= cut:
+                emitted.append((category, hit))
+            elif hit.start < cut:
+                # 자르는 지점에 걸친 매칭은 다음 청크에서 더 길어질 수 있으므로 시작점부터 보류
+                cut = hit.start
+                break
+            else:
+                break
+        
+        if len(buffer) - cut > self.max_hold:
+            # 보류 구간이 상한을 넘으면 현재까지의 매칭으로 확정
+            cut = len(buffer)
+            emitted = found
+        
+        self._pending = buffer[cut:]
+        return self._emit(buffer[:cut], emitted)
+    
+    def flush(self) -> str:
+        buffer, self._pending = self._pending, ""
+        return self._emit(buffer, self.redactor.find(buffer))
+    
+    def _emit(self, text: str, found: List[Tuple[str, Hit]]) -> str:
+        counts: Dict[str, int] = {}
+        text = self.redactor._apply(text, found, counts)
+        for category, count in counts.items():
+            self.counts[category] = self.counts.get(category, 0) + count
+        record_redactions(counts)
+        return text
+
+_default_redactor: Optional[OutputRedactor] = None
+
+def get_output_redactor() -> OutputRedactor:
+    global _default_redactor
+    if _default_redactor is None:
+        _default_redactor = OutputRedactor()
+    return _default_redactor
+
+def scan_output(text: str) -> Tuple[str, Dict[str, int]]:
+    return get_output_redactor().scan(text)
+
+register_warmup(get_output_redactor)
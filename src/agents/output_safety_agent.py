@@ -1,14 +1,34 @@
-from typing import Dict, Any, List, Literal
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
-from langchain.output_parsers import PydanticOutputParser
+from typing import TYPE_CHECKING, Dict, Any, List, Literal, Optional
 from pydantic import BaseModel, Field
-from langsmith import traceable
 from ..config.settings import settings
-from ..utils.langsmith_config import LangSmithTracker
+from ..utils.langsmith_config import LangSmithTracker, traceable
+from ..utils.deadline import DeadlineExceeded, acall_with_deadline, call_with_deadline
+from ..utils.llm_clients import LazyChatModel, get_chat_model
+from ..utils.llm_scheduler import PRIORITY_GUARD, llm_scheduler
+from ..utils.matcher import KeywordMatcher
+from ..utils.metrics import FALLBACKS, record_llm_usage
+from ..utils.single_flight import get_single_flight
+from ..utils.verdict_cache import bind_verdict_cache
+from .prompt_compiler import StructuredGuardLLM, prompt_compiler
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
 
 SafetyLevel = Literal["safe", "warning", "blocked"]
 
+# 키워드 폴백 평가용 위험 키워드
+RISK_KEYWORDS = {
+    "high": [
+        "password", "비밀번호", "secret", "비밀", "token", "토큰",
+        "주민번호", "ssn", "여권번호", "passport", "신용카드", "카드번호",
+        "계좌번호", "account", "api_key", "private_key"
+    ],
+    "medium": [
+        "credential", "인증", "private", "개인정보", "의료", "병력",
+        "급여", "salary", "내부", "기밀", "confidential"
+    ],
+}
+
 class SafetyAssessment(BaseModel):
     safety_level: SafetyLevel = Field(description="안전성 평가 등급")
     confidence: float = Field(description="평가 신뢰도 (0.0-1.0)", ge=0.0, le=1.0)
@@ -17,14 +37,19 @@ class SafetyAssessment(BaseModel):
     recommended_action: str = Field(description="권장 조치")
 
 class OutputSafetyAgent:
+    llm = LazyChatModel(lambda: get_chat_model(settings.model_name, temperature=0.1))
+    
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model=settings.model_name,
-            temperature=0.1,
-            api_key=settings.openai_api_key
-        )
-        self.parser = PydanticOutputParser(pydantic_object=SafetyAssessment)
+        self.structured_output = StructuredGuardLLM(SafetyAssessment)
+        self.parser = self.structured_output.parser
         self.tracker = LangSmithTracker("output_safety_agent")
+        self.keyword_matcher = KeywordMatcher(RISK_KEYWORDS)
+        self.single_flight = get_single_flight("output_safety")
+        self.verdict_cache = bind_verdict_cache(
+            "output_safety",
+            lambda: [message.content for message in self._build_messages("")],
+            lambda: getattr(self.llm, "model_name", "")
+        )
         
         self.system_prompt = """당신은 사용자 요청의 안전성을 평가하는 보안 전문가입니다.
 
@@ -55,35 +80,77 @@ class OutputSafetyAgent:
 - "SAP에서 주문 조회하는 방법은?" → safe
 
 {format_instructions}"""
-
+        
+        # 시스템 메시지는 한 번만 만들어 두고 요청마다 재사용 (입력은 항상 마지막 메시지 끝에 붙음)
+        human_prefix = "다음 사용자 요청의 안전성을 평가해주세요: "
+        self.text_prompt = prompt_compiler.compile("output_safety", self.system_prompt, human_prefix, SafetyAssessment)
+        self.native_prompt = prompt_compiler.compile(
+            "output_safety", self.system_prompt, human_prefix, SafetyAssessment, native=True
+        )
+    
+    def _build_messages(self, user_request: str, native: bool = False) -> List["BaseMessage"]:
+        prompt = self.native_prompt if native else self.text_prompt
+        return prompt.messages(user_request)
+    
+    def _error_result(self, error: Exception) -> SafetyAssessment:
+        return SafetyAssessment(
+            safety_level="blocked",
+            confidence=1.0,
+            risk_categories=["system_error"],
+            reasoning=f"안전성 평가 중 오류 발생: {str(error)}",
+            recommended_action="요청을 차단하고 시스템 관리자에게 문의"
+        )
+    
+    def _flight_key(self, user_request: str):
+        return self.single_flight.key(user_request, getattr(self.llm, "model_name", ""))
+    
+    def _llm_assess(self, user_request: str) -> SafetyAssessment:
+        # 같은 입력으로 동시에 들어온 요청은 LLM 호출 하나를 공유
+        return self.single_flight.do(self._flight_key(user_request), lambda: self._request_assessment(user_request))
+    
+    async def _allm_assess(self, user_request: str) -> SafetyAssessment:
+        return await self.single_flight.ado(self._flight_key(user_request), lambda: self._arequest_assessment(user_request))
+    
+    def _request_assessment(self, user_request: str) -> SafetyAssessment:
+        structured = self.structured_output.runnable_for(self.llm)
+        response = llm_scheduler.invoke(
+            structured or self.llm,
+            self._build_messages(user_request, native=structured is not None),
+            priority=PRIORITY_GUARD,
+            agent="output_safety"
+        )
+        record_llm_usage("output_safety", response)
+        return self.structured_output.parse(response)
+    
+    async def _arequest_assessment(self, user_request: str) -> SafetyAssessment:
+        structured = self.structured_output.runnable_for(self.llm)
+        response = await llm_scheduler.ainvoke(
+            structured or self.llm,
+            self._build_messages(user_request, native=structured is not None),
+            priority=PRIORITY_GUARD,
+            agent="output_safety"
+        )
+        record_llm_usage("output_safety", response)
+        return self.structured_output.parse(response)
+    
     @traceable(name="assess_safety")
     def assess_safety(self, user_request: str) -> SafetyAssessment:
         try:
-            messages = [
-                SystemMessage(content=self.system_prompt.format(
-                    format_instructions=self.parser.get_format_instructions()
-                )),
-                HumanMessage(content=f"다음 사용자 요청의 안전성을 평가해주세요: {user_request}")
-            ]
-            
-            response = self.llm.invoke(messages)
-            result = self.parser.parse(response.content)
-            return result
-            
+            return self._llm_assess(user_request)
         except Exception as e:
-            return SafetyAssessment(
-                safety_level="blocked",
-                confidence=1.0,
-                risk_categories=["system_error"],
-                reasoning=f"안전성 평가 중 오류 발생: {str(e)}",
-                recommended_action="요청을 차단하고 시스템 관리자에게 문의"
-            )
+            return self._error_result(e)
     
-    @traceable(name="assess_with_fallback")
-    def assess_with_fallback(self, user_request: str) -> Dict[str, Any]:
-        result = self.assess_safety(user_request)
-        
+    @traceable(name="aassess_safety")
+    async def aassess_safety(self, user_request: str) -> SafetyAssessment:
+        try:
+            return await self._allm_assess(user_request)
+        except Exception as e:
+            return self._error_result(e)
+    
+    def apply_fallback(self, user_request: str, result: SafetyAssessment) -> Dict[str, Any]:
+        """LLM 평가 결과를 최종 결과로 변환 (신뢰도가 낮으면 키워드 폴백)"""
         if result.confidence < 0.3:
+            FALLBACKS.inc(agent="output_safety", reason="low_confidence")
             fallback_result = self._fallback_assessment(user_request)
             return {
                 "safety_level": fallback_result["safety_level"],
@@ -108,30 +175,82 @@ class OutputSafetyAgent:
             "recommended_action": result.recommended_action
         }
     
-    def _fallback_assessment(self, user_request: str) -> Dict[str, Any]:
-        request_lower = user_request.lower()
+    def _cached_assessment(self, user_request: str):
+        # (캐시 키, 캐시된 결과) 반환. 캐시를 쓰지 않으면 (None, None)
+        if self.verdict_cache is None:
+            return None, None
+        key = self.verdict_cache.key(user_request)
+        return key, self.verdict_cache.get(key)
+    
+    @traceable(name="assess_with_fallback")
+    def assess_with_fallback(self, user_request: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        cache_key, cached = self._cached_assessment(user_request)
+        if cached is not None:
+            return cached
         
-        high_risk_patterns = [
-            "password", "비밀번호", "secret", "비밀", "token", "토큰",
-            "주민번호", "ssn", "여권번호", "passport", "신용카드", "카드번호",
-            "계좌번호", "account", "api_key", "private_key"
-        ]
+        try:
+            result = call_with_deadline(lambda: self._llm_assess(user_request), deadline, "output_safety")
+        except DeadlineExceeded:
+            return self.degraded_assessment(user_request)
+        except Exception as e:
+            # 오류로 인한 차단 판정은 캐시하지 않음 (다음 요청에서 다시 평가)
+            return self.apply_fallback(user_request, self._error_result(e))
         
-        medium_risk_patterns = [
-            "credential", "인증", "private", "개인정보", "의료", "병력",
-            "급여", "salary", "내부", "기밀", "confidential"
-        ]
+        assessment = self.apply_fallback(user_request, result)
+        if cache_key is not None:
+            self.verdict_cache.set(cache_key, assessment)
+        return assessment
+    
+    @traceable(name="aassess_with_fallback")
+    async def aassess_with_fallback(self, user_request: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        cache_key, cached = self._cached_assessment(user_request)
+        if cached is not None:
+            return cached
+        
+        try:
+            result = await acall_with_deadline(lambda: self._allm_assess(user_request), deadline, "output_safety")
+        except DeadlineExceeded:
+            return self.degraded_assessment(user_request)
+        except Exception as e:
+            return self.apply_fallback(user_request, self._error_result(e))
+        
+        assessment = self.apply_fallback(user_request, result)
+        if cache_key is not None:
+            self.verdict_cache.set(cache_key, assessment)
+        return assessment
+    
+    def degraded_assessment(self, user_request: str) -> Dict[str, Any]:
+        """시간 예산 초과 시 키워드 평가 (degraded 표시, 캐시하지 않음)"""
+        FALLBACKS.inc(agent="output_safety", reason="deadline")
+        fallback_result = self._fallback_assessment(user_request)
+        safety_level = fallback_result["safety_level"]
+        recommended_action = fallback_result["recommended_action"]
+        # 키워드에 걸리지 않았다는 것만으로는 안전하다고 볼 수 없으므로 fail-open이 아니면 승인하지 않음
+        if safety_level == "safe" and not settings.request_deadline_fail_open:
+            safety_level = "warning"
+            recommended_action = "안전성 검증이 완료되지 않아 응답하지 않음"
+        return {
+            "safety_level": safety_level,
+            "confidence": 0.5,
+            "risk_categories": fallback_result["risk_categories"],
+            "reasoning": "요청 시간 예산 초과로 키워드 기반 평가 사용",
+            "recommended_action": recommended_action,
+            "degraded": True
+        }
+    
+    def _fallback_assessment(self, user_request: str) -> Dict[str, Any]:
+        risk_levels = self.keyword_matcher.matched_labels(user_request)
         
         detected_risks = []
         
-        if any(pattern in request_lower for pattern in high_risk_patterns):
+        if "high" in risk_levels:
             detected_risks.extend(["credentials", "personal_info"])
             return {
                 "safety_level": "blocked",
                 "risk_categories": detected_risks,
                 "recommended_action": "요청 차단 - 고위험 정보 포함"
             }
-        elif any(pattern in request_lower for pattern in medium_risk_patterns):
+        elif "medium" in risk_levels:
             detected_risks.extend(["personal_info"])
             return {
                 "safety_level": "warning", 
@@ -0,0 +1,151 @@
+import json
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from ..config.settings import settings
+from ..core.chat_history import MESSAGE_TOKEN_OVERHEAD, TokenCounter
+from ..utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage, SystemMessage
+
+PROMPT_TOKENS = metrics.gauge(
+    "chatbot_prompt_tokens", "Static prompt prefix tokens per compiled guard prompt", ["prompt", "mode"]
+)
+
+class CompiledPrompt:
+    """시스템 메시지와 사람 메시지 템플릿을 한 번만 만들어 두고 입력만 끼워 넣는 프롬프트"""
+    
+    def __init__(self, name: str, mode: str, system_message: "SystemMessage", human_prefix: str, schema_tokens: int = 0):
+        self.name = name
+        self.mode = mode
+        self.system_message = system_message
+        # 입력이 항상 마지막에 오도록 해 고정 부분이 프롬프트 앞쪽(프로바이더 prefix 캐시 대상)에 모이게 함
+        self.human_prefix = human_prefix
+        self.schema_tokens = schema_tokens
+        self.prefix_tokens = 0
+    
+    def messages(self, text: str) -> List["BaseMessage"]:
+        from langchain.schema import HumanMessage
+        return [self.system_message, HumanMessage(content=f"{self.human_prefix}{text}")]
+
+class PromptCompiler:
+    """에이전트 프롬프트를 모드별(native 구조화 출력 / 텍스트 포맷 지시문)로 컴파일하고 토큰 수를 기록"""
+    
+    def __init__(self):
+        self._prompts: Dict[Tuple[str, str, str, str], CompiledPrompt] = {}
+        self._lock = threading.Lock()
+        self._reported = False
+        self._token_counter: Optional[TokenCounter] = None
+    
+    def _count(self, prompt: CompiledPrompt) -> int:
+        if self._token_counter is None:
+            self._token_counter = TokenCounter(settings.model_name)
+        human_prefix = self._token_counter.count_text(prompt.human_prefix) + MESSAGE_TOKEN_OVERHEAD
+        system = self._token_counter.count_text(prompt.system_message.content) + MESSAGE_TOKEN_OVERHEAD
+        return system + human_prefix + prompt.schema_tokens
+    
+    def compile(
+        self,
+        name: str,
+        system_prompt: str,
+        human_prefix: str,
+        schema: Optional[Type[BaseModel]] = None,
+        native: bool = False
+    ) -> CompiledPrompt:
+        """system_prompt의 {format_instructions} 자리는 native면 비우고, 아니면 파서 지시문으로 채움"""
+        mode = "native" if native else "text"
+        key = (name, mode, system_prompt, human_prefix)
+        with self._lock:
+            prompt = self._prompts.get(key)
+            if prompt is not None:
+                return prompt
+        
+        # langchain은 임포트 비용이 커서 첫 컴파일(에이전트 생성) 시점에 불러옴
+        from langchain.output_parsers import PydanticOutputParser
+        from langchain.schema import SystemMessage
+        
+        schema_tokens = 0
+        if schema is None:
+            content = system_prompt
+        elif native:
+            content = system_prompt.replace("{format_instructions}", "").rstrip()
+            # native 모드에서는 스키마가 함수 정의로 전달되므로 그 크기를 별도로 셈
+            if self._token_counter is None:
+                self._token_counter = TokenCounter(settings.model_name)
+            schema_tokens = self._token_counter.count_text(json.dumps(schema.model_json_schema(), ensure_ascii=False))
+        else:
+            content = system_prompt.format(
+                format_instructions=PydanticOutputParser(pydantic_object=schema).get_format_instructions()
+            )
+        
+        prompt = CompiledPrompt(name, mode, SystemMessage(content=content), human_prefix, schema_tokens)
+        prompt.prefix_tokens = self._count(prompt)
+        PROMPT_TOKENS.set(prompt.prefix_tokens, prompt=name, mode=mode)
+        with self._lock:
+            return self._prompts.setdefault(key, prompt)
+    
+    def token_report(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            prompts = list(self._prompts.values())
+        report: Dict[str, Dict[str, int]] = {}
+        for prompt in prompts:
+            report.setdefault(prompt.name, {})[prompt.mode] = prompt.prefix_tokens
+        return report
+    
+    def report_once(self):
+        """프로세스 시작 시 한 번만 프롬프트별 고정 토큰 수 출력"""
+        with self._lock:
+            if self._reported:
+                return
+            self._reported = True
+        print("가드 프롬프트 토큰 수:")
+        for name, modes in sorted(self.token_report().items()):
+            counts = ", ".join(f"{mode}={tokens}" for mode, tokens in sorted(modes.items()))
+            print(f"  {name}: {counts}")
+
+prompt_compiler = PromptCompiler()
+
+def bind_structured_output(llm: Any, schema: Type[BaseModel]) -> Optional[Any]:
+    """프로바이더 native 구조화 출력(function calling) 러너블 생성, 지원하지 않는 모델이면 None"""
+    if not settings.guard_structured_output or not hasattr(llm, "with_structured_output"):
+        return None
+    try:
+        return llm.with_structured_output(
+            schema,
+            method=settings.guard_structured_output_method,
+            include_raw=True
+        )
+    except (NotImplementedError, ValueError, TypeError):
+        return None
+
+class StructuredGuardLLM:
+    """에이전트의 llm이 바뀌면(테스트/벤치마크용 교체 포함) 구조화 출력 러너블을 다시 만듦"""
+    
+    def __init__(self, schema: Type[BaseModel]):
+        from langchain.output_parsers import PydanticOutputParser
+        
+        self.schema = schema
+        self.parser = PydanticOutputParser(pydantic_object=schema)
+        self._bound_llm: Any = None
+        self._runnable: Optional[Any] = None
+        self._lock = threading.Lock()
+    
+    def runnable_for(self, llm: Any) -> Optional[Any]:
+        with self._lock:
+            if self._bound_llm is not llm:
+                self._runnable = bind_structured_output(llm, self.schema)
+                self._bound_llm = llm
+            return self._runnable
+    
+    def parse(self, output: Any) -> BaseModel:
+        """native 결과({'raw', 'parsed', 'parsing_error'}) 또는 텍스트 응답을 스키마 객체로 변환"""
+        if isinstance(output, dict) and "raw" in output:
+            if output.get("parsed") is not None:
+                return output["parsed"]
+            # 함수 호출 대신 본문에 JSON을 쓴 경우 텍스트 파서로 한 번 더 시도
+            raw_content = getattr(output["raw"], "content", "")
+            if raw_content:
+                return self.parser.parse(raw_content)
+            raise output.get("parsing_error") or ValueError("구조화 출력이 비어 있습니다")
+        return self.parser.parse(output.content)
@@ -1,37 +1,107 @@
-from typing import Dict, Any, Literal
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
-from langchain.output_parsers import PydanticOutputParser
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Any, List, Literal, Optional
 from pydantic import BaseModel, Field
-from langsmith import traceable
 from ..config.settings import settings
-from ..utils.langsmith_config import LangSmithTracker
+from ..utils.cpu_offload import cpu_offloader, register_warmup
+from ..utils.deadline import DeadlineExceeded, acall_with_deadline, call_with_deadline
+from ..utils.langsmith_config import LangSmithTracker, traceable
+from ..utils.llm_clients import LazyChatModel, get_chat_model
+from ..utils.llm_scheduler import PRIORITY_GUARD, llm_scheduler
+from ..utils.matcher import KeywordMatcher
+from ..utils.metrics import FALLBACKS, metrics, record_llm_usage
+from ..utils.single_flight import get_single_flight
+from ..utils.verdict_cache import bind_verdict_cache
+from .prompt_compiler import StructuredGuardLLM, prompt_compiler
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
 
 QuestionType = Literal["faq", "sap_automation", "data_request"]
 
+# 키워드 폴백 분류용 키워드 (우선순위: sap_automation > data_request > faq)
+FALLBACK_KEYWORDS = {
+    "faq": ["도움말", "help", "사용법", "how to", "what is", "무엇", "어떻게", "에러", "오류"],
+    "sap_automation": ["sap", "자동화", "gui", "락해제", "process", "업무"],
+    "data_request": ["데이터", "data", "정보", "조회", "검색", "리포트", "report", "통계"],
+}
+FALLBACK_PRIORITY = ["sap_automation", "data_request", "faq"]
+
+# 캐스케이드 1단계 키워드/구문 가중치 (판단이 분명한 구문일수록 높게)
+CASCADE_WEIGHTS = {
+    "faq": {
+        "도움말": 2.5, "사용법": 2.5, "help": 2.0, "how to": 1.5, "what is": 1.5,
+        "어떻게": 1.0, "무엇": 1.0, "뭔가요": 1.0, "에러": 1.0, "오류": 1.0,
+    },
+    "sap_automation": {
+        "락해제": 3.0, "잠금 해제": 3.0, "비밀번호 초기화": 3.0, "tcode": 2.5, "t-code": 2.5,
+        "sap": 2.0, "자동화": 2.0, "gui": 1.0, "워크플로우": 1.0, "process": 0.5, "업무": 0.5,
+    },
+    "data_request": {
+        "리포트": 2.0, "report": 2.0, "통계": 2.0, "조회": 2.0, "검색": 1.5, "데이터": 1.5,
+        "보여주세요": 1.0, "data": 1.0, "매출": 1.0, "정보": 0.5,
+    },
+}
+
+# LLM 판단 없이 키워드만으로 결정된 분류 단계 (캐스케이드 1단계, 저신뢰 폴백, 시간 초과 폴백)
+KEYWORD_TIERS = frozenset({"keyword", "keyword_fallback", "deadline_fallback"})
+
+CLASSIFIER_DECISIONS = metrics.counter(
+    "chatbot_classifier_decisions_total", "Question classifications by deciding tier", ["tier"]
+)
+
+@lru_cache(maxsize=None)
+def cascade_keyword_matcher() -> KeywordMatcher:
+    return KeywordMatcher(CASCADE_WEIGHTS)
+
+def cascade_scores(question: str) -> Dict[str, float]:
+    """카테고리별 가중 키워드 점수 (오프로딩 워커에서도 실행되는 순수 함수)"""
+    scores = {question_type: 0.0 for question_type in CASCADE_WEIGHTS}
+    # 같은 구문이 반복돼도 한 번만 반영
+    for label, phrase in {(hit.label, hit.value) for hit in cascade_keyword_matcher().scan(question)}:
+        scores[label] += CASCADE_WEIGHTS[label][phrase]
+    return scores
+
+def decided_by_keywords(classification: Dict[str, Any]) -> bool:
+    """분류 결과가 키워드로만 결정됐는지 (캐시 적중이면 캐시에 저장될 때의 결정 단계로 판단)"""
+    tier = classification.get("decided_by")
+    if tier == "cache":
+        tier = classification.get("cached_decided_by")
+    return tier in KEYWORD_TIERS
+
+def warm_classifier_worker():
+    cascade_keyword_matcher()
+
+register_warmup(warm_classifier_worker)
+
 class ClassificationResult(BaseModel):
     question_type: QuestionType = Field(description="질문의 분류 타입")
     confidence: float = Field(description="분류 신뢰도 (0.0-1.0)", ge=0.0, le=1.0)
     reasoning: str = Field(description="분류 근거")
 
 class QuestionClassificationAgent:
+    llm = LazyChatModel(lambda: get_chat_model(settings.model_name, temperature=0.1))
+    
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model=settings.model_name,
-            temperature=0.1,
-            api_key=settings.openai_api_key
-        )
-        self.parser = PydanticOutputParser(pydantic_object=ClassificationResult)
+        self.structured_output = StructuredGuardLLM(ClassificationResult)
+        self.parser = self.structured_output.parser
         self.tracker = LangSmithTracker("question_classifier")
+        self.keyword_matcher = KeywordMatcher(FALLBACK_KEYWORDS)
+        self.cascade_matcher = cascade_keyword_matcher()
+        self.single_flight = get_single_flight("question_classifier")
+        self.verdict_cache = bind_verdict_cache(
+            "question_classifier",
+            lambda: [message.content for message in self._build_messages("")],
+            lambda: getattr(self.llm, "model_name", "")
+        )
         
         self.system_prompt = """당신은 사용자 질문을 다음 3가지 카테고리로 분류하는 전문가입니다:
 
 1. **faq**: 일반적인 도움말, 사용법 문의, 기본적인 질문
    - 예시: "어떻게 사용하나요?", "도움말이 필요해요", "이게 뭔가요?"
-   
+
 2. **sap_automation**: SAP 시스템 자동화, 업무 프로세스, 워크플로우 관련
    - 예시: "SAP에서 주문 생성을 자동화하고 싶어요", "id 락해제 해주세요", "비밀번호 초기화 해주세요", "SAP GUI에서 특정 프로세스 자동화 해주세요"
-   
+
 3. **data_request**: 데이터 조회, 검색, 리포트, 통계 요청
    - 예시: "작년 매출 데이터를 보여주세요", "사용자 정보를 검색하고 싶어요", "특정 권한 보유한 사용자 알려주세요"
 
@@ -43,38 +113,82 @@ class QuestionClassificationAgent:
 불확실한 경우 faq로 분류하고 신뢰도를 낮게 설정하세요.
 
 {format_instructions}"""
-
+        
+        # 시스템 메시지는 한 번만 만들어 두고 요청마다 재사용 (입력은 항상 마지막 메시지 끝에 붙음)
+        human_prefix = "다음 질문을 분류해주세요: "
+        self.text_prompt = prompt_compiler.compile("question_classifier", self.system_prompt, human_prefix, ClassificationResult)
+        self.native_prompt = prompt_compiler.compile(
+            "question_classifier", self.system_prompt, human_prefix, ClassificationResult, native=True
+        )
+    
+    def _build_messages(self, question: str, native: bool = False) -> List["BaseMessage"]:
+        prompt = self.native_prompt if native else self.text_prompt
+        return prompt.messages(question)
+    
+    def _error_result(self, error: Exception) -> ClassificationResult:
+        return ClassificationResult(
+            question_type="faq",
+            confidence=0.1,
+            reasoning=f"분류 중 오류 발생: {str(error)}, 기본값으로 faq 반환"
+        )
+    
+    def _flight_key(self, question: str):
+        return self.single_flight.key(question, getattr(self.llm, "model_name", ""))
+    
+    def _llm_classify(self, question: str) -> ClassificationResult:
+        # 같은 입력으로 동시에 들어온 요청은 LLM 호출 하나를 공유
+        return self.single_flight.do(self._flight_key(question), lambda: self._request_classification(question))
+    
+    async def _allm_classify(self, question: str) -> ClassificationResult:
+        return await self.single_flight.ado(self._flight_key(question), lambda: self._arequest_classification(question))
+    
+    def _request_classification(self, question: str) -> ClassificationResult:
+        structured = self.structured_output.runnable_for(self.llm)
+        response = llm_scheduler.invoke(
+            structured or self.llm,
+            self._build_messages(question, native=structured is not None),
+            priority=PRIORITY_GUARD,
+            agent="question_classifier"
+        )
+        record_llm_usage("question_classifier", response)
+        return self.structured_output.parse(response)
+    
+    async def _arequest_classification(self, question: str) -> ClassificationResult:
+        structured = self.structured_output.runnable_for(self.llm)
+        response = await llm_scheduler.ainvoke(
+            structured or self.llm,
+            self._build_messages(question, native=structured is not None),
+            priority=PRIORITY_GUARD,
+            agent="question_classifier"
+        )
+        record_llm_usage("question_classifier", response)
+        return self.structured_output.parse(response)
+    
     @traceable(name="classify_question")
     def classify_question(self, question: str) -> ClassificationResult:
         try:
-            messages = [
-                SystemMessage(content=self.system_prompt.format(
-                    format_instructions=self.parser.get_format_instructions()
-                )),
-                HumanMessage(content=f"다음 질문을 분류해주세요: {question}")
-            ]
-            
-            response = self.llm.invoke(messages)
-            result = self.parser.parse(response.content)
-            return result
-            
+            return self._llm_classify(question)
         except Exception as e:
-            return ClassificationResult(
-                question_type="faq",
-                confidence=0.1,
-                reasoning=f"분류 중 오류 발생: {str(e)}, 기본값으로 faq 반환"
-            )
+            return self._error_result(e)
     
-    @traceable(name="classify_with_fallback")
-    def classify_with_fallback(self, question: str) -> Dict[str, Any]:
-        result = self.classify_question(question)
-        
+    @traceable(name="aclassify_question")
+    async def aclassify_question(self, question: str) -> ClassificationResult:
+        try:
+            return await self._allm_classify(question)
+        except Exception as e:
+            return self._error_result(e)
+    
+    def apply_fallback(self, question: str, result: ClassificationResult) -> Dict[str, Any]:
+        """LLM 분류 결과를 최종 결과로 변환 (신뢰도가 낮으면 키워드 폴백)"""
         if result.confidence < 0.3:
+            FALLBACKS.inc(agent="question_classifier", reason="low_confidence")
+            CLASSIFIER_DECISIONS.inc(tier="keyword_fallback")
             fallback_result = self._fallback_classification(question)
             return {
                 "question_type": fallback_result,
                 "confidence": 0.5,
                 "reasoning": f"LLM 분류 신뢰도 낮음({result.confidence:.2f}), 키워드 기반 폴백 사용",
+                "decided_by": "keyword_fallback",
                 "original_classification": {
                     "type": result.question_type,
                     "confidence": result.confidence,
@@ -82,24 +196,121 @@ class QuestionClassificationAgent:
                 }
             }
         
+        CLASSIFIER_DECISIONS.inc(tier="llm")
         return {
             "question_type": result.question_type,
             "confidence": result.confidence,
-            "reasoning": result.reasoning
+            "reasoning": result.reasoning,
+            "decided_by": "llm"
         }
     
-    def _fallback_classification(self, question: str) -> QuestionType:
-        faq_keywords = ["도움말", "help", "사용법", "how to", "what is", "무엇", "어떻게", "에러", "오류"]
-        sap_keywords = ["sap", "자동화", "gui", "락해제", "process", "업무"]
-        data_keywords = ["데이터", "data", "정보", "조회", "검색", "리포트", "report", "통계"]
+    def score_keywords(self, question: str) -> Dict[str, Any]:
+        """카테고리별 가중 키워드 점수와 1, 2위 점수 차이(margin) 계산"""
+        return self._rank_scores(cpu_offloader.run(cascade_scores, question))
+    
+    async def ascore_keywords(self, question: str) -> Dict[str, Any]:
+        return self._rank_scores(await cpu_offloader.arun(cascade_scores, question))
+    
+    @staticmethod
+    def _rank_scores(scores: Dict[str, float]) -> Dict[str, Any]:
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return {
+            "scores": scores,
+            "top": ranked[0][0],
+            "margin": ranked[0][1] - ranked[1][1]
+        }
+    
+    def _cascade_decision(self, keyword_scores: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # 키워드 점수가 충분히 높고 2위와의 차이가 분명할 때만 LLM 없이 결정
+        top_score = keyword_scores["scores"][keyword_scores["top"]]
+        if top_score < settings.classifier_cascade_min_score or keyword_scores["margin"] < settings.classifier_cascade_min_margin:
+            return None
+        
+        CLASSIFIER_DECISIONS.inc(tier="keyword")
+        total = sum(keyword_scores["scores"].values())
+        return {
+            "question_type": keyword_scores["top"],
+            "confidence": round(min(0.95, top_score / total), 2),
+            "reasoning": f"키워드 점수로 분류 (점수 {top_score:.1f}, 차이 {keyword_scores['margin']:.1f})",
+            "decided_by": "keyword"
+        }
+    
+    def _cached_classification(self, question: str):
+        # (캐시 키, 캐시된 결과) 반환. 캐시를 쓰지 않으면 (None, None)
+        if self.verdict_cache is None:
+            return None, None
+        key = self.verdict_cache.key(question)
+        cached = self.verdict_cache.get(key)
+        if cached is None:
+            return key, None
+        
+        # 이번 요청은 LLM을 호출하지 않았으므로 캐시로 결정된 것으로 표시 (원래 결정 방식은 따로 남김)
+        CLASSIFIER_DECISIONS.inc(tier="cache")
+        return key, {**cached, "decided_by": "cache", "cached_decided_by": cached.get("decided_by")}
+    
+    @traceable(name="classify_with_fallback")
+    def classify_with_fallback(self, question: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        if settings.classifier_mode == "cascade":
+            decision = self._cascade_decision(self.score_keywords(question))
+            if decision is not None:
+                return decision
         
-        question_lower = question.lower()
+        cache_key, cached = self._cached_classification(question)
+        if cached is not None:
+            return cached
+        
+        try:
+            result = call_with_deadline(lambda: self._llm_classify(question), deadline, "question_classifier")
+        except DeadlineExceeded:
+            return self.degraded_classification(question)
+        except Exception as e:
+            # 오류로 인한 기본값은 캐시하지 않음
+            return self.apply_fallback(question, self._error_result(e))
+        
+        classification = self.apply_fallback(question, result)
+        if cache_key is not None:
+            self.verdict_cache.set(cache_key, classification)
+        return classification
+    
+    @traceable(name="aclassify_with_fallback")
+    async def aclassify_with_fallback(self, question: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        if settings.classifier_mode == "cascade":
+            decision = self._cascade_decision(await self.ascore_keywords(question))
+            if decision is not None:
+                return decision
+        
+        cache_key, cached = self._cached_classification(question)
+        if cached is not None:
+            return cached
+        
+        try:
+            result = await acall_with_deadline(lambda: self._allm_classify(question), deadline, "question_classifier")
+        except DeadlineExceeded:
+            return self.degraded_classification(question)
+        except Exception as e:
+            return self.apply_fallback(question, self._error_result(e))
+        
+        classification = self.apply_fallback(question, result)
+        if cache_key is not None:
+            self.verdict_cache.set(cache_key, classification)
+        return classification
+    
+    def degraded_classification(self, question: str) -> Dict[str, Any]:
+        """시간 예산 초과 시 키워드 분류 (degraded 표시, 캐시하지 않음)"""
+        FALLBACKS.inc(agent="question_classifier", reason="deadline")
+        CLASSIFIER_DECISIONS.inc(tier="deadline_fallback")
+        return {
+            "question_type": self._fallback_classification(question),
+            "confidence": 0.5,
+            "reasoning": "요청 시간 예산 초과로 키워드 기반 분류 사용",
+            "decided_by": "deadline_fallback",
+            "degraded": True
+        }
+    
+    def _fallback_classification(self, question: str) -> QuestionType:
+        matched_types = self.keyword_matcher.matched_labels(question)
         
-        if any(keyword in question_lower for keyword in sap_keywords):
-            return "sap_automation"
-        elif any(keyword in question_lower for keyword in data_keywords):
-            return "data_request"
-        elif any(keyword in question_lower for keyword in faq_keywords):
-            return "faq"
-        else:
-            return "faq"
\ No newline at end of file
+        for question_type in FALLBACK_PRIORITY:
+            if question_type in matched_types:
+                return question_type
+        return "faq"
\ No newline at end of file
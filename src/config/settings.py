@@ -18,6 +18,100 @@ class Settings(BaseSettings):
     max_tokens: int = 1000
     temperature: float = 0.7
     
+    # 가드(인젝션 탐지/질문 분류/안전성 평가) 병렬 실행 설정
+    # 켜면 FAQ/차단 입력에도 분류·안전성 LLM 호출이 매번 나가므로 (메시지당 LLM 호출 최대 2회 추가) 지연 시간이 더 중요할 때만 사용
+    parallel_guards: bool = False
+    guard_max_workers: int = 8
+    # separate: 가드별 LLM 호출, combined: CombinedGuardAgent 단일 호출
+    guard_mode: str = "separate"
+    
+    # 질문 분류 방식 (llm_first: 항상 LLM 호출, cascade: 키워드 점수가 분명하면 LLM 생략)
+    classifier_mode: str = "llm_first"
+    classifier_cascade_min_score: float = 2.5
+    classifier_cascade_min_margin: float = 2.0
+    
+    # 가드 프롬프트 구조화 출력 (지원 모델이면 텍스트 포맷 지시문 대신 function calling 사용)
+    guard_structured_output: bool = True
+    guard_structured_output_method: str = "function_calling"
+    
+    # 모델 응답의 주민번호/카드번호/계좌/전화번호/API 키 가림 처리
+    output_redaction_enabled: bool = True
+    
+    # CPU 작업(패턴/키워드 스캔, 로컬 분류기, 토큰 계산, 출력 가림) 프로세스 풀 오프로딩
+    cpu_offload_enabled: bool = False
+    # None이면 CPU 코어 수만큼
+    cpu_offload_workers: Optional[int] = None
+    # 이보다 짧은 입력은 IPC 비용을 피해 호출한 스레드에서 바로 실행
+    cpu_offload_min_chars: int = 8192
+    cpu_offload_start_method: str = "spawn"
+    
+    # 로컬 인젝션 분류기 (LLM 검사 앞단 필터, 점수가 [low, high) 구간일 때만 LLM 호출)
+    local_classifier_path: Optional[str] = None
+    local_classifier_low: float = 0.2
+    local_classifier_high: float = 0.9
+    
+    # 요청당 시간 예산(초). 가드와 응답 생성이 함께 씀. 초과한 가드는 LLM 대신 패턴/키워드 경로로 판정하고,
+    # 응답 생성이 초과되면 시간 초과 안내로 응답 (None이면 제한 없음)
+    request_deadline_seconds: Optional[float] = None
+    # 가드 단계가 쓸 수 있는 예산 비율. 나머지는 응답 생성 몫으로 남겨 가드가 느려도 응답할 시간을 확보
+    request_deadline_guard_share: float = 0.5
+    # 시간 예산 초과로 LLM 판정을 받지 못한 요청의 처리. False면 응답을 생성하지 않고 거부,
+    # True면 패턴/키워드 검사만 통과해도 응답 (가용성을 우선하는 배포에서만 켤 것)
+    request_deadline_fail_open: bool = False
+    
+    # 추측 생성: 가드 검사와 동시에 응답 생성을 시작하고, 가드가 승인한 경우에만 사용 (차단/거부되면 버림)
+    speculative_generation: bool = False
+    # 인젝션 패턴에 걸린 입력은 차단될 가능성이 높으므로 추측 생성하지 않음
+    speculation_skip_on_pattern: bool = True
+    speculation_max_workers: int = 8
+    
+    # 같은 입력으로 동시에 들어온 가드 LLM 호출을 하나로 합침
+    single_flight_enabled: bool = True
+    
+    # 가드 판정 영구 캐시 (경로가 없으면 비활성, SQLite WAL + 메모리 LRU)
+    verdict_cache_path: Optional[str] = None
+    verdict_cache_ttl_seconds: float = 86400.0
+    verdict_cache_memory_entries: int = 2048
+    
+    # 세션별 대화 기록 메모리 상한
+    session_max_sessions: int = 1000
+    session_ttl_seconds: float = 3600.0
+    session_max_messages: int = 100
+    
+    # 대화 기록 영구 저장소 (경로가 없으면 메모리 전용, SQLite append-only 로그 + 최근 윈도우만 메모리에)
+    history_store_path: Optional[str] = None
+    history_window_messages: int = 50
+    # 그룹 커밋: 첫 쓰기 후 이 시간 동안 모인 메시지를 한 트랜잭션으로 기록
+    history_commit_interval: float = 0.02
+    history_commit_max_batch: int = 256
+    # 커밋이 실패한 배치는 지수 백오프로 재시도하고, 그래도 실패하면 유실로 집계 (flush()가 False 반환)
+    history_commit_max_retries: int = 3
+    history_commit_retry_delay: float = 0.05
+    
+    # 대화 기록 토큰 예산 (sliding_window | keep_first_recent)
+    history_strategy: str = "sliding_window"
+    history_keep_first: int = 2
+    history_token_budget: Optional[int] = None
+    history_context_window: Optional[int] = None
+    history_safety_margin: int = 64
+    
+    # 공유 LLM HTTP 커넥션 풀 (모든 에이전트가 하나의 keep-alive 풀 사용)
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    llm_keepalive_expiry: float = 30.0
+    llm_connect_timeout: float = 5.0
+    llm_request_timeout: float = 60.0
+    # 사내 프록시(VDI) 환경에서만 False로 설정
+    llm_verify_ssl: bool = True
+    
+    # LLM 호출 스케줄러 (한도가 None이면 제한 없음, 가드 호출이 응답 생성보다 우선)
+    llm_requests_per_minute: Optional[int] = None
+    llm_tokens_per_minute: Optional[int] = None
+    llm_max_concurrency: int = 16
+    llm_max_retries: int = 4
+    llm_retry_base_delay: float = 0.5
+    llm_retry_max_delay: float = 20.0
+    
     # LangSmith 설정
     langsmith_tracing: Optional[str] = None
     langsmith_endpoint: Optional[str] = None
@@ -0,0 +1,114 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Sequence
+from ..config.settings import settings
+from ..utils.cpu_offload import cpu_offloader, register_warmup
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
+
+# OpenAI chat 포맷에서 메시지마다 붙는 역할/구분자 토큰 수
+MESSAGE_TOKEN_OVERHEAD = 4
+
+@lru_cache(maxsize=None)
+def _get_encoding(model_name: str):
+    # tiktoken은 첫 토큰 계산 시점에 임포트 (모듈 임포트 시간에 포함되지 않도록)
+    import tiktoken
+    
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        pass
+    except Exception:
+        # 인코딩 파일을 내려받을 수 없는 폐쇄망 환경 등
+        return None
+    
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def count_text_tokens(text: str, model_name: str) -> int:
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        # 인코딩을 쓸 수 없으면 UTF-8 3바이트당 1토큰으로 넉넉하게 추정 (예산 초과 방지)
+        return (len(text.encode("utf-8")) + 2) // 3
+    return len(encoding.encode(text, disallowed_special=()))
+
+def warm_tokenizer_worker():
+    _get_encoding(settings.model_name)
+
+register_warmup(warm_tokenizer_worker)
+
+def message_text(message: "BaseMessage") -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+class TokenCounter:
+    """tiktoken 기반 토큰 수 계산"""
+    
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name or settings.model_name
+        self.encoding = _get_encoding(self.model_name)
+    
+    def count_text(self, text: str) -> int:
+        # 긴 붙여넣기 입력은 오프로딩 워커에서 토큰화
+        return cpu_offloader.run(count_text_tokens, text, self.model_name)
+    
+    async def acount_text(self, text: str) -> int:
+        # 이벤트 루프를 막지 않도록 오프로딩 워커의 결과를 비동기로 대기
+        return await cpu_offloader.arun(count_text_tokens, text, self.model_name)
+    
+    def count_message(self, message: "BaseMessage") -> int:
+        return self.count_text(message_text(message)) + MESSAGE_TOKEN_OVERHEAD
+    
+    async def acount_message(self, message: "BaseMessage") -> int:
+        return await self.acount_text(message_text(message)) + MESSAGE_TOKEN_OVERHEAD
+
+class TokenCountingChatHistory:
+    """메시지를 추가할 때 토큰 수를 함께 계산해 캐시하는 대화 기록 (BaseChatMessageHistory와 같은 메서드 제공)"""
+    
+    def __init__(self, token_counter: Optional[TokenCounter] = None):
+        self.token_counter = token_counter or TokenCounter()
+        self._messages: List["BaseMessage"] = []
+        self._token_counts: List[int] = []
+    
+    @property
+    def messages(self) -> List["BaseMessage"]:
+        return list(self._messages)
+    
+    @property
+    def token_counts(self) -> List[int]:
+        return list(self._token_counts)
+    
+    @property
+    def total_tokens(self) -> int:
+        return sum(self._token_counts)
+    
+    def add_message(self, message: "BaseMessage") -> None:
+        self.add_counted_message(message, self.token_counter.count_message(message))
+    
+    def add_counted_message(self, message: "BaseMessage", tokens: int) -> None:
+        """토큰 수를 미리 계산한 메시지 추가 (비동기 경로에서 acount_message로 계산한 값)"""
+        self._messages.append(message)
+        self._token_counts.append(tokens)
+    
+    def add_messages(self, messages: Sequence["BaseMessage"]) -> None:
+        for message in messages:
+            self.add_message(message)
+    
+    def add_user_message(self, message: str) -> None:
+        from langchain.schema import HumanMessage
+        
+        self.add_message(HumanMessage(content=message))
+    
+    def add_ai_message(self, message: str) -> None:
+        from langchain.schema import AIMessage
+        
+        self.add_message(AIMessage(content=message))
+    
+    def drop_oldest(self, count: int) -> None:
+        del self._messages[:count]
+        del self._token_counts[:count]
+    
+    def clear(self) -> None:
+        self._messages = []
+        self._token_counts = []
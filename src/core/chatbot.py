@@ -1,9 +1,15 @@
-from typing import Dict, Any, List
-from langchain_openai import ChatOpenAI
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Any, Iterator, List, Optional, Tuple
 # from langchain_mistralai import ChatMistralAI
-from langchain.schema import HumanMessage, AIMessage, SystemMessage
-from langchain_community.chat_message_histories import ChatMessageHistory
 from ..config.settings import settings
+from ..utils.llm_clients import LazyChatModel, get_chat_model
+from ..utils.llm_scheduler import PRIORITY_GENERATION, llm_scheduler
+from ..utils.metrics import LLM_CALLS, record_llm_usage
+from .chat_history import MESSAGE_TOKEN_OVERHEAD, TokenCounter, TokenCountingChatHistory
+from .history_policy import HistoryPolicy, compute_history_budget, get_history_policy
+from .session_manager import DEFAULT_SESSION_ID, SessionManager
+
+if TYPE_CHECKING:
+    from langchain.schema import AIMessage, BaseMessage, HumanMessage
 
 # #vdi
 # import ssl
@@ -17,46 +23,200 @@ from ..config.settings import settings
 # skipsslclient = httpx.Client(verify=False)
 
 class Chatbot:
-    def __init__(self, system_prompt: str = "You are a helpful AI assistant."):
-        self.llm = ChatOpenAI(
-            openai_api_key=settings.openai_api_key,
-            model_name=settings.model_name,
-            temperature=settings.temperature,
-            max_tokens=settings.max_tokens
-        )
+    llm = LazyChatModel(lambda: get_chat_model(settings.model_name, settings.temperature, settings.max_tokens))
+    
+    def __init__(
+        self,
+        system_prompt: str = "You are a helpful AI assistant.",
+        session_manager: Optional[SessionManager] = None,
+        history_policy: Optional[HistoryPolicy] = None
+    ):
         # self.llm = ChatMistralAI(
         #     model="mistral-large-latest",
         #     temperature=0,
         #     max_retries=2,
-        #     client=skipsslclient
         #     # other params...
         # )
-        self.memory = ChatMessageHistory()
+        self.sessions = session_manager or SessionManager()
         self.system_prompt = system_prompt
+        
+        # 시스템 프롬프트는 고정이므로 토큰 수를 한 번만 계산
+        self.token_counter = TokenCounter(settings.model_name)
+        self.history_policy = history_policy or get_history_policy()
+        self._system_tokens = self.token_counter.count_text(system_prompt) + MESSAGE_TOKEN_OVERHEAD
+    
+    @property
+    def memory(self) -> TokenCountingChatHistory:
+        return self.sessions.get_history(DEFAULT_SESSION_ID)
+    
+    def _build_messages(self, message: str, history: TokenCountingChatHistory) -> List["BaseMessage"]:
+        from langchain.schema import HumanMessage
+        
+        human_message = HumanMessage(content=message)
+        return self._assemble_messages(human_message, self.token_counter.count_message(human_message), history)
+    
+    async def _abuild_messages(self, message: str, history: TokenCountingChatHistory) -> List["BaseMessage"]:
+        from langchain.schema import HumanMessage
+        
+        human_message = HumanMessage(content=message)
+        return self._assemble_messages(human_message, await self.token_counter.acount_message(human_message), history)
     
-    def chat(self, message: str) -> str:
+    def _assemble_messages(
+        self,
+        human_message: "HumanMessage",
+        human_tokens: int,
+        history: TokenCountingChatHistory
+    ) -> List["BaseMessage"]:
+        from langchain.schema import SystemMessage
+        
+        budget = compute_history_budget(self.token_counter.model_name, self._system_tokens, human_tokens)
+        
         messages = [SystemMessage(content=self.system_prompt)]
         
-        chat_history = self.memory.messages
+        chat_history = self.history_policy.select(history.messages, history.token_counts, budget)
         messages.extend(chat_history)
         
-        messages.append(HumanMessage(content=message))
+        messages.append(human_message)
+        return messages
+    
+    def commit_turn(self, message: str, response: str, session_id: str = DEFAULT_SESSION_ID):
+        """한 턴(사용자 메시지 + 응답)을 대화 기록에 반영. 출력 가림이 필요하면 가린 응답을 넘겨야 함"""
+        history = self.sessions.get_history(session_id)
+        history.add_messages(self._turn_messages(message, response))
+        self.sessions.enforce_message_cap(session_id)
+    
+    async def acommit_turn(self, message: str, response: str, session_id: str = DEFAULT_SESSION_ID):
+        """commit_turn의 비동기 버전 (토큰 계산을 기다리는 동안 이벤트 루프를 막지 않음)"""
+        history = await self.sessions.aget_history(session_id)
+        turn = self._turn_messages(message, response)
+        # 두 메시지를 모두 계산한 뒤 한 번에 추가해 다른 턴이 사이에 끼지 않게 함
+        tokens = [await history.token_counter.acount_message(chat_message) for chat_message in turn]
+        for chat_message, count in zip(turn, tokens):
+            history.add_counted_message(chat_message, count)
+        self.sessions.enforce_message_cap(session_id)
+    
+    @staticmethod
+    def _turn_messages(message: str, response: str) -> List["BaseMessage"]:
+        from langchain.schema import AIMessage, HumanMessage
         
-        response = self.llm(messages)
+        return [HumanMessage(content=message), AIMessage(content=response)]
+    
+    def history_marker(self, session_id: str = DEFAULT_SESSION_ID) -> Tuple[int, Optional[int]]:
+        """대화 기록이 바뀌었는지 비교하기 위한 표식 (메시지 수, 마지막 메시지 id)"""
+        messages = self.sessions.get_history(session_id).messages
+        return len(messages), (id(messages[-1]) if messages else None)
+    
+    def draft(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> "AIMessage":
+        """대화 기록에 반영하지 않고 응답만 생성 (반영은 commit_turn으로)"""
+        history = self.sessions.get_history(session_id)
+        response = llm_scheduler.invoke(
+            self.llm, self._build_messages(message, history), priority=PRIORITY_GENERATION, agent="chatbot"
+        )
+        record_llm_usage("chatbot", response)
+        return response
+    
+    async def adraft(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> "AIMessage":
+        history = await self.sessions.aget_history(session_id)
+        response = await llm_scheduler.ainvoke(
+            self.llm, await self._abuild_messages(message, history), priority=PRIORITY_GENERATION, agent="chatbot"
+        )
+        record_llm_usage("chatbot", response)
+        return response
+    
+    def chat(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+        response = self.draft(message, session_id)
+        self.commit_turn(message, response.content, session_id)
+        return response.content
+    
+    async def achat(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> str:
+        response = await self.adraft(message, session_id)
+        await self.acommit_turn(message, response.content, session_id)
+        return response.content
+    
+    def stream_draft(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> Iterator[str]:
+        """대화 기록에 반영하지 않고 응답 청크만 스트리밍 (반영은 commit_turn으로)"""
+        history = self.sessions.get_history(session_id)
+        stream = llm_scheduler.stream(
+            self.llm, self._build_messages(message, history), priority=PRIORITY_GENERATION, agent="chatbot"
+        )
+        LLM_CALLS.inc(agent="chatbot")
         
-        self.memory.add_user_message(message)
-        self.memory.add_ai_message(response.content)
+        try:
+            for chunk in stream:
+                if chunk.content:
+                    yield chunk.content
+        finally:
+            # 소비자가 중간에 닫으면 업스트림 스트림(HTTP 요청)도 함께 종료
+            stream.close()
+    
+    async def astream_draft(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> AsyncIterator[str]:
+        history = await self.sessions.aget_history(session_id)
+        stream = llm_scheduler.astream(
+            self.llm, await self._abuild_messages(message, history), priority=PRIORITY_GENERATION, agent="chatbot"
+        )
+        LLM_CALLS.inc(agent="chatbot")
         
-        return response.content
+        try:
+            async for chunk in stream:
+                if chunk.content:
+                    yield chunk.content
+        finally:
+            await stream.aclose()
+    
+    def stream_chat(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> Iterator[str]:
+        chunks = []
+        token_stream = self.stream_draft(message, session_id)
+        try:
+            for chunk in token_stream:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            token_stream.close()
+        
+        # 응답을 끝까지 받은 경우에만 대화 기록에 반영
+        self.commit_turn(message, "".join(chunks), session_id)
+    
+    async def astream_chat(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> AsyncIterator[str]:
+        chunks = []
+        token_stream = self.astream_draft(message, session_id)
+        try:
+            async for chunk in token_stream:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            await token_stream.aclose()
+        
+        await self.acommit_turn(message, "".join(chunks), session_id)
+    
+    def clear_history(self, session_id: str = DEFAULT_SESSION_ID):
+        self.sessions.clear(session_id)
     
-    def clear_history(self):
-        self.memory.clear()
+    async def aclear_history(self, session_id: str = DEFAULT_SESSION_ID):
+        await self.sessions.aclear(session_id)
     
-    def get_conversation_history(self) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _to_dicts(messages: List["BaseMessage"]) -> List[Dict[str, Any]]:
         history = []
-        for message in self.memory.messages:
-            if isinstance(message, HumanMessage):
+        for message in messages:
+            if message.type == "human":
                 history.append({"role": "user", "content": message.content})
-            elif isinstance(message, AIMessage):
+            elif message.type == "ai":
                 history.append({"role": "assistant", "content": message.content})
-        return history
\ No newline at end of file
+        return history
+    
+    def get_conversation_history(self, session_id: str = DEFAULT_SESSION_ID) -> List[Dict[str, Any]]:
+        # 메모리에 올라와 있는 최근 윈도우만 반환 (이전 대화는 get_conversation_page로 조회)
+        memory = self.sessions.peek_history(session_id)
+        if memory is None:
+            return []
+        return self._to_dicts(memory.messages)
+    
+    def get_conversation_page(
+        self,
+        session_id: str = DEFAULT_SESSION_ID,
+        before: Optional[int] = None,
+        limit: int = 50
+    ) -> Dict[str, Any]:
+        """before 커서 이전의 메시지 limit개와 다음 페이지 커서(next_cursor, 없으면 None)"""
+        messages, cursor = self.sessions.page_history(session_id, before, limit)
+        return {"messages": self._to_dicts(messages), "next_cursor": cursor}
\ No newline at end of file
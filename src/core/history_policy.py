@@ -0,0 +1,106 @@
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Type
+from ..config.settings import settings
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
+
+# 모델별 컨텍스트 윈도우 크기 (입력 + 출력 토큰)
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+def get_context_window(model_name: str) -> int:
+    if settings.history_context_window:
+        return settings.history_context_window
+    if model_name in MODEL_CONTEXT_WINDOWS:
+        return MODEL_CONTEXT_WINDOWS[model_name]
+    
+    # 날짜 접미사가 붙은 모델명(gpt-4o-2024-08-06 등)은 가장 긴 접두사로 매칭
+    for name in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if model_name.startswith(name):
+            return MODEL_CONTEXT_WINDOWS[name]
+    return DEFAULT_CONTEXT_WINDOW
+
+def compute_history_budget(model_name: str, system_tokens: int, message_tokens: int) -> int:
+    """시스템 프롬프트, 새 메시지, 응답 토큰(max_tokens)을 제외하고 대화 기록에 쓸 수 있는 토큰 수"""
+    available = (
+        get_context_window(model_name)
+        - settings.max_tokens
+        - system_tokens
+        - message_tokens
+        - settings.history_safety_margin
+    )
+    if settings.history_token_budget is not None:
+        available = min(available, settings.history_token_budget)
+    return max(available, 0)
+
+def _take_recent(token_counts: Sequence[int], start: int, budget: int) -> int:
+    # 뒤에서부터 예산 안에 들어가는 만큼 포함하고, 포함된 구간의 시작 인덱스를 반환
+    used = 0
+    index = len(token_counts)
+    while index > start and used + token_counts[index - 1] <= budget:
+        used += token_counts[index - 1]
+        index -= 1
+    return index
+
+class HistoryPolicy:
+    """대화 기록에서 프롬프트에 넣을 메시지를 고르는 전략"""
+    
+    name = "base"
+    
+    def select(self, messages: Sequence["BaseMessage"], token_counts: Sequence[int], budget: int) -> List["BaseMessage"]:
+        raise NotImplementedError
+
+class SlidingWindowPolicy(HistoryPolicy):
+    """예산 안에서 가장 최근 메시지만 유지"""
+    
+    name = "sliding_window"
+    
+    def select(self, messages: Sequence["BaseMessage"], token_counts: Sequence[int], budget: int) -> List["BaseMessage"]:
+        start = _take_recent(token_counts, 0, budget)
+        
+        # 윈도우가 어시스턴트 응답으로 시작하면 짝이 없는 응답이므로 제외
+        if start < len(messages) and messages[start].type == "ai":
+            start += 1
+        return list(messages[start:])
+
+class KeepFirstRecentPolicy(HistoryPolicy):
+    """처음 N개 메시지(대화 맥락)를 고정하고 남은 예산으로 최근 메시지를 유지"""
+    
+    name = "keep_first_recent"
+    
+    def __init__(self, keep_first: Optional[int] = None):
+        self.keep_first = keep_first if keep_first is not None else settings.history_keep_first
+    
+    def select(self, messages: Sequence["BaseMessage"], token_counts: Sequence[int], budget: int) -> List["BaseMessage"]:
+        head_count = 0
+        head_tokens = 0
+        while (
+            head_count < min(self.keep_first, len(messages))
+            and head_tokens + token_counts[head_count] <= budget
+        ):
+            head_tokens += token_counts[head_count]
+            head_count += 1
+        
+        start = _take_recent(token_counts, head_count, budget - head_tokens)
+        if start > head_count and start < len(messages) and messages[start].type == "ai":
+            start += 1
+        return list(messages[:head_count]) + list(messages[start:])
+
+HISTORY_POLICIES: Dict[str, Type[HistoryPolicy]] = {
+    SlidingWindowPolicy.name: SlidingWindowPolicy,
+    KeepFirstRecentPolicy.name: KeepFirstRecentPolicy,
+}
+
+def get_history_policy(name: Optional[str] = None) -> HistoryPolicy:
+    name = name or settings.history_strategy
+    if name not in HISTORY_POLICIES:
+        raise ValueError(f"Unknown history strategy: {name} (available: {', '.join(HISTORY_POLICIES)})")
+    return HISTORY_POLICIES[name]()
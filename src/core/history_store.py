@@ -0,0 +1,370 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+from ..config.settings import settings
+from ..utils.metrics import metrics
+from .chat_history import TokenCounter, TokenCountingChatHistory, message_text
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
+
+COMMIT_BATCH_SIZE = metrics.histogram(
+    "chatbot_history_commit_batch_size", "Messages written per history group commit",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+HISTORY_LOST_MESSAGES = metrics.counter(
+    "chatbot_history_lost_messages_total", "History messages dropped after every commit retry failed"
+)
+
+# 메시지는 추가만 하고, clear는 세션별 하한(floor) seq를 올려 그 이전 메시지를 숨김
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS session_floors (
+    session_id TEXT PRIMARY KEY,
+    floor INTEGER NOT NULL
+);
+"""
+
+# (seq, role, content, tokens)
+StoredMessage = Tuple[int, str, str, int]
+
+# 잠금 경합 등 다시 시도하면 성공할 수 있는 오류. 그 밖의 오류(인코딩할 수 없는 문자열 등)는 재시도하지 않음
+RETRYABLE_ERRORS = (sqlite3.OperationalError,)
+
+@dataclass
+class PendingMessage:
+    """append된 메시지 한 건. seq는 커밋 트랜잭션 안에서 할당된 뒤 채워지고, 재시도까지 실패하면 lost"""
+    seq: Optional[int] = None
+    lost: bool = False
+
+def to_message(role: str, content: str) -> "BaseMessage":
+    from langchain.schema import AIMessage, HumanMessage, SystemMessage
+    
+    message_types = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage}
+    return message_types.get(role, HumanMessage)(content=content)
+
+class HistoryStore:
+    """세션별 대화 기록 append-only 로그 (SQLite WAL, 쓰기는 백그라운드 스레드에서 묶어서 커밋)"""
+    
+    def __init__(
+        self,
+        path: str,
+        commit_interval: float = 0.02,
+        max_batch: int = 256,
+        max_retries: int = 3,
+        retry_delay: float = 0.05
+    ):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        
+        self._local = threading.local()
+        self._pending: List[Tuple[str, str, str, int, float, PendingMessage]] = []
+        self._condition = threading.Condition()
+        self._enqueued = 0
+        # 커밋됐거나 유실로 확정된 메시지 수 (flush는 이 값이 append 수를 따라잡을 때까지 대기)
+        self._settled = 0
+        self._lost = 0
+        self._lost_reported = 0
+        self._closed = False
+        self._stats = {"appended": 0, "commits": 0, "retries": 0, "failed_commits": 0, "lost_messages": 0}
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+    
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+        return connection
+    
+    def append(self, session_id: str, role: str, content: str, tokens: int) -> PendingMessage:
+        """쓰기 큐에 넣고 바로 반환. 실제 커밋은 commit_interval 동안 모인 메시지와 함께 한 트랜잭션으로"""
+        entry = PendingMessage()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("HistoryStore is closed")
+            self._pending.append((session_id, role, content, tokens, time.time(), entry))
+            self._enqueued += 1
+            self._stats["appended"] += 1
+            self._condition.notify_all()
+        return entry
+    
+    def _max_seq(self, session_id: str) -> int:
+        row = self._connection().execute(
+            "SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return max(row[0] or 0, self._floor(session_id))
+    
+    def _insert_batch(self, batch: List[Tuple[str, str, str, int, float, PendingMessage]]) -> List[int]:
+        # 쓰기 잠금(BEGIN IMMEDIATE)을 잡은 뒤 DB의 마지막 seq 다음 번호를 할당하므로
+        # 같은 파일을 쓰는 다른 프로세스/저장소와 seq가 겹치지 않음
+        connection = self._connection()
+        next_seqs: Dict[str, int] = {}
+        seqs = []
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for session_id, role, content, tokens, created_at, _ in batch:
+                seq = next_seqs.get(session_id)
+                if seq is None:
+                    seq = self._max_seq(session_id) + 1
+                next_seqs[session_id] = seq + 1
+                connection.execute(
+                    "INSERT INTO messages (session_id, seq, role, content, tokens, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, seq, role, content, tokens, created_at)
+                )
+                seqs.append(seq)
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        return seqs
+    
+    def _commit_with_retry(self, batch: List[Tuple[str, str, str, int, float, PendingMessage]]) -> List[Optional[int]]:
+        """배치의 메시지별로 할당된 seq (커밋하지 못한 메시지는 None). 쓰기 스레드가 죽지 않도록 예외를 밖으로 내보내지 않음"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._insert_batch(batch)
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    break
+                with self._condition:
+                    self._stats["retries"] += 1
+                time.sleep(self.retry_delay * 2 ** attempt)
+            except Exception:
+                # 재시도해도 실패할 메시지가 섞여 있으면 한 건씩 다시 커밋해 해당 메시지만 유실로 처리
+                if len(batch) == 1:
+                    break
+                return [seq for message in batch for seq in self._commit_with_retry([message])]
+        return [None] * len(batch)
+    
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+                
+                # 첫 메시지가 들어온 뒤 commit_interval 동안(또는 배치가 찰 때까지) 더 모음
+                deadline = time.monotonic() + self.commit_interval
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                
+                batch, self._pending = self._pending, []
+            
+            seqs = self._commit_with_retry(batch)
+            lost = seqs.count(None)
+            
+            COMMIT_BATCH_SIZE.observe(len(batch))
+            if lost:
+                HISTORY_LOST_MESSAGES.inc(lost)
+            with self._condition:
+                for (*_, entry), seq in zip(batch, seqs):
+                    entry.seq = seq
+                    entry.lost = seq is None
+                if lost:
+                    self._lost += lost
+                    self._stats["failed_commits"] += 1
+                    self._stats["lost_messages"] += lost
+                if lost < len(batch):
+                    self._stats["commits"] += 1
+                self._settled += len(batch)
+                self._condition.notify_all()
+    
+    def _wait_settled(self, timeout: Optional[float] = None) -> bool:
+        # 호출자의 condition 락 안에서 실행. 지금까지 append된 메시지가 커밋되거나 유실로 확정될 때까지 대기
+        deadline = None if timeout is None else time.monotonic() + timeout
+        target = self._enqueued
+        self._condition.notify_all()
+        while self._settled < target:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._condition.wait(remaining)
+        return True
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """지금까지 append된 메시지가 모두 커밋될 때까지 대기. 시간 초과이거나 지난 flush 이후 유실된 메시지가 있으면 False"""
+        with self._condition:
+            if not self._wait_settled(timeout):
+                return False
+            lost, self._lost_reported = self._lost - self._lost_reported, self._lost
+        return lost == 0
+    
+    def sync(self):
+        """조회 전에 대기 중인 쓰기를 반영 (유실 보고는 flush() 호출자에게 남겨 둠)"""
+        with self._condition:
+            self._wait_settled()
+    
+    def _floor(self, session_id: str) -> int:
+        row = self._connection().execute(
+            "SELECT floor FROM session_floors WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row is not None else 0
+    
+    def last_seq(self, session_id: str) -> int:
+        self.sync()
+        return self._max_seq(session_id)
+    
+    def load_window(self, session_id: str, limit: int) -> List[StoredMessage]:
+        """하한 이후의 가장 최근 limit개 메시지 (오래된 순)"""
+        return self.page(session_id, before=None, limit=limit)
+    
+    def page(self, session_id: str, before: Optional[int] = None, limit: int = 50) -> List[StoredMessage]:
+        """seq가 before보다 작은 메시지 중 최근 limit개 (오래된 순). before가 None이면 맨 끝부터"""
+        self.sync()
+        rows = self._connection().execute(
+            "SELECT seq, role, content, tokens FROM messages "
+            "WHERE session_id = ? AND seq > ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (session_id, self._floor(session_id), before if before is not None else 2 ** 62, limit)
+        ).fetchall()
+        rows.reverse()
+        return rows
+    
+    def truncate(self, session_id: str, floor: int):
+        """floor 이하 seq의 메시지를 조회에서 제외 (로그는 지우지 않음)"""
+        self.sync()
+        self._connection().execute(
+            "INSERT INTO session_floors (session_id, floor) VALUES (?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET floor = MAX(floor, excluded.floor)",
+            (session_id, floor)
+        )
+    
+    def close(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._writer.join()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        stats["path"] = self.path
+        return stats
+
+_history_store: Optional[HistoryStore] = None
+_history_store_lock = threading.Lock()
+
+def get_history_store() -> Optional[HistoryStore]:
+    """settings.history_store_path가 설정된 경우에만 프로세스 공용 저장소를 반환"""
+    global _history_store
+    if not settings.history_store_path:
+        return None
+    with _history_store_lock:
+        if _history_store is None:
+            _history_store = HistoryStore(
+                settings.history_store_path,
+                commit_interval=settings.history_commit_interval,
+                max_batch=settings.history_commit_max_batch,
+                max_retries=settings.history_commit_max_retries,
+                retry_delay=settings.history_commit_retry_delay
+            )
+            # 정상 종료 시 아직 커밋되지 않은 배치를 기록
+            atexit.register(_history_store.close)
+        return _history_store
+
+class PersistentChatHistory(TokenCountingChatHistory):
+    """디스크 로그를 원본으로 두고 프롬프트에 필요한 최근 window_size개 메시지만 메모리에 유지"""
+    
+    def __init__(
+        self,
+        store: HistoryStore,
+        session_id: str,
+        window_size: int = 50,
+        token_counter: Optional[TokenCounter] = None
+    ):
+        super().__init__(token_counter)
+        self.store = store
+        self.session_id = session_id
+        self.window_size = window_size
+        
+        rows = store.load_window(session_id, window_size)
+        # seq는 저장소가 커밋할 때 할당하므로 아직 커밋되지 않은 메시지는 seq가 비어 있음
+        self._entries: List[PendingMessage] = [PendingMessage(seq=row[0]) for row in rows]
+        self._messages = [to_message(role, content) for _, role, content, _ in rows]
+        # 토큰 수는 기록할 때 함께 저장하므로 다시 로드해도 재계산하지 않음
+        self._token_counts = [row[3] for row in rows]
+    
+    def add_counted_message(self, message: "BaseMessage", tokens: int) -> None:
+        entry = self.store.append(self.session_id, message.type, message_text(message), tokens)
+        
+        self._entries.append(entry)
+        self._messages.append(message)
+        self._token_counts.append(tokens)
+        
+        # 윈도우 밖으로 밀려난 메시지는 디스크에만 남김
+        excess = len(self._messages) - self.window_size
+        if excess > 0:
+            self.drop_oldest(excess)
+    
+    def drop_oldest(self, count: int) -> None:
+        del self._entries[:count]
+        super().drop_oldest(count)
+    
+    def clear(self) -> None:
+        self.store.truncate(self.session_id, self.store.last_seq(self.session_id))
+        self._entries = []
+        super().clear()
+    
+    @property
+    def window_start(self) -> Optional[int]:
+        """메모리 윈도우의 첫 seq (이보다 오래된 메시지는 page()로 조회)"""
+        if any(entry.seq is None and not entry.lost for entry in self._entries):
+            self.store.sync()
+        return next((entry.seq for entry in self._entries if entry.seq is not None), None)
+    
+    def page(self, before: Optional[int] = None, limit: int = 50) -> Tuple[List["BaseMessage"], Optional[int]]:
+        return page_store(self.store, self.session_id, before, limit)
+
+def page_store(
+    store: HistoryStore,
+    session_id: str,
+    before: Optional[int] = None,
+    limit: int = 50
+) -> Tuple[List["BaseMessage"], Optional[int]]:
+    """before 이전 메시지 limit개와 다음 페이지 커서 반환 (더 없으면 커서는 None)"""
+    rows = store.page(session_id, before, limit)
+    messages = [to_message(role, content) for _, role, content, _ in rows]
+    cursor = rows[0][0] if len(rows) == limit else None
+    return messages, cursor
+
+def page_messages(
+    messages: Sequence["BaseMessage"],
+    before: Optional[int] = None,
+    limit: int = 50
+) -> Tuple[List["BaseMessage"], Optional[int]]:
+    """메모리 기록용 page(): 커서는 목록 인덱스"""
+    end = len(messages) if before is None else max(min(before, len(messages)), 0)
+    start = max(end - limit, 0)
+    return list(messages[start:end]), (start if start > 0 else None)
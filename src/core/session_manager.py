@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from ..config.settings import settings
+from ..utils.metrics import CACHE_REQUESTS
+from .chat_history import TokenCountingChatHistory
+from .history_store import HistoryStore, PersistentChatHistory, get_history_store, page_messages, page_store
+
+if TYPE_CHECKING:
+    from langchain.schema import BaseMessage
+
+DEFAULT_SESSION_ID = "default"
+
+@dataclass
+class Session:
+    session_id: str
+    history: TokenCountingChatHistory
+    created_at: float
+    last_access: float
+
+class SessionManager:
+    """세션 ID별 대화 기록 관리 (LRU/TTL 축출, 세션 수/메시지 수 상한)"""
+    
+    def __init__(
+        self,
+        max_sessions: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        max_messages_per_session: Optional[int] = None,
+        history_store: Optional[HistoryStore] = None
+    ):
+        self.max_sessions = max_sessions if max_sessions is not None else settings.session_max_sessions
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.session_ttl_seconds
+        self.max_messages_per_session = (
+            max_messages_per_session if max_messages_per_session is not None
+            else settings.session_max_messages
+        )
+        
+        # 저장소가 있으면 세션 축출은 메모리 윈도우만 내려놓는 것이고 기록은 디스크에 남음
+        self.history_store = history_store if history_store is not None else get_history_store()
+        
+        # 접근 순서대로 정렬된 세션 목록 (앞쪽이 가장 오래 사용되지 않은 세션)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "lru_evictions": 0,
+            "ttl_evictions": 0,
+            "trimmed_messages": 0
+        }
+    
+    def _create_history(self, session_id: str) -> TokenCountingChatHistory:
+        if self.history_store is not None:
+            return PersistentChatHistory(self.history_store, session_id, settings.history_window_messages)
+        return TokenCountingChatHistory()
+    
+    def _evict_expired(self, now: float):
+        if not self.ttl_seconds or self.ttl_seconds <= 0:
+            return
+        
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access < self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self._stats["ttl_evictions"] += 1
+    
+    def _evict_lru(self):
+        while self.max_sessions and len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self._stats["lru_evictions"] += 1
+    
+    def _lookup(self, session_id: str) -> Optional[TokenCountingChatHistory]:
+        # 만료 세션을 정리한 뒤 메모리에 있으면 접근 순서를 갱신해 반환, 없으면 미스로 집계하고 None
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+            
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._stats["misses"] += 1
+                CACHE_REQUESTS.inc(cache="session", result="miss")
+                return None
+            
+            self._stats["hits"] += 1
+            CACHE_REQUESTS.inc(cache="session", result="hit")
+            self._sessions.move_to_end(session_id)
+            session.last_access = now
+            return session.history
+    
+    def _add_session(self, session_id: str, history: TokenCountingChatHistory) -> TokenCountingChatHistory:
+        with self._lock:
+            # 윈도우를 읽는 동안 다른 호출이 먼저 세션을 만들었으면 그 기록을 사용
+            session = self._sessions.get(session_id)
+            if session is None:
+                now = time.monotonic()
+                session = Session(session_id=session_id, history=history, created_at=now, last_access=now)
+                self._sessions[session_id] = session
+                self._evict_lru()
+            return session.history
+    
+    def get_history(self, session_id: str = DEFAULT_SESSION_ID) -> TokenCountingChatHistory:
+        history = self._lookup(session_id)
+        if history is not None:
+            return history
+        # 저장소 윈도우 로딩(대기 중인 커밋 포함)은 락 밖에서 수행해 다른 세션 요청을 막지 않음
+        return self._add_session(session_id, self._create_history(session_id))
+    
+    async def aget_history(self, session_id: str = DEFAULT_SESSION_ID) -> TokenCountingChatHistory:
+        """get_history의 비동기 버전 (미스일 때 저장소 윈도우 로딩을 스레드에서 실행해 이벤트 루프를 막지 않음)"""
+        history = self._lookup(session_id)
+        if history is not None:
+            return history
+        if self.history_store is None:
+            return self._add_session(session_id, self._create_history(session_id))
+        return self._add_session(session_id, await asyncio.to_thread(self._create_history, session_id))
+    
+    def peek_history(self, session_id: str = DEFAULT_SESSION_ID) -> Optional[TokenCountingChatHistory]:
+        # 조회 전용: 세션을 새로 만들거나 접근 순서를 바꾸지 않음
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session.history if session is not None else None
+    
+    def page_history(
+        self,
+        session_id: str = DEFAULT_SESSION_ID,
+        before: Optional[int] = None,
+        limit: int = 50
+    ) -> Tuple[List["BaseMessage"], Optional[int]]:
+        """오래된 메시지를 커서 단위로 조회 (메모리에 없는 세션도 저장소에서 읽음)"""
+        if self.history_store is not None:
+            return page_store(self.history_store, session_id, before, limit)
+        history = self.peek_history(session_id)
+        return page_messages(history.messages if history is not None else [], before, limit)
+    
+    def enforce_message_cap(self, session_id: str = DEFAULT_SESSION_ID):
+        if not self.max_messages_per_session:
+            return
+        
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            
+            excess = len(session.history.messages) - self.max_messages_per_session
+            if excess <= 0:
+                return
+            
+            # 사용자/어시스턴트 메시지 쌍 단위로 잘라 대화 순서를 유지
+            excess += excess % 2
+            session.history.drop_oldest(excess)
+            self._stats["trimmed_messages"] += excess
+    
+    def clear(self, session_id: str = DEFAULT_SESSION_ID):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if self.history_store is not None:
+            if session is not None:
+                session.history.clear()
+            else:
+                self.history_store.truncate(session_id, self.history_store.last_seq(session_id))
+    
+    async def aclear(self, session_id: str = DEFAULT_SESSION_ID):
+        """clear의 비동기 버전 (저장소 하한 기록은 커밋을 기다리므로 스레드에서 실행)"""
+        if self.history_store is None:
+            self.clear(session_id)
+        else:
+            await asyncio.to_thread(self.clear, session_id)
+    
+    def clear_all(self):
+        with self._lock:
+            self._sessions.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "max_messages_per_session": self.max_messages_per_session,
+                **self._stats,
+                "history_store": self.history_store.get_stats() if self.history_store is not None else None
+            }
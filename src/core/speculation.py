@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Optional
+from ..config.settings import settings
+from ..utils.metrics import llm_usage, metrics
+from .chatbot import Chatbot
+
+SPECULATIONS = metrics.counter(
+    "chatbot_speculations_total",
+    "Speculative response generations by outcome (used, or why they were skipped/discarded)",
+    ["outcome"]
+)
+SPECULATION_WASTED_TOKENS = metrics.counter(
+    "chatbot_speculation_wasted_tokens_total", "Completion tokens of speculative responses that were discarded"
+)
+SPECULATION_WASTED_SECONDS = metrics.counter(
+    "chatbot_speculation_wasted_seconds_total", "LLM time spent on speculative responses that were discarded"
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.speculation_max_workers, thread_name_prefix="speculation")
+        return _executor
+
+class SpeculativeDraft:
+    """가드 검사와 동시에 미리 생성한 응답. 대화 기록에는 남기지 않고, 가드가 승인한 뒤 take()로 받은 호출자가 반영"""
+    
+    def __init__(self, chatbot: Chatbot, message: str, session_id: str):
+        self.chatbot = chatbot
+        self.message = message
+        self.session_id = session_id
+        # 생성 중에 같은 세션의 다른 턴이 기록되면 이 응답은 낡은 문맥 기준이므로 버림
+        self.marker = chatbot.history_marker(session_id)
+        self.settled = False
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._elapsed: Optional[float] = None
+        self._future: Optional[Future] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def _timed(self, response: Any) -> Any:
+        self._elapsed = time.perf_counter() - self._started
+        return response
+    
+    def _draft(self) -> Any:
+        return self._timed(self.chatbot.draft(self.message, self.session_id))
+    
+    async def _adraft(self) -> Any:
+        return self._timed(await self.chatbot.adraft(self.message, self.session_id))
+    
+    def start(self) -> "SpeculativeDraft":
+        self._future = _get_executor().submit(contextvars.copy_context().run, self._draft)
+        SPECULATIONS.inc(outcome="started")
+        return self
+    
+    def astart(self) -> "SpeculativeDraft":
+        self._task = asyncio.ensure_future(self._adraft())
+        SPECULATIONS.inc(outcome="started")
+        return self
+    
+    def _settle(self) -> bool:
+        with self._lock:
+            if self.settled:
+                return False
+            self.settled = True
+            return True
+    
+    def _stale_reason(self, message: str, session_id: str) -> Optional[str]:
+        if message != self.message or session_id != self.session_id:
+            return "mismatch"
+        if self.chatbot.history_marker(session_id) != self.marker:
+            return "stale"
+        return None
+    
+    def _use(self, response: Any, message: str, session_id: str) -> Optional[str]:
+        reason = self._stale_reason(message, session_id)
+        if reason is not None:
+            SPECULATIONS.inc(outcome=reason)
+            self._record_waste(response)
+            return None
+        SPECULATIONS.inc(outcome="used")
+        return response.content
+    
+    def take(self, message: str, session_id: str) -> Optional[str]:
+        """승인된 입력과 일치하면 미리 만든 응답을 반환, 쓸 수 없으면 None (호출자가 새로 생성). 기록 반영은 호출자가 가림 처리 후 commit_turn으로"""
+        if self._future is None or not self._settle():
+            return None
+        try:
+            response = self._future.result()
+        except Exception:
+            SPECULATIONS.inc(outcome="failed")
+            return None
+        return self._use(response, message, session_id)
+    
+    async def atake(self, message: str, session_id: str) -> Optional[str]:
+        if self._task is None or not self._settle():
+            return None
+        try:
+            response = await self._task
+        except Exception:
+            SPECULATIONS.inc(outcome="failed")
+            return None
+        return self._use(response, message, session_id)
+    
+    def discard(self, reason: str):
+        """가드가 차단/거부했거나 쓰이지 않은 응답을 취소. 기록에는 아무것도 남기지 않음"""
+        if not self._settle():
+            return
+        SPECULATIONS.inc(outcome=reason)
+        if self._task is not None:
+            # 비동기 경로에서는 진행 중인 LLM 요청까지 실제로 취소됨
+            if not self._task.done():
+                self._task.cancel()
+                SPECULATION_WASTED_SECONDS.inc(time.perf_counter() - self._started)
+            else:
+                self._task.add_done_callback(self._record_done)
+        elif self._future is not None and not self._future.cancel():
+            # 이미 실행 중인 동기 호출은 끝까지 돌고 결과만 버려짐
+            self._future.add_done_callback(self._record_done)
+    
+    def _record_done(self, future: Any):
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._record_waste(future.result())
+    
+    def _record_waste(self, response: Any):
+        _, completion_tokens = llm_usage(response)
+        if completion_tokens:
+            SPECULATION_WASTED_TOKENS.inc(completion_tokens)
+        if self._elapsed is not None:
+            SPECULATION_WASTED_SECONDS.inc(self._elapsed)
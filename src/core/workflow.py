@@ -1,12 +1,33 @@
-from typing import Dict, Any
-from langgraph.graph import StateGraph, END
-from langchain.schema import BaseMessage
-from langsmith import traceable
+import asyncio
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Dict, Any, Iterator, List, Optional, Tuple
 from ..agents.security_agent import PromptInjectionDetector
-from ..agents.question_classifier import QuestionClassificationAgent
+from ..agents.question_classifier import QuestionClassificationAgent, decided_by_keywords
 from ..agents.output_safety_agent import OutputSafetyAgent
-from ..utils.langsmith_config import LangSmithTracker, setup_langsmith
+from ..agents.combined_guard_agent import CombinedGuardAgent
+from ..agents.output_redactor import get_output_redactor, record_redactions, scan_output
+from ..agents.prompt_compiler import prompt_compiler
+from ..config.settings import settings
+from ..utils.cpu_offload import cpu_offloader
+from ..utils.deadline import (
+    DeadlineExceeded, acall_with_deadline, aiter_with_deadline, call_with_deadline, deadline_after, iter_with_deadline
+)
+from ..utils.langsmith_config import LangSmithTracker, setup_langsmith, traceable
+from ..utils.llm_clients import llm_clients
+from ..utils.llm_scheduler import llm_scheduler
+from ..utils.metrics import MESSAGES, metrics, timed_node
+from ..utils.single_flight import get_single_flight_stats
+from ..utils.verdict_cache import get_verdict_cache
 from .chatbot import Chatbot
+from .session_manager import DEFAULT_SESSION_ID
+from .speculation import SPECULATIONS, SpeculativeDraft
+
+GUARD_RESULTS_DISCARDED = metrics.counter(
+    "chatbot_guard_results_discarded_total",
+    "Parallel guard LLM calls that ran to completion but whose results were discarded after a block",
+    ["guard"]
+)
 
 class ChatbotState:
     def __init__(self):
@@ -15,31 +36,92 @@ class ChatbotState:
         self.response: str = ""
         self.should_block: bool = False
 
+def _workflow_from_config(config: Dict[str, Any]) -> "SecureChatbotWorkflow":
+    return config["configurable"]["workflow"]
+
+def _graph_node(name: str):
+    # 컴파일된 그래프는 인스턴스 간에 공유되므로 노드는 실행 시점에 config에서 인스턴스를 꺼내 씀
+    from langchain_core.runnables import RunnableLambda
+    
+    sync_attr, async_attr = f"_{name}_node", f"_a{name}_node"
+    
+    def run(state: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+        return getattr(_workflow_from_config(config), sync_attr)(state)
+    
+    async def arun(state: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+        workflow = _workflow_from_config(config)
+        node = getattr(workflow, async_attr, None)
+        if node is None:
+            return getattr(workflow, sync_attr)(state)
+        return await node(state)
+    
+    return RunnableLambda(run, afunc=arun, name=name)
+
 class SecureChatbotWorkflow:
+    # include_generation별 컴파일된 그래프 (프로세스 내 모든 인스턴스가 공유)
+    _compiled_graphs: Dict[bool, Any] = {}
+    _compile_lock = threading.Lock()
+    
     def __init__(self, system_prompt: str = "You are a helpful AI assistant."):
         setup_langsmith()
         
         self.security_agent = PromptInjectionDetector()
         self.question_classifier = QuestionClassificationAgent()
         self.output_safety_agent = OutputSafetyAgent()
+        self.combined_guard_agent = None
+        if settings.guard_mode == "combined":
+            self.combined_guard_agent = CombinedGuardAgent(
+                self.security_agent,
+                self.question_classifier,
+                self.output_safety_agent
+            )
         self.chatbot = Chatbot(system_prompt)
+        # 모델 응답에 섞여 나온 개인정보/비밀키를 사용자에게 보내기 전에 가림
+        self.output_redactor = get_output_redactor() if settings.output_redaction_enabled else None
+        prompt_compiler.report_once()
         self.tracker = LangSmithTracker("secure_chatbot_workflow")
-        self.workflow = self._build_workflow()
+        self._guard_executor = ThreadPoolExecutor(
+            max_workers=settings.guard_max_workers,
+            thread_name_prefix="guard"
+        )
+        # 오프로딩이 켜져 있으면 워커 프로세스를 백그라운드에서 미리 띄워 둠
+        cpu_offloader.start(wait=False)
+        self.workflow = self._get_graph()
+        # 스트리밍 모드용: 응답 생성 직전까지만 실행하는 가드 그래프
+        self.guard_workflow = self._get_graph(include_generation=False)
+        self._graph_config = {"configurable": {"workflow": self}}
     
-    def _build_workflow(self) -> StateGraph:
+    @classmethod
+    def _get_graph(cls, include_generation: bool = True):
+        graph = cls._compiled_graphs.get(include_generation)
+        if graph is None:
+            with cls._compile_lock:
+                graph = cls._compiled_graphs.get(include_generation)
+                if graph is None:
+                    graph = cls._compiled_graphs[include_generation] = cls._build_workflow(include_generation)
+        return graph
+    
+    @classmethod
+    def _build_workflow(cls, include_generation: bool = True):
+        # langgraph 임포트는 첫 그래프 컴파일 시점으로 미룸
+        from langgraph.graph import StateGraph, END
+        
         workflow = StateGraph(dict)
+        response_target = "generate_response" if include_generation else END
         
-        workflow.add_node("security_check", self._security_check_node)
-        workflow.add_node("process_message", self._process_message_node)
-        workflow.add_node("classify_question", self._classify_question_node)
-        workflow.add_node("output_safety_check", self._output_safety_check_node)
-        workflow.add_node("generate_response", self._generate_response_node)
+        # invoke(동기)와 ainvoke(비동기) 모두 같은 그래프를 쓰도록 노드마다 두 구현을 묶음
+        workflow.add_node("security_check", _graph_node("security_check"))
+        workflow.add_node("process_message", _graph_node("process_message"))
+        workflow.add_node("classify_question", _graph_node("classify_question"))
+        workflow.add_node("output_safety_check", _graph_node("output_safety_check"))
+        if include_generation:
+            workflow.add_node("generate_response", _graph_node("generate_response"))
         
         workflow.set_entry_point("security_check")
         
         workflow.add_conditional_edges(
             "security_check",
-            self._should_block_message,
+            cls._should_block_message,
             {
                 "block": END,
                 "continue": "process_message"
@@ -50,66 +132,189 @@ class SecureChatbotWorkflow:
         
         workflow.add_conditional_edges(
             "classify_question",
-            self._route_by_question_type,
+            cls._route_by_question_type,
             {
-                "faq": "generate_response",
-                "sap_automation": "generate_response",
+                "faq": response_target,
+                "sap_automation": response_target,
                 "data_request": "output_safety_check"
             }
         )
         
-        workflow.add_edge("output_safety_check", "generate_response")
-        workflow.add_edge("generate_response", END)
+        workflow.add_edge("output_safety_check", response_target)
+        if include_generation:
+            workflow.add_edge("generate_response", END)
         
         return workflow.compile()
     
-    @traceable(name="security_check_node")
-    def _security_check_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        user_input = state.get("user_input", "")
-        security_result = self.security_agent.detect_injection(user_input)
+    def _apply_security_verdict(self, state: Dict[str, Any], guard_results: Dict[str, Any]) -> Dict[str, Any]:
+        security_result = guard_results["security_check"]
+        if "classification" in guard_results:
+            state["precomputed_classification"] = guard_results["classification"]
+        if "safety_assessment" in guard_results:
+            state["precomputed_safety_assessment"] = guard_results["safety_assessment"]
         
+        # 요청 단위 분석 컨텍스트: 한 번 만든 판정을 이후 노드들이 재사용
         state["security_check"] = security_result
         state["should_block"] = security_result["is_malicious"]
         
         if security_result["is_malicious"]:
             state["response"] = "I cannot process that request as it appears to contain potentially harmful instructions."
+            self._discard_speculation(state, "blocked")
         
         return state
     
-    def _should_block_message(self, state: Dict[str, Any]) -> str:
+    @timed_node("security_check")
+    @traceable(name="security_check_node")
+    def _security_check_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        user_input = state.get("user_input", "")
+        deadline = state.get("deadline")
+        
+        if self.combined_guard_agent is not None:
+            guard_results = self.combined_guard_agent.assess(user_input, deadline)
+        elif settings.parallel_guards:
+            guard_results = self._fan_out_guards(user_input, deadline)
+        else:
+            guard_results = {"security_check": self.security_agent.detect_injection(user_input, deadline)}
+        
+        return self._apply_security_verdict(state, guard_results)
+    
+    @timed_node("security_check")
+    @traceable(name="security_check_node")
+    async def _asecurity_check_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        user_input = state.get("user_input", "")
+        deadline = state.get("deadline")
+        
+        if self.combined_guard_agent is not None:
+            guard_results = await self.combined_guard_agent.aassess(user_input, deadline)
+        elif settings.parallel_guards:
+            guard_results = await self._afan_out_guards(user_input, deadline)
+        else:
+            guard_results = {"security_check": await self.security_agent.adetect_injection(user_input, deadline)}
+        
+        return self._apply_security_verdict(state, guard_results)
+    
+    def _fan_out_guards(self, user_input: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        # 세 가드를 동시에 실행하고, 인젝션 판정이 차단이면 남은 가드 결과는 기다리지 않음
+        sanitized_input = self.security_agent.strip_markup(user_input)
+        executor = self._guard_executor
+        futures = {
+            executor.submit(self.security_agent.detect_injection, user_input, deadline): "security_check",
+            executor.submit(self.question_classifier.classify_with_fallback, sanitized_input, deadline): "classification",
+            executor.submit(self.output_safety_agent.assess_with_fallback, sanitized_input, deadline): "safety_assessment"
+        }
+        
+        results: Dict[str, Any] = {}
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures[future]] = future.result()
+                
+                security_result = results.get("security_check")
+                if security_result is not None and security_result["is_malicious"]:
+                    break
+        finally:
+            # 아직 시작하지 않은 가드만 취소됨. 이미 실행 중인 동기 LLM 호출은 끝까지 돌고 결과만 버려짐
+            for future in pending:
+                if not future.cancel():
+                    GUARD_RESULTS_DISCARDED.inc(guard=futures[future])
+        
+        return results
+    
+    async def _afan_out_guards(self, user_input: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        sanitized_input = self.security_agent.strip_markup(user_input)
+        tasks = {
+            asyncio.ensure_future(self.security_agent.adetect_injection(user_input, deadline)): "security_check",
+            asyncio.ensure_future(
+                self.question_classifier.aclassify_with_fallback(sanitized_input, deadline)
+            ): "classification",
+            asyncio.ensure_future(
+                self.output_safety_agent.aassess_with_fallback(sanitized_input, deadline)
+            ): "safety_assessment"
+        }
+        
+        results: Dict[str, Any] = {}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[tasks[task]] = task.result()
+                
+                security_result = results.get("security_check")
+                if security_result is not None and security_result["is_malicious"]:
+                    break
+        finally:
+            # 비동기 경로에서는 진행 중인 LLM 요청까지 실제로 취소됨
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        return results
+    
+    @staticmethod
+    def _should_block_message(state: Dict[str, Any]) -> str:
         return "block" if state.get("should_block", False) else "continue"
     
+    @timed_node("process_message")
     @traceable(name="process_message_node")
     def _process_message_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         user_input = state.get("user_input", "")
-        sanitized_input = self.security_agent.sanitize_input(user_input)
+        sanitized_input = self.security_agent.sanitize_input(
+            user_input,
+            detection_result=state.get("security_check") or None
+        )
         state["sanitized_input"] = sanitized_input
         return state
     
-    @traceable(name="classify_question_node")
-    def _classify_question_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        sanitized_input = state.get("sanitized_input", "")
-        
-        classification_result = self.question_classifier.classify_with_fallback(sanitized_input)
-        
+    def _apply_classification(self, state: Dict[str, Any], classification_result: Dict[str, Any]) -> Dict[str, Any]:
         state["question_type"] = classification_result["question_type"]
         state["classification_confidence"] = classification_result["confidence"]
         state["classification_reasoning"] = classification_result["reasoning"]
+        state["classification_decided_by"] = classification_result.get("decided_by")
+        state["classification_degraded"] = classification_result.get("degraded", False)
+        state["classification_keyword_only"] = decided_by_keywords(classification_result)
         
         if "original_classification" in classification_result:
             state["original_classification"] = classification_result["original_classification"]
         
         return state
     
-    def _route_by_question_type(self, state: Dict[str, Any]) -> str:
-        return state.get("question_type", "faq")
+    @timed_node("classify_question")
+    @traceable(name="classify_question_node")
+    def _classify_question_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        sanitized_input = state.get("sanitized_input", "")
+        
+        classification_result = state.get("precomputed_classification")
+        if classification_result is None:
+            classification_result = self.question_classifier.classify_with_fallback(sanitized_input, state.get("deadline"))
+        
+        return self._apply_classification(state, classification_result)
     
-    @traceable(name="output_safety_check_node")
-    def _output_safety_check_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    @timed_node("classify_question")
+    @traceable(name="classify_question_node")
+    async def _aclassify_question_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         sanitized_input = state.get("sanitized_input", "")
         
-        safety_result = self.output_safety_agent.assess_with_fallback(sanitized_input)
+        classification_result = state.get("precomputed_classification")
+        if classification_result is None:
+            classification_result = await self.question_classifier.aclassify_with_fallback(
+                sanitized_input, state.get("deadline")
+            )
         
+        return self._apply_classification(state, classification_result)
+    
+    @staticmethod
+    def _route_by_question_type(state: Dict[str, Any]) -> str:
+        # 키워드로만 분류된 경우(캐스케이드 포함) 분류가 틀렸을 수 있고, 키워드를 끼워 넣어
+        # 안전성 평가를 우회할 수 있으므로 LLM이 분류한 faq/sap_automation만 평가를 건너뜀
+        if state.get("classification_degraded") or state.get("classification_keyword_only"):
+            return "data_request"
+        return state.get("question_type", "faq")
+    
+    def _apply_safety_assessment(self, state: Dict[str, Any], safety_result: Dict[str, Any]) -> Dict[str, Any]:
         state["safety_assessment"] = safety_result
         state["output_safety_approved"] = safety_result["safety_level"] == "safe"
         
@@ -119,42 +324,233 @@ class SecureChatbotWorkflow:
             state["safety_warning"] = f"주의 필요: {safety_result['recommended_action']}"
         
         return state
-
-    @traceable(name="generate_response_node")
-    def _generate_response_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    
+    @timed_node("output_safety_check")
+    @traceable(name="output_safety_check_node")
+    def _output_safety_check_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
         sanitized_input = state.get("sanitized_input", "")
-        question_type = state.get("question_type", "faq")
+        
+        safety_result = state.get("precomputed_safety_assessment")
+        if safety_result is None:
+            safety_result = self.output_safety_agent.assess_with_fallback(sanitized_input, state.get("deadline"))
+        
+        return self._apply_safety_assessment(state, safety_result)
+    
+    @timed_node("output_safety_check")
+    @traceable(name="output_safety_check_node")
+    async def _aoutput_safety_check_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        sanitized_input = state.get("sanitized_input", "")
+        
+        safety_result = state.get("precomputed_safety_assessment")
+        if safety_result is None:
+            safety_result = await self.output_safety_agent.aassess_with_fallback(sanitized_input, state.get("deadline"))
+        
+        return self._apply_safety_assessment(state, safety_result)
+    
+    @staticmethod
+    def _unverified_by_llm(state: Dict[str, Any]) -> bool:
+        # 인젝션 검사나 안전성 평가가 시간 예산 초과로 LLM 판정 없이 통과된 경우 (fail-open 설정이면 허용)
+        if settings.request_deadline_fail_open:
+            return False
+        return bool(
+            state.get("security_check", {}).get("degraded")
+            or state.get("safety_assessment", {}).get("degraded")
+        )
+    
+    def _refuse_unapproved_output(self, state: Dict[str, Any]) -> bool:
         output_safety_approved = state.get("output_safety_approved", True)
         
         safety_assessment = state.get("safety_assessment", {})
         
+        if self._unverified_by_llm(state) and safety_assessment.get("safety_level") != "blocked":
+            state["refused_unverified"] = True
+            state["response"] = "죄송합니다. 요청 검사 시간이 초과되어 처리할 수 없습니다. 잠시 후 다시 시도해주세요."
+            return True
+        
         if not output_safety_approved:
             if safety_assessment.get("safety_level") == "blocked":
                 state["response"] = "죄송합니다. 보안상 위험한 요청으로 판단되어 처리할 수 없습니다."
             else:
                 state["response"] = "죄송합니다. 민감한 정보와 관련된 요청은 처리할 수 없습니다."
-            return state
-        
-        response = self.chatbot.chat(sanitized_input)
+            return True
         
+        return False
+    
+    def _redact_response(self, state: Dict[str, Any], response: str) -> str:
+        if self.output_redactor is None:
+            return response
+        response, state["redactions"] = cpu_offloader.run(scan_output, response)
+        record_redactions(state["redactions"])
+        return response
+    
+    async def _aredact_response(self, state: Dict[str, Any], response: str) -> str:
+        if self.output_redactor is None:
+            return response
+        response, state["redactions"] = await cpu_offloader.arun(scan_output, response)
+        record_redactions(state["redactions"])
+        return response
+    
+    def _apply_response(self, state: Dict[str, Any], response: str) -> Dict[str, Any]:
         if state.get("safety_warning"):
             response += f"\n\n⚠️ {state['safety_warning']}"
-            
+        
         state["response"] = response
-            
+        
         return state
     
-    @traceable(name="process_message")
-    def process_message(self, user_input: str) -> Dict[str, Any]:
-        initial_state = {
+    def _speculation_draft(self, user_input: str, session_id: str, pattern_detected: bool) -> Optional[SpeculativeDraft]:
+        if pattern_detected:
+            SPECULATIONS.inc(outcome="skipped_pattern")
+            return None
+        # 인젝션이 아니면 process_message 노드의 sanitize_input 결과와 같은 입력
+        return SpeculativeDraft(self.chatbot, self.security_agent.strip_markup(user_input), session_id)
+    
+    def _start_speculation(self, user_input: str, session_id: str) -> Optional[SpeculativeDraft]:
+        """가드와 동시에 응답 생성을 시작 (설정이 꺼져 있거나 정책상 건너뛰면 None)"""
+        if not settings.speculative_generation:
+            return None
+        pattern_detected = settings.speculation_skip_on_pattern and self.security_agent.check_patterns(user_input)[0]
+        draft = self._speculation_draft(user_input, session_id, pattern_detected)
+        return draft.start() if draft is not None else None
+    
+    async def _astart_speculation(self, user_input: str, session_id: str) -> Optional[SpeculativeDraft]:
+        if not settings.speculative_generation:
+            return None
+        pattern_detected = (
+            settings.speculation_skip_on_pattern and (await self.security_agent.acheck_patterns(user_input))[0]
+        )
+        # 추측 생성은 기록 표식을 동기로 읽으므로 세션 윈도우를 먼저 비동기로 불러 둠
+        await self.chatbot.sessions.aget_history(session_id)
+        draft = self._speculation_draft(user_input, session_id, pattern_detected)
+        return draft.astart() if draft is not None else None
+    
+    @staticmethod
+    def _discard_speculation(state: Dict[str, Any], reason: str):
+        speculation = state.get("speculation")
+        if speculation is not None:
+            speculation.discard(reason)
+    
+    @staticmethod
+    def _settle_speculation(speculation: Optional[SpeculativeDraft], result: Optional[Dict[str, Any]]):
+        # 그래프가 오류로 끝났거나 응답 생성 노드까지 가지 않은 경우 정리 (이미 처리됐으면 무시됨)
+        if speculation is not None:
+            speculation.discard("error" if result is None else "unused")
+    
+    def _draft_reply(self, state: Dict[str, Any], sanitized_input: str, session_id: str) -> Tuple[str, bool]:
+        # (응답, 추측 생성 사용 여부). 마감 시 버려질 수 있으므로 state는 바꾸지 않음
+        speculation = state.get("speculation")
+        response = speculation.take(sanitized_input, session_id) if speculation is not None else None
+        if response is not None:
+            return response, True
+        return self.chatbot.draft(sanitized_input, session_id=session_id).content, False
+    
+    async def _adraft_reply(self, state: Dict[str, Any], sanitized_input: str, session_id: str) -> Tuple[str, bool]:
+        speculation = state.get("speculation")
+        response = await speculation.atake(sanitized_input, session_id) if speculation is not None else None
+        if response is not None:
+            return response, True
+        return (await self.chatbot.adraft(sanitized_input, session_id=session_id)).content, False
+    
+    def _time_out_generation(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        # 남은 예산 안에 응답을 받지 못하면 대화 기록에 남기지 않고 시간 초과 안내로 응답
+        self._discard_speculation(state, "deadline")
+        state["generation_timed_out"] = True
+        state["response"] = "죄송합니다. 응답 생성 시간이 초과되었습니다. 잠시 후 다시 시도해주세요."
+        return state
+    
+    @timed_node("generate_response")
+    @traceable(name="generate_response_node")
+    def _generate_response_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if self._refuse_unapproved_output(state):
+            self._discard_speculation(state, "refused")
+            return state
+        
+        sanitized_input = state.get("sanitized_input", "")
+        session_id = state.get("session_id", DEFAULT_SESSION_ID)
+        try:
+            # 요청 전체 마감 시각까지만 생성을 기다림 (가드가 쓰고 남은 예산)
+            response, state["speculation_used"] = call_with_deadline(
+                lambda: self._draft_reply(state, sanitized_input, session_id),
+                state.get("generation_deadline"),
+                "chatbot"
+            )
+        except DeadlineExceeded:
+            return self._time_out_generation(state)
+        
+        # 가린 응답만 대화 기록(영구 저장소 포함)에 남김
+        response = self._redact_response(state, response)
+        self.chatbot.commit_turn(sanitized_input, response, session_id)
+        return self._apply_response(state, response)
+    
+    @timed_node("generate_response")
+    @traceable(name="generate_response_node")
+    async def _agenerate_response_node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if self._refuse_unapproved_output(state):
+            self._discard_speculation(state, "refused")
+            return state
+        
+        sanitized_input = state.get("sanitized_input", "")
+        session_id = state.get("session_id", DEFAULT_SESSION_ID)
+        try:
+            response, state["speculation_used"] = await acall_with_deadline(
+                lambda: self._adraft_reply(state, sanitized_input, session_id),
+                state.get("generation_deadline"),
+                "chatbot"
+            )
+        except DeadlineExceeded:
+            return self._time_out_generation(state)
+        
+        response = await self._aredact_response(state, response)
+        await self.chatbot.acommit_turn(sanitized_input, response, session_id)
+        return self._apply_response(state, response)
+    
+    def _initial_state(
+        self,
+        user_input: str,
+        session_id: str,
+        deadline_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        if deadline_seconds is None:
+            deadline_seconds = settings.request_deadline_seconds
+        guard_seconds = deadline_seconds * settings.request_deadline_guard_share if deadline_seconds else None
+        return {
             "user_input": user_input,
+            "session_id": session_id,
+            # 가드 단계 마감 시각 (time.monotonic 기준, 예산이 없으면 None)
+            "deadline": deadline_after(guard_seconds),
+            # 응답 생성까지 포함한 요청 전체 마감 시각
+            "generation_deadline": deadline_after(deadline_seconds),
             "security_check": {},
             "response": "",
             "should_block": False
         }
-        
-        result = self.workflow.invoke(initial_state)
-        
+    
+    def _record_outcome(self, result: Dict[str, Any]):
+        if result.get("should_block"):
+            outcome = "blocked_injection"
+        elif result.get("refused_unverified"):
+            outcome = "refused_deadline"
+        elif result.get("generation_timed_out"):
+            outcome = "generation_timeout"
+        elif not result.get("output_safety_approved", True):
+            outcome = "refused_unsafe"
+        else:
+            outcome = "answered"
+        MESSAGES.inc(outcome=outcome)
+    
+    @staticmethod
+    def _degraded_guards(result: Dict[str, Any]) -> List[str]:
+        # 시간 예산 초과로 LLM 판정 없이 패턴/키워드 경로로 결정된 가드
+        degraded = []
+        if result.get("security_check", {}).get("degraded"):
+            degraded.append("security_check")
+        if result.get("classification_degraded"):
+            degraded.append("classification")
+        if result.get("safety_assessment", {}).get("degraded"):
+            degraded.append("safety_assessment")
+        return degraded
+    
+    def _format_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "response": result["response"],
             "security_check": result["security_check"],
@@ -163,13 +559,217 @@ class SecureChatbotWorkflow:
                 "question_type": result.get("question_type"),
                 "confidence": result.get("classification_confidence"),
                 "reasoning": result.get("classification_reasoning"),
+                "decided_by": result.get("classification_decided_by"),
                 "original_classification": result.get("original_classification")
             },
-            "safety_assessment": result.get("safety_assessment", {})
+            "safety_assessment": result.get("safety_assessment", {}),
+            "redactions": result.get("redactions", {}),
+            "degraded": self._degraded_guards(result),
+            "timed_out": result.get("generation_timed_out", False),
+            "speculative": result.get("speculation_used", False)
         }
     
-    def clear_history(self):
-        self.chatbot.clear_history()
+    @traceable(name="process_message")
+    def process_message(
+        self,
+        user_input: str,
+        session_id: str = DEFAULT_SESSION_ID,
+        deadline_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        initial_state = self._initial_state(user_input, session_id, deadline_seconds)
+        speculation = initial_state["speculation"] = self._start_speculation(user_input, session_id)
+        result = None
+        try:
+            result = self.workflow.invoke(initial_state, config=self._graph_config)
+        finally:
+            self._settle_speculation(speculation, result)
+        self._record_outcome(result)
+        return self._format_result(result)
+    
+    @traceable(name="aprocess_message")
+    async def aprocess_message(
+        self,
+        user_input: str,
+        session_id: str = DEFAULT_SESSION_ID,
+        deadline_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        initial_state = self._initial_state(user_input, session_id, deadline_seconds)
+        speculation = initial_state["speculation"] = await self._astart_speculation(user_input, session_id)
+        result = None
+        try:
+            result = await self.workflow.ainvoke(initial_state, config=self._graph_config)
+        finally:
+            self._settle_speculation(speculation, result)
+        self._record_outcome(result)
+        return self._format_result(result)
+    
+    def stream_message(
+        self,
+        user_input: str,
+        session_id: str = DEFAULT_SESSION_ID,
+        deadline_seconds: Optional[float] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """가드 결과 → 응답 토큰 → 최종 결과 순서로 이벤트를 내보내는 스트리밍 처리"""
+        initial_state = self._initial_state(user_input, session_id, deadline_seconds)
+        state = self.guard_workflow.invoke(initial_state, config=self._graph_config)
+        yield {"type": "guard", "result": self._format_result(state)}
+        
+        if state["should_block"]:
+            self._record_outcome(state)
+            yield {"type": "done", "result": self._format_result(state)}
+            return
+        
+        if self._refuse_unapproved_output(state):
+            self._record_outcome(state)
+            yield {"type": "token", "content": state["response"]}
+            yield {"type": "done", "result": self._format_result(state)}
+            return
+        
+        chunks = []
+        # 청크 경계에 걸친 민감정보도 가릴 수 있도록 꼬리 일부는 다음 청크가 올 때까지 보류
+        redactor = self.output_redactor.stream() if self.output_redactor is not None else None
+        sanitized_input = state.get("sanitized_input", "")
+        # 남은 요청 예산이 다 되면 다음 청크를 기다리지 않고 스트림을 끊음
+        draft_stream = self.chatbot.stream_draft(sanitized_input, session_id=session_id)
+        token_stream = iter_with_deadline(draft_stream, state.get("generation_deadline"), "chatbot")
+        try:
+            for token in token_stream:
+                content = redactor.feed(token) if redactor is not None else token
+                if content:
+                    chunks.append(content)
+                    yield {"type": "token", "content": content}
+        except DeadlineExceeded:
+            state["generation_timed_out"] = True
+        finally:
+            token_stream.close()
+        
+        if redactor is not None:
+            content = redactor.flush()
+            state["redactions"] = redactor.counts
+            if content:
+                chunks.append(content)
+                yield {"type": "token", "content": content}
+        
+        if state.get("generation_timed_out"):
+            yield from self._time_out_stream(state, chunks)
+            return
+        
+        # 응답을 끝까지 내보낸 경우에만 가린 응답을 대화 기록에 반영
+        response = "".join(chunks)
+        self.chatbot.commit_turn(sanitized_input, response, session_id)
+        yield from self._finish_stream(state, response)
+    
+    async def astream_message(
+        self,
+        user_input: str,
+        session_id: str = DEFAULT_SESSION_ID,
+        deadline_seconds: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        initial_state = self._initial_state(user_input, session_id, deadline_seconds)
+        state = await self.guard_workflow.ainvoke(initial_state, config=self._graph_config)
+        yield {"type": "guard", "result": self._format_result(state)}
+        
+        if state["should_block"]:
+            self._record_outcome(state)
+            yield {"type": "done", "result": self._format_result(state)}
+            return
+        
+        if self._refuse_unapproved_output(state):
+            self._record_outcome(state)
+            yield {"type": "token", "content": state["response"]}
+            yield {"type": "done", "result": self._format_result(state)}
+            return
+        
+        chunks = []
+        # 청크 경계에 걸친 민감정보도 가릴 수 있도록 꼬리 일부는 다음 청크가 올 때까지 보류
+        redactor = self.output_redactor.stream() if self.output_redactor is not None else None
+        sanitized_input = state.get("sanitized_input", "")
+        draft_stream = self.chatbot.astream_draft(sanitized_input, session_id=session_id)
+        try:
+            async for token in aiter_with_deadline(draft_stream, state.get("generation_deadline"), "chatbot"):
+                content = redactor.feed(token) if redactor is not None else token
+                if content:
+                    chunks.append(content)
+                    yield {"type": "token", "content": content}
+        except DeadlineExceeded:
+            state["generation_timed_out"] = True
+        finally:
+            await draft_stream.aclose()
+        
+        if redactor is not None:
+            content = redactor.flush()
+            state["redactions"] = redactor.counts
+            if content:
+                chunks.append(content)
+                yield {"type": "token", "content": content}
+        
+        if state.get("generation_timed_out"):
+            for event in self._time_out_stream(state, chunks):
+                yield event
+            return
+        
+        response = "".join(chunks)
+        await self.chatbot.acommit_turn(sanitized_input, response, session_id)
+        for event in self._finish_stream(state, response):
+            yield event
+    
+    def _finish_stream(self, state: Dict[str, Any], response: str) -> Iterator[Dict[str, Any]]:
+        # 안전성 경고 문구는 응답 본문이 모두 나간 뒤에 덧붙임
+        state = self._apply_response(state, response)
+        suffix = state["response"][len(response):]
+        if suffix:
+            yield {"type": "token", "content": suffix}
+        self._record_outcome(state)
+        yield {"type": "done", "result": self._format_result(state)}
+    
+    def _time_out_stream(self, state: Dict[str, Any], chunks: List[str]) -> Iterator[Dict[str, Any]]:
+        # 중간에 끊긴 응답은 대화 기록에 반영하지 않고 중단 안내만 덧붙임
+        if chunks:
+            notice = "\n\n⚠️ 응답 생성 시간이 초과되어 응답이 중단되었습니다."
+            state["response"] = "".join(chunks) + notice
+        else:
+            notice = self._time_out_generation(state)["response"]
+        yield {"type": "token", "content": notice}
+        self._record_outcome(state)
+        yield {"type": "done", "result": self._format_result(state)}
+    
+    def clear_history(self, session_id: str = DEFAULT_SESSION_ID):
+        self.chatbot.clear_history(session_id)
+    
+    async def aclear_history(self, session_id: str = DEFAULT_SESSION_ID):
+        await self.chatbot.aclear_history(session_id)
+    
+    def get_conversation_history(self, session_id: str = DEFAULT_SESSION_ID):
+        return self.chatbot.get_conversation_history(session_id)
+    
+    def get_conversation_page(self, session_id: str = DEFAULT_SESSION_ID, before=None, limit: int = 50) -> Dict[str, Any]:
+        return self.chatbot.get_conversation_page(session_id, before, limit)
+    
+    def get_session_stats(self) -> Dict[str, Any]:
+        return self.chatbot.sessions.get_stats()
+    
+    def get_llm_pool_stats(self) -> Dict[str, Any]:
+        return llm_clients.get_stats()
+    
+    def get_scheduler_stats(self) -> Dict[str, Any]:
+        return llm_scheduler.get_stats()
+    
+    def get_verdict_cache_stats(self) -> Dict[str, Any]:
+        cache = get_verdict_cache()
+        return cache.get_stats() if cache is not None else {"enabled": False}
+    
+    def get_single_flight_stats(self) -> Dict[str, Dict[str, Any]]:
+        return get_single_flight_stats()
+    
+    def get_cpu_offload_stats(self) -> Dict[str, Any]:
+        return cpu_offloader.get_stats()
+    
+    def get_prompt_token_report(self) -> Dict[str, Dict[str, int]]:
+        return prompt_compiler.token_report()
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        return metrics.snapshot()
     
-    def get_conversation_history(self):
-        return self.chatbot.get_conversation_history()
\ No newline at end of file
+    def render_metrics(self) -> str:
+        """Prometheus 텍스트 포맷 메트릭"""
+        return metrics.render_prometheus()
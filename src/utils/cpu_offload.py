@@ -0,0 +1,160 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sized
+from ..config.settings import settings
+from .metrics import metrics
+
+CPU_TASKS = metrics.counter(
+    "chatbot_cpu_tasks_total", "CPU-bound guard tasks by execution mode", ["task", "mode"]
+)
+
+# 워커 프로세스가 뜰 때 한 번 호출할 준비 함수 (패턴 컴파일, 토크나이저 로드 등)
+_warmups: List[Callable[[], None]] = []
+
+def register_warmup(warmup: Callable[[], None]) -> Callable[[], None]:
+    """워커 초기화 시 실행할 모듈 수준 함수 등록 (피클링되므로 람다/메서드는 불가)"""
+    if warmup not in _warmups:
+        _warmups.append(warmup)
+    return warmup
+
+def _initialize_worker(warmups: List[Callable[[], None]]):
+    for warmup in warmups:
+        try:
+            warmup()
+        except Exception:
+            # 준비에 실패해도 작업 첫 호출 때 다시 초기화되므로 워커는 계속 사용
+            pass
+
+def _ping() -> int:
+    return os.getpid()
+
+class CPUOffloader:
+    """순수 CPU 작업을 입력 크기에 따라 인라인 또는 미리 준비된 프로세스 풀에서 실행"""
+    
+    def __init__(
+        self,
+        enabled: bool = False,
+        max_workers: Optional[int] = None,
+        inline_max_chars: int = 8192,
+        start_method: str = "spawn"
+    ):
+        self.enabled = enabled
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.inline_max_chars = inline_max_chars
+        self.start_method = start_method
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {"inline": 0, "offloaded": 0, "failed": 0}
+    
+    @classmethod
+    def from_settings(cls) -> "CPUOffloader":
+        return cls(
+            enabled=settings.cpu_offload_enabled,
+            max_workers=settings.cpu_offload_workers,
+            inline_max_chars=settings.cpu_offload_min_chars,
+            start_method=settings.cpu_offload_start_method
+        )
+    
+    def start(self, wait: bool = True) -> Optional[ProcessPoolExecutor]:
+        """풀을 만들고 모든 워커를 미리 띄움 (첫 대형 입력이 프로세스 기동 비용을 떠안지 않도록)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._pool is not None:
+                return self._pool
+            # 스레드가 많은 서비스 프로세스에서 fork는 락 상태를 복제할 수 있어 기본값은 spawn
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_initialize_worker,
+                initargs=(list(_warmups),)
+            )
+            pool = self._pool
+        
+        pings = [pool.submit(_ping) for _ in range(self.max_workers)]
+        if wait:
+            for ping in pings:
+                ping.result()
+        return pool
+    
+    def should_offload(self, payload: Sized) -> bool:
+        return self.enabled and len(payload) >= self.inline_max_chars
+    
+    def _record(self, task: Callable, mode: str):
+        with self._lock:
+            self._stats[mode] += 1
+        CPU_TASKS.inc(task=task.__name__, mode=mode)
+    
+    def _submit(self, task: Callable, payload: Any, args: tuple) -> Optional[Future]:
+        pool = self.start(wait=False)
+        if pool is None:
+            return None
+        try:
+            return pool.submit(task, payload, *args)
+        except RuntimeError as error:
+            # 종료 중이거나 워커가 비정상 종료된 풀
+            self._discard_if_broken(pool, error)
+            return None
+    
+    def _discard_if_broken(self, pool: Optional[ProcessPoolExecutor], error: BaseException):
+        # 워커가 죽은 풀은 다시 쓸 수 없으므로 버리고 다음 호출 때 새로 띄움
+        if pool is None or not isinstance(error, BrokenExecutor):
+            return
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    def run(self, task: Callable, payload: Any, *args) -> Any:
+        """task(payload, *args) 실행. payload가 짧거나 오프로딩이 꺼져 있으면 현재 스레드에서 실행"""
+        if self.should_offload(payload):
+            future = self._submit(task, payload, args)
+            if future is not None:
+                try:
+                    result = future.result()
+                    self._record(task, "offloaded")
+                    return result
+                except Exception as error:
+                    self._record(task, "failed")
+                    self._discard_if_broken(self._pool, error)
+        
+        self._record(task, "inline")
+        return task(payload, *args)
+    
+    async def arun(self, task: Callable, payload: Any, *args) -> Any:
+        if self.should_offload(payload):
+            future = self._submit(task, payload, args)
+            if future is not None:
+                try:
+                    result = await asyncio.wrap_future(future)
+                    self._record(task, "offloaded")
+                    return result
+                except Exception as error:
+                    self._record(task, "failed")
+                    self._discard_if_broken(self._pool, error)
+        
+        self._record(task, "inline")
+        return task(payload, *args)
+    
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["running"] = self._pool is not None
+        stats.update(
+            enabled=self.enabled,
+            workers=self.max_workers,
+            inline_max_chars=self.inline_max_chars,
+            start_method=self.start_method
+        )
+        return stats
+
+cpu_offloader = CPUOffloader.from_settings()
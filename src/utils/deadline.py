@@ -0,0 +1,128 @@
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+from ..config.settings import settings
+from .metrics import metrics
+
+DEADLINE_EXCEEDED = metrics.counter(
+    "chatbot_deadline_exceeded_total", "LLM calls abandoned because the request deadline ran out", ["agent"]
+)
+
+T = TypeVar("T")
+
+class DeadlineExceeded(TimeoutError):
+    """요청 마감 시각까지 LLM 응답을 받지 못함"""
+
+# 동기 경로에서 마감 시각까지만 기다리기 위해 LLM 호출을 대신 실행하는 스레드 (요청당 가드 3개 + 응답 생성 1개)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.guard_max_workers * 4, thread_name_prefix="deadline")
+        return _executor
+
+_END = object()
+
+def deadline_after(budget_seconds: Optional[float]) -> Optional[float]:
+    """time.monotonic() 기준 마감 시각 (예산이 없으면 None)"""
+    if budget_seconds is None or budget_seconds <= 0:
+        return None
+    return time.monotonic() + budget_seconds
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+def call_with_deadline(call: Callable[[], T], deadline: Optional[float], agent: str) -> T:
+    """마감 전에 끝나지 않으면 DeadlineExceeded (호출 자체는 백그라운드에서 끝나고 결과는 버려짐)"""
+    budget = remaining(deadline)
+    if budget is None:
+        return call()
+    if budget <= 0:
+        DEADLINE_EXCEEDED.inc(agent=agent)
+        raise DeadlineExceeded(f"{agent}: no time left in request budget")
+    
+    # LangSmith 트레이스 부모 등 컨텍스트 변수를 실행 스레드로 넘김
+    future = _get_executor().submit(contextvars.copy_context().run, call)
+    try:
+        return future.result(timeout=budget)
+    except FutureTimeoutError:
+        future.cancel()
+        DEADLINE_EXCEEDED.inc(agent=agent)
+        raise DeadlineExceeded(f"{agent}: exceeded request deadline ({budget:.2f}s left)") from None
+
+async def acall_with_deadline(call: Callable[[], Awaitable[T]], deadline: Optional[float], agent: str) -> T:
+    budget = remaining(deadline)
+    if budget is None:
+        return await call()
+    if budget <= 0:
+        DEADLINE_EXCEEDED.inc(agent=agent)
+        raise DeadlineExceeded(f"{agent}: no time left in request budget")
+    
+    try:
+        # 비동기 경로에서는 진행 중인 요청이 실제로 취소됨
+        return await asyncio.wait_for(call(), budget)
+    except asyncio.TimeoutError:
+        DEADLINE_EXCEEDED.inc(agent=agent)
+        raise DeadlineExceeded(f"{agent}: exceeded request deadline ({budget:.2f}s left)") from None
+
+def iter_with_deadline(iterable: Iterator[T], deadline: Optional[float], agent: str) -> Iterator[T]:
+    """마감 시각까지 도착한 항목만 내보내고 이후에는 DeadlineExceeded (원본은 별도 스레드에서 읽고 닫음)"""
+    if deadline is None:
+        yield from iterable
+        return
+    
+    items: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+    
+    def produce():
+        # 원본 제너레이터는 이 스레드에서만 진행/종료해 소비자가 먼저 끝나도 동시 접근이 없음
+        error: Optional[BaseException] = None
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    break
+                items.put((item, None))
+        except BaseException as e:
+            error = e
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+        items.put((_END, error))
+    
+    # 스트림이 길면 스레드를 오래 점유하므로 LLM 호출용 풀이 아닌 전용 스레드에서 읽음
+    threading.Thread(target=contextvars.copy_context().run, args=(produce,), name="deadline-stream", daemon=True).start()
+    try:
+        while True:
+            budget = remaining(deadline)
+            try:
+                item, error = items.get(timeout=budget) if budget > 0 else items.get_nowait()
+            except queue.Empty:
+                DEADLINE_EXCEEDED.inc(agent=agent)
+                raise DeadlineExceeded(f"{agent}: stream exceeded request deadline") from None
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+async def aiter_with_deadline(iterable: AsyncIterator[T], deadline: Optional[float], agent: str) -> AsyncIterator[T]:
+    """iter_with_deadline의 비동기 버전 (마감되면 대기 중인 다음 항목 요청을 취소)"""
+    iterator = iterable.__aiter__()
+    while True:
+        try:
+            item = await acall_with_deadline(iterator.__anext__, deadline, agent)
+        except StopAsyncIteration:
+            return
+        yield item
@@ -1,12 +1,25 @@
+import functools
+import inspect
 import os
+import threading
 import time
 import uuid
-from typing import Dict, Any, Optional
-from langsmith import traceable
+from typing import Any, Callable, Dict, Optional
 from ..config.settings import settings
 
-def setup_langsmith():
-    """LangSmith 환경변수 설정"""
+# 프로세스당 한 번만 설정 (에이전트/트래커마다 반복 호출되므로 결과를 캐시)
+_langsmith_enabled: Optional[bool] = None
+_langsmith_lock = threading.Lock()
+
+def setup_langsmith(force: bool = False) -> bool:
+    """LangSmith 환경변수 설정 (프로세스당 1회, force=True면 다시 적용)"""
+    global _langsmith_enabled
+    with _langsmith_lock:
+        if _langsmith_enabled is None or force:
+            _langsmith_enabled = _configure_langsmith()
+        return _langsmith_enabled
+
+def _configure_langsmith() -> bool:
     # 기존 환경변수 우선, 없으면 settings에서 가져오기
     if settings.langsmith_tracing and not os.getenv("LANGCHAIN_TRACING_V2"):
         os.environ["LANGCHAIN_TRACING_V2"] = settings.langsmith_tracing
@@ -26,6 +39,32 @@ def setup_langsmith():
     
     return os.getenv("LANGCHAIN_TRACING_V2") == "true"
 
+def traceable(func: Optional[Callable] = None, **options):
+    """langsmith.traceable과 같은 데코레이터. langsmith 임포트(수백 ms)를 첫 호출 시점으로 미룸"""
+    if func is None:
+        return lambda target: traceable(target, **options)
+    
+    traced: Optional[Callable] = None
+    
+    def resolve() -> Callable:
+        nonlocal traced
+        if traced is None:
+            from langsmith import traceable as langsmith_traceable
+            traced = langsmith_traceable(**options)(func) if options else langsmith_traceable(func)
+        return traced
+    
+    # 그래프 노드로 등록할 때 코루틴 함수인지 검사하므로 동기/비동기 모양을 그대로 유지
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            return await resolve()(*args, **kwargs)
+        return async_wrapper
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return resolve()(*args, **kwargs)
+    return wrapper
+
 def get_langsmith_metadata(
     component_type: str,
     component_name: str,
@@ -0,0 +1,190 @@
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+import httpx
+from ..config.settings import settings
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+ClientKey = Tuple[str, float, Optional[int]]
+
+class LoopLocalTransport(httpx.AsyncBaseTransport):
+    """실행 중인 이벤트 루프마다 별도 커넥션 풀을 쓰는 비동기 transport (ChatOpenAI에는 AsyncClient 하나만 넘김)"""
+    
+    def __init__(self, factory: Callable[[], httpx.AsyncBaseTransport]):
+        # httpcore 커넥션은 만든 루프에 묶여 있어, 루프를 공유하면 asyncio.run을 다시 호출할 때 닫힌 루프의
+        # keep-alive 커넥션을 재사용하다 "Event loop is closed"가 남
+        self.factory = factory
+        self._transports: Dict[asyncio.AbstractEventLoop, httpx.AsyncBaseTransport] = {}
+        self._lock = threading.Lock()
+    
+    def _transport(self) -> httpx.AsyncBaseTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                # 커넥션이 루프를 참조하므로 약한 참조로는 정리되지 않음. 새 루프가 올 때 닫힌 루프의 풀을 버림
+                for closed_loop in [other for other in self._transports if other.is_closed()]:
+                    del self._transports[closed_loop]
+                transport = self._transports[loop] = self.factory()
+            return transport
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+    
+    def transports(self) -> List[httpx.AsyncBaseTransport]:
+        with self._lock:
+            return list(self._transports.values())
+    
+    async def aclose(self):
+        """현재 루프의 풀만 닫음 (다른 루프의 커넥션은 그 루프에서만 닫을 수 있음)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.pop(loop, None)
+        if transport is not None:
+            await transport.aclose()
+
+class LLMClientRegistry:
+    """(model, temperature, max_tokens)별 ChatOpenAI를 한 번만 만들고 keep-alive 커넥션 풀을 공유"""
+    
+    def __init__(self):
+        self._models: Dict[ClientKey, "ChatOpenAI"] = {}
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "reused": 0}
+    
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry
+        )
+    
+    def _timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(settings.llm_request_timeout, connect=settings.llm_connect_timeout)
+    
+    def _ensure_http_clients(self):
+        # 호출자가 락을 잡은 상태에서만 호출
+        if self._http_client is None:
+            self._http_client = httpx.Client(
+                limits=self._limits(),
+                timeout=self._timeout(),
+                verify=settings.llm_verify_ssl
+            )
+        if self._async_http_client is None:
+            # 커넥션 한도는 이벤트 루프별로 적용됨
+            self._async_http_client = httpx.AsyncClient(
+                transport=LoopLocalTransport(
+                    lambda: httpx.AsyncHTTPTransport(limits=self._limits(), verify=settings.llm_verify_ssl)
+                ),
+                timeout=self._timeout()
+            )
+    
+    def get_chat_model(
+        self,
+        model: Optional[str] = None,
+        temperature: float = 0.1,
+        max_tokens: Optional[int] = None
+    ) -> "ChatOpenAI":
+        key = (model or settings.model_name, temperature, max_tokens)
+        with self._lock:
+            llm = self._models.get(key)
+            if llm is not None:
+                self._stats["reused"] += 1
+                return llm
+            
+            # langchain_openai/openai 임포트가 무거워 첫 LLM 사용 시점으로 미룸
+            from langchain_openai import ChatOpenAI
+            
+            self._ensure_http_clients()
+            llm = ChatOpenAI(
+                openai_api_key=settings.openai_api_key,
+                model_name=key[0],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                # 재시도는 LLMScheduler가 백오프와 함께 담당하므로 SDK 자체 재시도는 끔
+                max_retries=0,
+                http_client=self._http_client,
+                http_async_client=self._async_http_client
+            )
+            self._models[key] = llm
+            self._stats["created"] += 1
+            return llm
+    
+    def _pool_stats(self, client: Optional[httpx.Client]) -> Dict[str, int]:
+        # httpx는 풀 상태를 공개 API로 노출하지 않으므로 httpcore 풀을 조심스럽게 들여다봄
+        transport = getattr(client, "_transport", None)
+        transports = transport.transports() if isinstance(transport, LoopLocalTransport) else [transport]
+        pools = [getattr(transport, "_pool", None) for transport in transports]
+        connections = [connection for pool in pools for connection in list(getattr(pool, "connections", []) or [])]
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "connections": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+            "pending_requests": sum(len(getattr(pool, "_requests", []) or []) for pool in pools)
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "models": [
+                    {"model": model, "temperature": temperature, "max_tokens": max_tokens}
+                    for model, temperature, max_tokens in self._models
+                ],
+                "limits": {
+                    "max_connections": settings.llm_max_connections,
+                    "max_keepalive_connections": settings.llm_max_keepalive_connections,
+                    "keepalive_expiry": settings.llm_keepalive_expiry
+                },
+                "sync_pool": self._pool_stats(self._http_client),
+                "async_pool": self._pool_stats(self._async_http_client)
+            }
+    
+    def close(self):
+        """동기 풀을 닫고 캐시를 비움 (비동기 풀은 aclose로 닫음)"""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            self._models.clear()
+    
+    async def aclose(self):
+        with self._lock:
+            async_client, self._async_http_client = self._async_http_client, None
+        if async_client is not None:
+            await async_client.aclose()
+        self.close()
+
+llm_clients = LLMClientRegistry()
+
+def get_chat_model(
+    model: Optional[str] = None,
+    temperature: float = 0.1,
+    max_tokens: Optional[int] = None
+) -> "ChatOpenAI":
+    return llm_clients.get_chat_model(model, temperature, max_tokens)
+
+class LazyChatModel:
+    """첫 접근 시에만 factory로 LLM을 만드는 llm 속성 디스크립터 (대입으로 교체 가능)"""
+    
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self.attr = "_llm"
+    
+    def __set_name__(self, owner, name: str):
+        self.attr = f"_{name}"
+    
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        llm = instance.__dict__.get(self.attr)
+        if llm is None:
+            llm = instance.__dict__[self.attr] = self.factory()
+        return llm
+    
+    def __set__(self, instance, value):
+        instance.__dict__[self.attr] = value
@@ -0,0 +1,419 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Sequence
+from ..config.settings import settings
+from .metrics import llm_usage, metrics
+
+# 숫자가 작을수록 먼저 실행 (가드 판정이 늦어지면 응답 전체가 막히므로 생성보다 우선)
+PRIORITY_GUARD = 0
+PRIORITY_GENERATION = 10
+
+PRIORITY_NAMES = {PRIORITY_GUARD: "guard", PRIORITY_GENERATION: "generation"}
+
+QUEUE_WAIT = metrics.histogram(
+    "chatbot_llm_queue_wait_seconds", "Time LLM calls spent waiting for the scheduler", ["priority"]
+)
+QUEUE_DEPTH = metrics.gauge(
+    "chatbot_llm_queue_depth", "LLM calls waiting in the scheduler queue", ["priority"]
+)
+LLM_RETRIES = metrics.counter(
+    "chatbot_llm_retries_total", "LLM calls retried after a retryable error", ["agent", "reason"]
+)
+
+# 상태 변화가 알림으로 전달되지 않는 경우를 대비한 최대 대기 간격
+MAX_POLL_SECONDS = 1.0
+WAIT_SAMPLE_SIZE = 1000
+
+class TokenBucket:
+    """분당 한도를 초 단위로 나눠 채우는 토큰 버킷 (한도가 없으면 항상 통과)"""
+    
+    def __init__(self, per_minute: Optional[float], burst: Optional[float] = None):
+        self.rate = per_minute / 60.0 if per_minute else None
+        self.capacity = burst or per_minute or 0.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        if self.rate is None:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.rate is None:
+            return 0.0
+        self._refill(now)
+        # 버킷 용량보다 큰 요청은 가득 찼을 때 통과시켜 영원히 막히지 않게 함
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+    
+    def consume(self, amount: float):
+        if self.rate is not None:
+            self.tokens -= amount
+    
+    def adjust(self, delta: float):
+        # 실제 사용량과 추정치의 차이 보정 (음수 잔량은 이후 요청이 갚음)
+        if self.rate is not None:
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "enqueued", "notify")
+    
+    def __init__(self, priority: int, tokens: int, notify: Callable[[], None]):
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.notify = notify
+
+def _retry_reason(error: BaseException) -> Optional[str]:
+    """재시도할 오류면 사유 문자열, 아니면 None (openai 예외 타입을 임포트하지 않고 판별)"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return "rate_limited"
+    if isinstance(status, int) and status >= 500:
+        return "server_error"
+    if type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout"):
+        return "connection"
+    return None
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _percentile_ms(ordered: Sequence[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index] * 1000
+
+def estimate_tokens(messages: Sequence[Any], completion_tokens: int = 0) -> int:
+    # 요청 전 토큰 수 추정 (대략 4자당 1토큰), 실제 사용량은 응답 후 보정
+    prompt_chars = sum(len(str(getattr(message, "content", message))) for message in messages)
+    return prompt_chars // 4 + completion_tokens
+
+class LLMScheduler:
+    """모든 LLM 호출이 거치는 스케줄러: 우선순위 큐 + 요청/토큰 버킷 + 동시 실행 상한 + 지터 백오프 재시도"""
+    
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrency: int = 16,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        expected_completion_tokens: int = 256
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.expected_completion_tokens = expected_completion_tokens
+        
+        self._lock = threading.Lock()
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        # 429를 받으면 Retry-After 동안 새 호출을 내보내지 않음
+        self._cooldown_until = 0.0
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self._stats = {
+            "admitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "max_queue_depth": 0
+        }
+    
+    @classmethod
+    def from_settings(cls) -> "LLMScheduler":
+        return cls(
+            requests_per_minute=settings.llm_requests_per_minute,
+            tokens_per_minute=settings.llm_tokens_per_minute,
+            max_concurrency=settings.llm_max_concurrency,
+            max_retries=settings.llm_max_retries,
+            base_delay=settings.llm_retry_base_delay,
+            max_delay=settings.llm_retry_max_delay
+        )
+    
+    # 큐 관리 (모두 self._lock 안에서 호출)
+    
+    def _enqueue(self, waiter: _Waiter):
+        heapq.heappush(self._queue, (waiter.priority, next(self._sequence), waiter))
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+        QUEUE_DEPTH.inc(priority=PRIORITY_NAMES.get(waiter.priority, waiter.priority))
+    
+    def _remove(self, waiter: _Waiter):
+        for index, entry in enumerate(self._queue):
+            if entry[2] is waiter:
+                self._queue[index] = self._queue[-1]
+                self._queue.pop()
+                heapq.heapify(self._queue)
+                QUEUE_DEPTH.inc(-1, priority=PRIORITY_NAMES.get(waiter.priority, waiter.priority))
+                break
+    
+    def _notify_head(self):
+        if self._queue:
+            self._queue[0][2].notify()
+    
+    def _try_admit(self, waiter: _Waiter) -> Optional[float]:
+        """0.0이면 입장, 양수면 그만큼 기다린 뒤 재시도, None이면 알림이 올 때까지 대기"""
+        with self._lock:
+            if not self._queue or self._queue[0][2] is not waiter:
+                return None
+            if self._in_flight >= self.max_concurrency:
+                return None
+            
+            now = time.monotonic()
+            delay = max(
+                self._cooldown_until - now,
+                self.request_bucket.wait_time(1, now),
+                self.token_bucket.wait_time(waiter.tokens, now)
+            )
+            if delay > 0:
+                return delay
+            
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(waiter.tokens)
+            heapq.heappop(self._queue)
+            QUEUE_DEPTH.inc(-1, priority=PRIORITY_NAMES.get(waiter.priority, waiter.priority))
+            self._in_flight += 1
+            self._stats["admitted"] += 1
+            
+            waited = now - waiter.enqueued
+            self._waits.append(waited)
+            QUEUE_WAIT.observe(waited, priority=PRIORITY_NAMES.get(waiter.priority, waiter.priority))
+            
+            # 다음 대기자도 빈 슬롯이 남았는지 확인하도록 깨움
+            self._notify_head()
+            return 0.0
+    
+    def _release(self, estimated_tokens: int, response: Any = None):
+        with self._lock:
+            self._in_flight -= 1
+            if response is not None:
+                prompt_tokens, completion_tokens = llm_usage(response)
+                if prompt_tokens or completion_tokens:
+                    self.token_bucket.adjust(prompt_tokens + completion_tokens - estimated_tokens)
+            self._notify_head()
+    
+    def _cancel(self, waiter: _Waiter):
+        with self._lock:
+            self._remove(waiter)
+            self._notify_head()
+    
+    def _acquire(self, priority: int, tokens: int):
+        event = threading.Event()
+        waiter = _Waiter(priority, tokens, event.set)
+        with self._lock:
+            self._enqueue(waiter)
+        try:
+            while True:
+                delay = self._try_admit(waiter)
+                if delay == 0.0:
+                    return
+                event.wait(MAX_POLL_SECONDS if delay is None else min(delay, MAX_POLL_SECONDS))
+                event.clear()
+        except BaseException:
+            self._cancel(waiter)
+            raise
+    
+    async def _aacquire(self, priority: int, tokens: int):
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        
+        def notify():
+            # 다른 스레드(동기 호출자)에서 깨울 수도 있으므로 이벤트 루프에 위임
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
+        
+        waiter = _Waiter(priority, tokens, notify)
+        with self._lock:
+            self._enqueue(waiter)
+        try:
+            while True:
+                delay = self._try_admit(waiter)
+                if delay == 0.0:
+                    return
+                try:
+                    await asyncio.wait_for(
+                        event.wait(),
+                        MAX_POLL_SECONDS if delay is None else min(delay, MAX_POLL_SECONDS)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        except BaseException:
+            self._cancel(waiter)
+            raise
+    
+    # 재시도
+    
+    def _backoff(self, attempt: int, error: BaseException, agent: str) -> Optional[float]:
+        """재시도할 경우 대기 시간, 포기할 경우 None"""
+        reason = _retry_reason(error)
+        if reason is None or attempt >= self.max_retries:
+            return None
+        
+        # full jitter: [0, min(max_delay, base * 2^attempt)] 구간에서 무작위
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        
+        with self._lock:
+            self._stats["retries"] += 1
+            if reason == "rate_limited":
+                self._stats["rate_limited"] += 1
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+        LLM_RETRIES.inc(agent=agent, reason=reason)
+        return delay
+    
+    def _failed(self):
+        with self._lock:
+            self._stats["failed"] += 1
+    
+    def _completed(self):
+        with self._lock:
+            self._stats["completed"] += 1
+    
+    # 공개 API
+    
+    def invoke(self, llm: Any, messages: Sequence[Any], priority: int = PRIORITY_GUARD, agent: str = "unknown") -> Any:
+        tokens = estimate_tokens(messages, self.expected_completion_tokens)
+        attempt = 0
+        while True:
+            self._acquire(priority, tokens)
+            response = None
+            try:
+                response = llm.invoke(messages)
+            except Exception as error:
+                delay = self._backoff(attempt, error, agent)
+                if delay is None:
+                    self._failed()
+                    raise
+            finally:
+                self._release(tokens, response)
+            
+            if response is not None:
+                self._completed()
+                return response
+            attempt += 1
+            time.sleep(delay)
+    
+    async def ainvoke(self, llm: Any, messages: Sequence[Any], priority: int = PRIORITY_GUARD, agent: str = "unknown") -> Any:
+        tokens = estimate_tokens(messages, self.expected_completion_tokens)
+        attempt = 0
+        while True:
+            await self._aacquire(priority, tokens)
+            response = None
+            try:
+                response = await llm.ainvoke(messages)
+            except Exception as error:
+                delay = self._backoff(attempt, error, agent)
+                if delay is None:
+                    self._failed()
+                    raise
+            finally:
+                self._release(tokens, response)
+            
+            if response is not None:
+                self._completed()
+                return response
+            attempt += 1
+            await asyncio.sleep(delay)
+    
+    def stream(self, llm: Any, messages: Sequence[Any], priority: int = PRIORITY_GENERATION, agent: str = "unknown") -> Iterator[Any]:
+        """스트림이 끝날 때까지 슬롯을 점유, 첫 청크를 받기 전의 오류만 재시도"""
+        tokens = estimate_tokens(messages, self.expected_completion_tokens)
+        attempt = 0
+        while True:
+            self._acquire(priority, tokens)
+            started = False
+            stream = None
+            try:
+                stream = llm.stream(messages)
+                for chunk in stream:
+                    started = True
+                    yield chunk
+                self._completed()
+                return
+            except Exception as error:
+                delay = None if started else self._backoff(attempt, error, agent)
+                if delay is None:
+                    self._failed()
+                    raise
+            finally:
+                if stream is not None and hasattr(stream, "close"):
+                    stream.close()
+                self._release(tokens)
+            
+            attempt += 1
+            time.sleep(delay)
+    
+    async def astream(self, llm: Any, messages: Sequence[Any], priority: int = PRIORITY_GENERATION, agent: str = "unknown") -> AsyncIterator[Any]:
+        tokens = estimate_tokens(messages, self.expected_completion_tokens)
+        attempt = 0
+        while True:
+            await self._aacquire(priority, tokens)
+            started = False
+            stream = None
+            try:
+                stream = llm.astream(messages)
+                async for chunk in stream:
+                    started = True
+                    yield chunk
+                self._completed()
+                return
+            except Exception as error:
+                delay = None if started else self._backoff(attempt, error, agent)
+                if delay is None:
+                    self._failed()
+                    raise
+            finally:
+                if stream is not None and hasattr(stream, "aclose"):
+                    await stream.aclose()
+                self._release(tokens)
+            
+            attempt += 1
+            await asyncio.sleep(delay)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            depth_by_priority: Dict[str, int] = {}
+            for priority, _, _ in self._queue:
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                depth_by_priority[name] = depth_by_priority.get(name, 0) + 1
+            return {
+                **self._stats,
+                "queue_depth": len(self._queue),
+                "queue_depth_by_priority": depth_by_priority,
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "cooldown_remaining_s": max(0.0, self._cooldown_until - time.monotonic()),
+                "wait_ms": {
+                    "mean": sum(waits) / len(waits) * 1000 if waits else 0.0,
+                    "p50": _percentile_ms(waits, 50),
+                    "p95": _percentile_ms(waits, 95),
+                    "max": _percentile_ms(waits, 100)
+                }
+            }
+
+llm_scheduler = LLMScheduler.from_settings()
@@ -0,0 +1,82 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, List, Mapping, Sequence, Set, Tuple
+
+@dataclass(frozen=True)
+class Hit:
+    """스캔 결과 한 건 (label: 패턴/키워드 그룹, value: 매칭된 문자열, start/end: 오프셋)"""
+    label: str
+    value: str
+    start: int
+    end: int
+
+class PatternMatcher:
+    """정규식 목록을 한 번만 컴파일해 두고 패턴별로 스캔 (서로 겹치는 매칭도 모두 보고)"""
+    
+    def __init__(self, patterns: Sequence[str], flags: int = re.IGNORECASE):
+        self.patterns = list(patterns)
+        # 단일 alternation은 왼쪽 매칭이 뒤 패턴의 겹치는 매칭을 가리고 CPython re에서는 오히려 느려서 패턴별로 컴파일
+        self._regexes = [(re.compile(pattern, flags), pattern) for pattern in self.patterns]
+        self._priority = {pattern: index for index, pattern in reversed(list(enumerate(self.patterns)))}
+    
+    def scan(self, text: str) -> List[Hit]:
+        # 시작 위치, 패턴 순서로 정렬. 다른 패턴끼리는 겹쳐도 모두 반환
+        hits = [
+            Hit(pattern, match.group(), match.start(), match.end())
+            for regex, pattern in self._regexes
+            for match in regex.finditer(text)
+        ]
+        hits.sort(key=lambda hit: (hit.start, self._priority[hit.label]))
+        return hits
+    
+    def scan_leftmost(self, text: str) -> List[Hit]:
+        """겹치지 않는 매칭만 반환 (같은 위치에서 시작하면 앞 패턴 우선, 치환용)"""
+        selected: List[Hit] = []
+        position = 0
+        for hit in self.scan(text):
+            if hit.start >= position:
+                selected.append(hit)
+                position = hit.end
+        return selected
+    
+    def matched_patterns(self, text: str) -> List[str]:
+        return [pattern for regex, pattern in self._regexes if regex.search(text)]
+
+@lru_cache(maxsize=32)
+def compiled_pattern_matcher(patterns: Tuple[str, ...], flags: int = re.IGNORECASE) -> PatternMatcher:
+    """같은 패턴 목록은 프로세스(오프로딩 워커 포함)마다 한 번만 컴파일"""
+    return PatternMatcher(patterns, flags)
+
+class KeywordMatcher:
+    """키워드 그룹별 부분 문자열 검사. 목록이 짧아 C로 구현된 str 검색이 순수 파이썬 Aho-Corasick보다 빠름"""
+    
+    def __init__(self, keyword_groups: Mapping[str, Iterable[str]], case_insensitive: bool = True):
+        self.case_insensitive = case_insensitive
+        self.keyword_groups = {
+            label: [self._normalize(keyword) for keyword in keywords if keyword]
+            for label, keywords in keyword_groups.items()
+        }
+    
+    def _normalize(self, text: str) -> str:
+        return text.lower() if self.case_insensitive else text
+    
+    def scan(self, text: str) -> List[Hit]:
+        # 겹치는 것을 포함한 모든 키워드 출현 위치
+        text = self._normalize(text)
+        hits = []
+        for label, keywords in self.keyword_groups.items():
+            for keyword in keywords:
+                start = text.find(keyword)
+                while start != -1:
+                    hits.append(Hit(label, keyword, start, start + len(keyword)))
+                    start = text.find(keyword, start + 1)
+        hits.sort(key=lambda hit: (hit.start, hit.end))
+        return hits
+    
+    def matched_labels(self, text: str) -> Set[str]:
+        text = self._normalize(text)
+        return {
+            label for label, keywords in self.keyword_groups.items()
+            if any(keyword in text for keyword in keywords)
+        }
@@ -0,0 +1,246 @@
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 초 단위 지연 히스토그램 버킷 (로컬 처리 수 ms ~ 느린 LLM 응답 수십 초)
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(labelnames: Sequence[str], values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _label_values(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+class Counter(_Metric):
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+    
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+    
+    def snapshot(self) -> Any:
+        with self._lock:
+            items = list(self._values.items())
+        if not self.labelnames:
+            return items[0][1] if items else 0.0
+        return {",".join(key): value for key, value in items}
+
+class Gauge(Counter):
+    kind = "gauge"
+    
+    def set(self, value: float, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 레이블 조합별 [버킷별 개수..., +Inf 개수], 합계, 관측 수
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+    
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        
+        samples = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        
+        result = {}
+        for key, counts, total in items:
+            count = sum(counts)
+            result[",".join(key)] = {
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else 0.0,
+                "buckets": dict(zip([_format_value(b) for b in self.buckets + (float("inf"),)], counts))
+            }
+        return result
+
+class MetricsRegistry:
+    """프로세스 내 메트릭 저장소 (Prometheus 텍스트 포맷 / dict 스냅샷 출력)"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric_class, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+            return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+    
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+metrics = MetricsRegistry()
+
+NODE_LATENCY = metrics.histogram(
+    "chatbot_node_latency_seconds", "Wall time spent in each workflow node", ["node"]
+)
+LLM_CALLS = metrics.counter(
+    "chatbot_llm_calls_total", "LLM calls issued per agent", ["agent"]
+)
+LLM_TOKENS = metrics.counter(
+    "chatbot_llm_tokens_total", "LLM tokens reported by the provider per agent", ["agent", "kind"]
+)
+FALLBACKS = metrics.counter(
+    "chatbot_fallback_total", "Keyword/deterministic fallback paths taken", ["agent", "reason"]
+)
+MESSAGES = metrics.counter(
+    "chatbot_messages_total", "Processed messages by outcome", ["outcome"]
+)
+INJECTION_DETECTIONS = metrics.counter(
+    "chatbot_injection_detections_total", "Injection detections by detector", ["source"]
+)
+CACHE_REQUESTS = metrics.counter(
+    "chatbot_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]
+)
+
+def llm_usage(response: Any) -> Tuple[int, int]:
+    """LLM 응답에서 (프롬프트 토큰, 완료 토큰) 추출 (정보가 없으면 0)"""
+    # with_structured_output(include_raw=True) 결과면 원본 메시지 기준
+    if isinstance(response, dict) and "raw" in response:
+        response = response["raw"]
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+
+def record_llm_usage(agent: str, response: Any):
+    """LLM 응답의 토큰 사용량을 에이전트별로 집계"""
+    LLM_CALLS.inc(agent=agent)
+    
+    prompt_tokens, completion_tokens = llm_usage(response)
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, agent=agent, kind="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, agent=agent, kind="completion")
+
+def timed_node(node: str) -> Callable:
+    """동기/비동기 노드 함수의 실행 시간을 chatbot_node_latency_seconds에 기록"""
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    NODE_LATENCY.observe(time.perf_counter() - started, node=node)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                NODE_LATENCY.observe(time.perf_counter() - started, node=node)
+        return wrapper
+    return decorator
@@ -0,0 +1,121 @@
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+from ..config.settings import settings
+from .metrics import metrics
+from .verdict_cache import normalize_input
+
+SINGLE_FLIGHT = metrics.counter(
+    "chatbot_single_flight_total", "Guard LLM calls by single-flight role (leader issues the call, follower waits)",
+    ["agent", "role"]
+)
+
+T = TypeVar("T")
+
+class _LeaderCancelled(Exception):
+    """리더 호출이 취소됨: 기다리던 요청은 다시 시도해 새 리더가 됨"""
+
+class SingleFlight:
+    """같은 키로 동시에 들어온 호출은 먼저 온 하나(리더)만 실행하고 나머지는 그 결과를 나눠 받음"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0}
+    
+    def key(self, text: str, model: str = "") -> Tuple[str, str]:
+        return model, normalize_input(text)
+    
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats["followers"] += 1
+                role = "follower"
+            else:
+                future = self._calls[key] = Future()
+                self._stats["leaders"] += 1
+                role = "leader"
+        SINGLE_FLIGHT.inc(agent=self.name, role=role)
+        return future, role == "leader"
+    
+    def _finish(self, key: Hashable, future: Future, result: Any = None, error: Optional[BaseException] = None):
+        # 결과를 알리기 전에 키를 먼저 빼서, 이후 요청은 새 호출(또는 캐시)로 가게 함
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        try:
+            if error is None:
+                future.set_result(result)
+            elif isinstance(error, Exception):
+                future.set_exception(error)
+            else:
+                # 취소/인터럽트는 기다리던 요청에 전파하지 않고 재시도하게 함
+                future.set_exception(_LeaderCancelled())
+        except InvalidStateError:
+            pass
+    
+    def do(self, key: Hashable, call: Callable[[], T]) -> T:
+        if not settings.single_flight_enabled:
+            return call()
+        
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    # 결과 객체를 호출자끼리 공유하지 않도록 복사본을 돌려줌
+                    return copy.deepcopy(future.result())
+                except _LeaderCancelled:
+                    continue
+            
+            try:
+                result = call()
+            except BaseException as error:
+                self._finish(key, future, error=error)
+                raise
+            self._finish(key, future, result=result)
+            return result
+    
+    async def ado(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        if not settings.single_flight_enabled:
+            return await call()
+        
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    # 기다리던 쪽이 취소돼도 리더의 Future까지 취소되지 않도록 shield
+                    return copy.deepcopy(await asyncio.shield(asyncio.wrap_future(future)))
+                except _LeaderCancelled:
+                    continue
+            
+            try:
+                result = await call()
+            except BaseException as error:
+                self._finish(key, future, error=error)
+                raise
+            self._finish(key, future, result=result)
+            return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+def get_single_flight(name: str) -> SingleFlight:
+    """에이전트별 프로세스 공용 SingleFlight (워크플로우 인스턴스가 여러 개여도 같이 묶임)"""
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = _flights[name] = SingleFlight(name)
+        return flight
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    with _flights_lock:
+        flights = list(_flights.values())
+    return {flight.name: flight.get_stats() for flight in flights}
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from ..config.settings import settings
+from .metrics import CACHE_REQUESTS
+
+# 만료 항목 정리를 몇 번의 쓰기마다 한 번 할지
+PURGE_EVERY_WRITES = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS verdicts_expires_at ON verdicts (expires_at);
+"""
+
+def normalize_input(text: str) -> str:
+    # 전각/반각, 대소문자, 공백 차이만 있는 입력은 같은 키로 취급
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+def prompt_fingerprint(parts: Iterable[str]) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+def make_key(namespace: str, text: str, model: str, prompt_hash: str) -> str:
+    """정규화된 입력 + 모델명 + 프롬프트 해시 (프롬프트가 바뀌면 이전 항목은 자동으로 무효)"""
+    payload = "\0".join([namespace, model, prompt_hash, normalize_input(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class VerdictCache:
+    """가드 판정 캐시: 프로세스 내 LRU + SQLite(WAL) 영속 저장소, 항목별 TTL"""
+    
+    def __init__(self, path: str, ttl_seconds: float = 86400.0, max_memory_entries: int = 2048):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # sqlite3 연결은 스레드 간에 공유하지 않고 스레드마다 따로 염
+        self._local = threading.local()
+        self._writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "expired": 0}
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+    
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            # 여러 워커 프로세스가 동시에 읽고 쓸 수 있도록 WAL 사용
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+        return connection
+    
+    def _remember(self, key: str, expires_at: float, value: Any):
+        # self._lock 안에서 호출
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+    
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    CACHE_REQUESTS.inc(cache=f"verdict_{namespace}", result="hit")
+                    return entry[1]
+                del self._memory[key]
+                self._stats["expired"] += 1
+        
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM verdicts WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        except sqlite3.Error:
+            row = None
+        
+        with self._lock:
+            if row is None:
+                self._stats["misses"] += 1
+                CACHE_REQUESTS.inc(cache=f"verdict_{namespace}", result="miss")
+                return None
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self._stats["disk_hits"] += 1
+        CACHE_REQUESTS.inc(cache=f"verdict_{namespace}", result="hit")
+        return value
+    
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        now = time.time()
+        expires_at = now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._stats["writes"] += 1
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY_WRITES == 0
+        
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO verdicts (key, namespace, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, json.dumps(value, ensure_ascii=False), now, expires_at)
+            )
+            if purge:
+                self.purge_expired()
+        except sqlite3.Error:
+            # 캐시 저장 실패는 판정 결과에 영향을 주지 않음 (메모리 캐시는 유지)
+            pass
+    
+    def purge_expired(self) -> int:
+        cursor = self._connection().execute("DELETE FROM verdicts WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+    
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        self._connection().execute("DELETE FROM verdicts")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        try:
+            stats["disk_entries"] = self._connection().execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        except sqlite3.Error:
+            stats["disk_entries"] = None
+        stats["path"] = self.path
+        return stats
+
+_verdict_cache: Optional[VerdictCache] = None
+_verdict_cache_lock = threading.Lock()
+
+def get_verdict_cache() -> Optional[VerdictCache]:
+    """settings.verdict_cache_path가 설정된 경우에만 프로세스 공용 캐시를 반환"""
+    global _verdict_cache
+    if not settings.verdict_cache_path:
+        return None
+    with _verdict_cache_lock:
+        if _verdict_cache is None:
+            _verdict_cache = VerdictCache(
+                settings.verdict_cache_path,
+                ttl_seconds=settings.verdict_cache_ttl_seconds,
+                max_memory_entries=settings.verdict_cache_memory_entries
+            )
+        return _verdict_cache
+
+class AgentVerdictCache:
+    """에이전트 하나에 묶인 캐시 뷰 (네임스페이스, 모델명, 프롬프트 해시를 키에 포함)"""
+    
+    def __init__(
+        self,
+        cache: VerdictCache,
+        namespace: str,
+        prompt_parts: Callable[[], Iterable[str]],
+        model_name: Callable[[], str]
+    ):
+        self.cache = cache
+        self.namespace = namespace
+        self._prompt_parts = prompt_parts
+        self._model_name = model_name
+        self._prompt_hash: Optional[str] = None
+    
+    def key(self, text: str) -> str:
+        # 프롬프트는 인스턴스 수명 동안 고정이므로 해시는 첫 사용 때 한 번만 계산
+        if self._prompt_hash is None:
+            self._prompt_hash = prompt_fingerprint(self._prompt_parts())
+        return make_key(self.namespace, text, self._model_name(), self._prompt_hash)
+    
+    def get(self, key: str) -> Optional[Any]:
+        return self.cache.get(self.namespace, key)
+    
+    def set(self, key: str, value: Any):
+        self.cache.set(self.namespace, key, value)
+
+def bind_verdict_cache(
+    namespace: str,
+    prompt_parts: Callable[[], Iterable[str]],
+    model_name: Callable[[], str]
+) -> Optional[AgentVerdictCache]:
+    cache = get_verdict_cache()
+    if cache is None:
+        return None
+    return AgentVerdictCache(cache, namespace, prompt_parts, model_name)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# 에이전트 모듈이 임포트 시점에 설정을 읽으므로 실제 키 없이도 로드되도록 가짜 키 지정 (LLM은 테스트에서 가짜 모델로 교체)
+os.environ.setdefault("OPENAI_API_KEY", "sk-test-fake")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
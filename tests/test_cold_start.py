@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.cold_start import REPO_ROOT, measure_once
+
+# 느린 CI 머신에서도 통과하도록 넉넉하게 잡은 상한 (측정값은 python -m benchmarks.cold_start로 확인)
+MAX_TOTAL_MS = 5000
+MAX_FIRST_MESSAGE_MS = 2000
+# 그래프를 인스턴스마다 다시 컴파일하면 수십 ms가 걸림
+MAX_SECOND_CONSTRUCT_MS = 10
+# 모듈 임포트만으로는 불러오지 않아야 하는 무거운 의존성 (생성/첫 호출 시점에 임포트)
+DEFERRED_MODULES = ("langchain", "langchain_core", "langchain_openai", "langgraph", "langsmith", "tiktoken")
+
+def test_cold_start_stays_within_budget():
+    sample = measure_once(sys.executable)
+    
+    assert sample["total_ms"] < MAX_TOTAL_MS, sample
+    assert sample["first_message_ms"] < MAX_FIRST_MESSAGE_MS, sample
+    assert sample["second_construct_ms"] < MAX_SECOND_CONSTRUCT_MS, sample
+
+def test_import_defers_heavy_dependencies():
+    probe = (
+        "import json, sys\n"
+        "import src.core.workflow\n"
+        f"print(json.dumps(sorted(m for m in {DEFERRED_MODULES!r} if m in sys.modules)))\n"
+    )
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-test-fake")
+    completed = subprocess.run(
+        [sys.executable, "-c", probe],
+        capture_output=True, text=True, check=True, env=env, cwd=REPO_ROOT
+    )
+    
+    assert json.loads(completed.stdout.splitlines()[-1]) == []
@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+
+import pytest
+
+from src.core.history_store import HistoryStore, PersistentChatHistory
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "history.db")
+
+def _stored_seqs(path, session_id):
+    with sqlite3.connect(path) as connection:
+        return [seq for (seq,) in connection.execute(
+            "SELECT seq FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        )]
+
+def test_concurrent_stores_on_same_file_keep_every_message(db_path):
+    # 같은 DB 파일을 쓰는 두 저장소(=두 프로세스)가 같은 세션에 동시에 기록
+    stores = [HistoryStore(db_path, commit_interval=0.001, max_batch=4) for _ in range(2)]
+    per_writer = 200
+    
+    def write(store, name):
+        for index in range(per_writer):
+            store.append("shared", "human", f"{name}-{index}", 1)
+    
+    threads = [threading.Thread(target=write, args=(store, f"w{n}")) for n, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    for store in stores:
+        assert store.flush()
+        store.close()
+    
+    seqs = _stored_seqs(db_path, "shared")
+    assert seqs == list(range(1, 2 * per_writer + 1))
+
+def test_flush_reports_batches_lost_after_retries(db_path, monkeypatch):
+    store = HistoryStore(db_path, commit_interval=0.001, max_retries=2, retry_delay=0)
+    
+    def failing_insert(batch):
+        raise sqlite3.OperationalError("database is locked")
+    
+    monkeypatch.setattr(store, "_insert_batch", failing_insert)
+    entry = store.append("s", "human", "hello", 1)
+    
+    assert store.flush() is False
+    assert entry.lost and entry.seq is None
+    stats = store.get_stats()
+    assert stats["lost_messages"] == 1
+    assert stats["retries"] == 2
+    # 유실은 한 번만 보고
+    assert store.flush() is True
+    store.close()
+    
+    assert _stored_seqs(db_path, "s") == []
+
+def test_transient_commit_failure_is_retried(db_path, monkeypatch):
+    store = HistoryStore(db_path, commit_interval=0.001, retry_delay=0)
+    insert_batch = store._insert_batch
+    failures = []
+    
+    def flaky_insert(batch):
+        if not failures:
+            failures.append(batch)
+            raise sqlite3.OperationalError("database is locked")
+        return insert_batch(batch)
+    
+    monkeypatch.setattr(store, "_insert_batch", flaky_insert)
+    entry = store.append("s", "human", "hello", 1)
+    
+    assert store.flush() is True
+    assert entry.seq == 1 and not entry.lost
+    assert store.get_stats()["retries"] == 1
+    store.close()
+    
+    assert _stored_seqs(db_path, "s") == [1]
+
+def test_persistent_history_resolves_pending_seqs(db_path):
+    store = HistoryStore(db_path, commit_interval=0.001)
+    history = PersistentChatHistory(store, "s", window_size=2)
+    for text in ("one", "two", "three"):
+        history.add_user_message(text)
+    
+    # 아직 커밋 전이어도 window_start는 커밋을 기다려 할당된 seq를 반환
+    assert history.window_start == 2
+    messages, cursor = history.page(before=history.window_start)
+    assert [message.content for message in messages] == ["one"]
+    assert cursor is None
+    
+    history.clear()
+    history.add_user_message("four")
+    assert history.window_start == 4
+    assert [message.content for message in PersistentChatHistory(store, "s").messages] == ["four"]
+    store.close()
+
+def test_unencodable_message_is_lost_without_stopping_the_writer(db_path):
+    # 짝이 없는 서로게이트는 SQLite에 UTF-8로 저장할 수 없음 (재시도해도 같은 결과)
+    store = HistoryStore(db_path, commit_interval=0.05)
+    bad = store.append("s1", "human", "bad \ud800 text", 3)
+    good = store.append("s2", "human", "같은 배치의 정상 메시지", 3)
+    
+    assert store.flush(timeout=5) is False
+    assert bad.lost and bad.seq is None
+    assert good.seq == 1 and not good.lost
+    assert store.get_stats()["retries"] == 0
+    
+    later = store.append("s1", "human", "이후 메시지", 3)
+    assert store.flush(timeout=5) is True
+    assert later.seq == 1
+    assert [row[2] for row in store.load_window("s1", 10)] == ["이후 메시지"]
+    store.close()
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.llm_clients import LLMClientRegistry
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def keepalive_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+def test_async_client_survives_repeated_event_loops(keepalive_url):
+    registry = LLMClientRegistry()
+    with registry._lock:
+        registry._ensure_http_clients()
+    client = registry._async_http_client
+    
+    async def fetch_twice():
+        # 같은 루프 안에서는 keep-alive 커넥션을 재사용
+        first = await client.get(keepalive_url)
+        second = await client.get(keepalive_url)
+        return first.text + second.text
+    
+    # 루프마다 풀이 따로라 닫힌 루프의 커넥션을 재사용하지 않음
+    assert asyncio.run(fetch_twice()) == "okok"
+    assert asyncio.run(fetch_twice()) == "okok"
+    
+    # 닫힌 루프의 풀은 다음 루프가 풀을 만들 때 버려짐
+    assert len(client._transport.transports()) == 1
+    registry.close()
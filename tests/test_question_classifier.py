@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_llm import FakeChatModel
+from src.agents.question_classifier import CLASSIFIER_DECISIONS, QuestionClassificationAgent
+from src.config.settings import settings
+from src.utils.verdict_cache import AgentVerdictCache, VerdictCache
+
+@pytest.fixture
+def classifier(tmp_path):
+    classifier = QuestionClassificationAgent()
+    classifier.llm = FakeChatModel()
+    classifier.verdict_cache = AgentVerdictCache(
+        VerdictCache(str(tmp_path / "verdicts.db")), "question_classifier", lambda: ["prompt"], lambda: "fake"
+    )
+    return classifier
+
+@pytest.fixture
+def cascade(monkeypatch):
+    monkeypatch.setattr(settings, "classifier_mode", "cascade")
+
+def _classify(classifier, question, is_async):
+    if is_async:
+        return asyncio.run(classifier.aclassify_with_fallback(question))
+    return classifier.classify_with_fallback(question)
+
+def test_verdict_cache_hit_is_reported_as_cache(classifier):
+    cache_hits = CLASSIFIER_DECISIONS.value(tier="cache")
+    llm_decisions = CLASSIFIER_DECISIONS.value(tier="llm")
+    
+    first = classifier.classify_with_fallback("작년 매출 리포트 보여주세요")
+    second = classifier.classify_with_fallback("작년 매출 리포트 보여주세요")
+    third = asyncio.run(classifier.aclassify_with_fallback("작년 매출 리포트 보여주세요"))
+    
+    assert first["decided_by"] == "llm"
+    assert second["decided_by"] == third["decided_by"] == "cache"
+    assert second["cached_decided_by"] == "llm"
+    assert second["question_type"] == first["question_type"] == "data_request"
+    assert classifier.llm.stats.total_calls() == 1
+    assert CLASSIFIER_DECISIONS.value(tier="llm") - llm_decisions == 1
+    assert CLASSIFIER_DECISIONS.value(tier="cache") - cache_hits == 2
+
+@pytest.mark.parametrize("is_async", [False, True], ids=["sync", "async"])
+@pytest.mark.parametrize("question, expected", [
+    ("SAP 락해제 해주세요", "sap_automation"),
+    ("리포트 보여주세요", "data_request"),
+])
+def test_cascade_decides_clear_questions_without_llm(classifier, cascade, is_async, question, expected):
+    keyword_decisions = CLASSIFIER_DECISIONS.value(tier="keyword")
+    
+    result = _classify(classifier, question, is_async)
+    
+    assert result["question_type"] == expected
+    assert result["decided_by"] == "keyword"
+    assert classifier.llm.stats.total_calls() == 0
+    assert CLASSIFIER_DECISIONS.value(tier="keyword") - keyword_decisions == 1
+
+@pytest.mark.parametrize("is_async", [False, True], ids=["sync", "async"])
+@pytest.mark.parametrize("question", ["안녕하세요", "SAP 데이터 조회"])
+def test_cascade_escalates_ambiguous_questions_to_llm(classifier, cascade, is_async, question):
+    result = _classify(classifier, question, is_async)
+    
+    assert result["decided_by"] == "llm"
+    assert classifier.llm.stats.calls == {"classifier": 1}
+
+def test_cascade_thresholds_are_configurable(classifier, cascade, monkeypatch):
+    # "SAP 락해제"의 점수는 5.0이므로 최소 점수를 더 높이면 LLM으로 넘어감
+    monkeypatch.setattr(settings, "classifier_cascade_min_score", 6.0)
+    assert classifier.classify_with_fallback("SAP 락해제 해주세요")["decided_by"] == "llm"
+    
+    # "SAP 데이터 조회"는 차이가 1.5라 기본값(2.0)에서는 LLM, 최소 차이를 낮추면 키워드로 결정
+    monkeypatch.setattr(settings, "classifier_cascade_min_score", 2.5)
+    monkeypatch.setattr(settings, "classifier_cascade_min_margin", 1.0)
+    result = classifier.classify_with_fallback("SAP 데이터 조회")
+    assert result["decided_by"] == "keyword"
+    assert result["question_type"] == "data_request"
+    assert classifier.llm.stats.total_calls() == 1
+
+def test_cascade_result_has_same_shape_as_llm_result(classifier, cascade, monkeypatch):
+    keyword_result = classifier.classify_with_fallback("SAP 락해제 해주세요")
+    monkeypatch.setattr(settings, "classifier_mode", "llm_first")
+    llm_result = classifier.classify_with_fallback("SAP 락해제 해주세요")
+    
+    assert set(keyword_result) == set(llm_result) == {"question_type", "confidence", "reasoning", "decided_by"}
+    assert keyword_result["question_type"] == llm_result["question_type"]
+    assert 0.0 <= keyword_result["confidence"] <= 1.0
+    assert llm_result["decided_by"] == "llm"